@@ -1,3 +1,98 @@
+import argparse
+import logging
+import sys
+from datetime import date
+from pathlib import Path
+
 from .main import main
 
-main()
+parser = argparse.ArgumentParser(prog="python -m latest_changes")
+subparsers = parser.add_subparsers(dest="command")
+backfill_parser = subparsers.add_parser(
+    "backfill",
+    help="Add all the merged PRs missing in the release notes, in one commit.",
+)
+since_group = backfill_parser.add_mutually_exclusive_group(required=True)
+since_group.add_argument(
+    "--since-date",
+    type=date.fromisoformat,
+    help="Add the PRs merged since this date, e.g. 2024-01-31.",
+)
+since_group.add_argument(
+    "--since-tag", help="Add the PRs merged since the commit of this tag."
+)
+since_group.add_argument(
+    "--since-pr", type=int, help="Add the merged PRs from this PR number on."
+)
+backfill_parser.add_argument(
+    "--source",
+    choices=["api", "git"],
+    default="api",
+    help="Where to read the merged PRs from, the GitHub API or the commit subjects.",
+)
+backfill_parser.add_argument(
+    "--labels-file",
+    type=Path,
+    help='With --source git, a JSON file with the labels of PRs, e.g. {"123": ["feature"]}.',
+)
+serve_parser = subparsers.add_parser(
+    "serve",
+    help="Receive the webhooks of merged PRs and add them in batches, one commit each.",
+)
+serve_parser.add_argument(
+    "--host", default="127.0.0.1", help="The address to listen on."
+)
+serve_parser.add_argument(
+    "--port", type=int, default=8000, help="The port to listen on."
+)
+serve_parser.add_argument(
+    "--debounce",
+    type=float,
+    default=2.0,
+    help="Seconds to wait for more webhooks before committing a batch.",
+)
+serve_parser.add_argument(
+    "--max-batch-size",
+    type=int,
+    default=100,
+    help="The most PRs to add in a single commit.",
+)
+
+args = parser.parse_args()
+if args.command == "backfill":
+    from . import timing
+    from .backfill import backfill
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        stats = backfill(
+            since_date=args.since_date,
+            since_tag=args.since_tag,
+            since_pr=args.since_pr,
+            source=args.source,
+            labels_file=args.labels_file,
+        )
+    except RuntimeError as error:
+        logging.error(str(error))
+        sys.exit(1)
+    finally:
+        timing.report_metrics()
+    if not stats.pushed:
+        logging.error(f"Failed to push changes after {stats.trials} trials")
+        sys.exit(1)
+elif args.command == "serve":
+    from .server import serve
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        serve(
+            host=args.host,
+            port=args.port,
+            debounce=args.debounce,
+            max_batch_size=args.max_batch_size,
+        )
+    except RuntimeError as error:
+        logging.error(str(error))
+        sys.exit(1)
+else:
+    main()
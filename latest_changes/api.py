@@ -0,0 +1,111 @@
+import io
+import logging
+import time
+from typing import Optional
+
+from . import timing
+from .github_client import GitHubClient, GitHubFile
+from .main import (
+    COMMIT_MESSAGE,
+    DEFAULT_LATEST_CHANGES_FILES,
+    PushStats,
+    Settings,
+    TemplateDataPR,
+    generate_content,
+    get_pr_base_branch,
+    get_retry_delay,
+    load_content_index,
+    parse_release_notes_head,
+)
+
+
+def get_branch(*, settings: Settings, pr: TemplateDataPR) -> Optional[str]:
+    """
+    Get the branch to update, the base branch of the PR, or the branch of the
+    workflow run. With None, the GitHub API uses the default branch.
+    """
+    return get_pr_base_branch(pr) or settings.github_ref_name
+
+
+def find_latest_changes_file(
+    *, client: GitHubClient, settings: Settings, branch: Optional[str] = None
+) -> GitHubFile:
+    if settings.input_latest_changes_file is not None:
+        paths = (settings.input_latest_changes_file,)
+    else:
+        paths = DEFAULT_LATEST_CHANGES_FILES
+    for path in paths:
+        file = client.get_file(
+            repository=settings.github_repository, path=path.as_posix(), ref=branch
+        )
+        if file is not None:
+            return file
+    searched_files = ", ".join(str(path) for path in paths)
+    raise RuntimeError(
+        f"No latest changes file was found in the repository. Searched for: {searched_files}"
+    )
+
+
+def commit_and_push(
+    *,
+    client: GitHubClient,
+    settings: Settings,
+    pr: TemplateDataPR,
+    labels: list[str],
+) -> PushStats:
+    """
+    Add the PR to the release notes through the GitHub API, without a checkout.
+
+    The file is updated only if its blob SHA is still the one that was read,
+    when it was changed in the meantime, this reads it and generates the changes
+    again.
+    """
+    stats = PushStats()
+    logging.info(
+        f"Number of trials (for race conditions): {settings.input_number_of_trials}"
+    )
+    branch = get_branch(settings=settings, pr=pr)
+    logging.info(f"Updating the latest changes in branch: {branch or 'default'}")
+    file = find_latest_changes_file(client=client, settings=settings, branch=branch)
+    for trial in range(settings.input_number_of_trials):
+        logging.info(f"Running trial: {trial}")
+        stats.trials += 1
+        with timing.metrics.span("generate_content"):
+            head = parse_release_notes_head(io.BytesIO(file.content), settings)
+            new_content = generate_content(
+                content=head.content,
+                settings=settings,
+                pr=pr,
+                labels=labels,
+                index=load_content_index(content=head.content, settings=settings),
+            )
+        new_content = head.encode(new_content)
+        if head.tail_offset is not None:
+            new_content += file.content[head.tail_offset :]
+        logging.info(f"Updating through the GitHub API: {file.path}")
+        with timing.metrics.span("GitHub API update"):
+            updated = client.update_file(
+                repository=settings.github_repository,
+                path=file.path,
+                content=new_content,
+                sha=file.sha,
+                message=COMMIT_MESSAGE,
+                branch=branch,
+            )
+        if updated:
+            stats.pushed = True
+            break
+        if trial + 1 == settings.input_number_of_trials:
+            break
+        delay = get_retry_delay(trial=trial, base_delay=settings.input_retry_delay)
+        logging.info(f"That didn't work, waiting {delay:.2f}s before trying again")
+        time.sleep(delay)
+        stats.waited += delay
+        new_file = client.get_file(
+            repository=settings.github_repository, path=file.path, ref=branch
+        )
+        if new_file is None:
+            raise RuntimeError(f"The latest changes file was removed: {file.path}")
+        file = new_file
+        stats.regenerated += 1
+    return stats
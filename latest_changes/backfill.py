@@ -0,0 +1,155 @@
+import logging
+import os
+from datetime import date, datetime, time, timezone
+from pathlib import Path
+from typing import Literal, Optional
+
+from . import timing
+from .github_client import GitHubClient
+from .main import (
+    BatchEntry,
+    GitHubEventPullRequest,
+    PushStats,
+    Settings,
+    commit_and_push_changes,
+    create_github_client,
+    find_latest_changes_file,
+    generate_content_batch,
+    pull_latest_changes,
+)
+
+BackfillSource = Literal["api", "git"]
+
+
+def list_pull_requests(
+    *,
+    client: GitHubClient,
+    settings: Settings,
+    base_branch: Optional[str],
+    since_date: Optional[date] = None,
+    since_tag: Optional[str] = None,
+    since_pr: Optional[int] = None,
+) -> list[GitHubEventPullRequest]:
+    """
+    List the merged PRs to add, oldest first.
+    """
+    since: Optional[datetime] = None
+    if since_tag is not None:
+        since = client.get_tag_date(
+            repository=settings.github_repository, tag=since_tag
+        )
+        logging.info(f"The tag {since_tag} is from: {since.isoformat()}")
+    elif since_date is not None:
+        since = datetime.combine(since_date, time(), tzinfo=timezone.utc)
+    with timing.metrics.span("GitHub API list"):
+        pull_requests = client.list_merged_pull_requests(
+            repository=settings.github_repository,
+            base_branch=base_branch,
+            since=since,
+            since_number=since_pr,
+        )
+    # The latest changes go on top, so the oldest PR is added first
+    pull_requests.sort(
+        key=lambda pr: (
+            pr.merged_at or datetime.min.replace(tzinfo=timezone.utc),
+            pr.number,
+        )
+    )
+    return pull_requests
+
+
+def add_pull_requests(
+    content: str, *, settings: Settings, pull_requests: list[GitHubEventPullRequest]
+) -> str:
+    """
+    Add the messages for all the PRs not in the content yet, except the ones
+    with skip labels.
+    """
+    result = generate_content_batch(
+        content=content,
+        settings=settings,
+        entries=[
+            BatchEntry(pr=pr, labels=[label.name for label in pr.labels])
+            for pr in pull_requests
+        ],
+    )
+    logging.info(f"Adding {result.outcomes.count('inserted')} PRs")
+    return result.content
+
+
+def backfill(
+    *,
+    since_date: Optional[date] = None,
+    since_tag: Optional[str] = None,
+    since_pr: Optional[int] = None,
+    source: BackfillSource = "api",
+    labels_file: Optional[Path] = None,
+) -> PushStats:
+    """
+    Add all the PRs merged since a date, a tag, or a PR number that are not in
+    the release notes yet, in a single commit.
+
+    It runs in the current git repository, the settings are read from the same
+    environment variables as the action. With the "git" source, the PRs are
+    read from the commit subjects, so no token is needed.
+    """
+    # Backfills don't use an event, and the whole file is checked for PRs
+    # already added, they could be in a previous release
+    overrides = {}
+    if source == "git":
+        overrides["input_token"] = os.environ.get("INPUT_TOKEN", "")
+    settings = Settings(
+        github_event_path=Path(os.devnull),
+        input_duplicates_scope="file",
+        **overrides,
+    )
+    latest_changes_file = find_latest_changes_file(settings)
+    if source == "git":
+        from . import history
+
+        pull_latest_changes(settings)
+        # With a token, the authors without a noreply email are found in the API
+        client = (
+            create_github_client(settings)
+            if settings.input_token.get_secret_value()
+            else None
+        )
+        try:
+            pull_requests = history.list_pull_requests(
+                settings=settings,
+                since_date=since_date,
+                since_tag=since_tag,
+                since_pr=since_pr,
+                labels_file=labels_file,
+                client=client,
+            )
+        finally:
+            if client is not None:
+                client.close()
+    else:
+        base_branch = timing.run(
+            ["git", "symbolic-ref", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        client = create_github_client(settings)
+        try:
+            pull_requests = list_pull_requests(
+                client=client,
+                settings=settings,
+                base_branch=base_branch,
+                since_date=since_date,
+                since_tag=since_tag,
+                since_pr=since_pr,
+            )
+        finally:
+            client.close()
+    logging.info(f"Found {len(pull_requests)} merged PRs to backfill")
+    return commit_and_push_changes(
+        settings=settings,
+        latest_changes_file=latest_changes_file,
+        update=lambda content: add_pull_requests(
+            content, settings=settings, pull_requests=pull_requests
+        ),
+    )
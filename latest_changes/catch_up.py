@@ -0,0 +1,250 @@
+import logging
+import re
+import subprocess
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+from . import timing
+from .main import (
+    BatchEntry,
+    GitHubEventPullRequest,
+    PushStats,
+    Settings,
+    commit_and_push_changes,
+    create_github_client,
+    generate_content_batch,
+    get_content_plan,
+    get_pr_base_branch,
+    load_content_index,
+    read_release_notes_head,
+)
+
+# Without a marker, how long before this PR to look for PRs with pending runs
+FIRST_RUN_LOOKBACK = timedelta(hours=1)
+MARKER_PATTERN = re.compile(
+    r"<!-- latest-changes: merged_at=(?P<merged_at>\S+) number=(?P<number>\d+) -->\n"
+)
+
+
+class CatchUpMarker(BaseModel):
+    """
+    The last merged PR already processed, every PR merged before it was too.
+    """
+
+    merged_at: datetime
+    number: int
+
+    def render(self) -> str:
+        merged_at = self.merged_at.astimezone(timezone.utc).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        return f"<!-- latest-changes: merged_at={merged_at} number={self.number} -->\n"
+
+
+def get_sort_key(pr: GitHubEventPullRequest) -> tuple[datetime, int]:
+    if pr.merged_at is None:
+        raise RuntimeError(f"The merge time of the PR is unknown: {pr.number}")
+    return pr.merged_at, pr.number
+
+
+def is_handled(
+    pr: GitHubEventPullRequest,
+    marker: Optional[CatchUpMarker],
+    *,
+    pr_numbers: set[int],
+    settings: Settings,
+) -> bool:
+    """
+    Check if a run already processed the PR: it was merged up to the marker, and
+    it's in the release notes or it has a skip label.
+
+    A PR merged before the marker can still be missing, e.g. when the run that
+    moved the marker didn't list it yet, its own run has to add it.
+    """
+    if marker is None:
+        return False
+    if pr.number == marker.number:
+        return True
+    if get_sort_key(pr) > (marker.merged_at, marker.number):
+        return False
+    return pr.number in pr_numbers or get_content_plan(settings).should_skip(
+        label.name for label in pr.labels
+    )
+
+
+def get_pr_numbers(content: str, settings: Settings) -> set[int]:
+    return set(load_content_index(content=content, settings=settings).pr_numbers)
+
+
+def find_marker(
+    content: str, settings: Settings
+) -> tuple[int, int, Optional[CatchUpMarker]]:
+    """
+    Find the marker in the line right before the latest changes header.
+
+    Returns the start and end of the marker line (both the start of the header
+    line when there's no marker) and the marker.
+    """
+    plan = get_content_plan(settings)
+    header_match = plan.header.search(content)
+    if not header_match:
+        raise RuntimeError(
+            f"The latest changes file at: {settings.input_latest_changes_file} doesn't seem to contain the header RegEx: {settings.input_latest_changes_header}"
+        )
+    header_line_start = content.rfind("\n", 0, header_match[0]) + 1
+    marker_start = content.rfind("\n", 0, max(header_line_start - 1, 0)) + 1
+    match = MARKER_PATTERN.fullmatch(content, marker_start, header_line_start)
+    if not match:
+        return header_line_start, header_line_start, None
+    marker = CatchUpMarker(
+        merged_at=datetime.fromisoformat(match["merged_at"]),
+        number=int(match["number"]),
+    )
+    return marker_start, header_line_start, marker
+
+
+def read_marker(content: str, settings: Settings) -> Optional[CatchUpMarker]:
+    return find_marker(content, settings)[2]
+
+
+def set_marker(content: str, settings: Settings, marker: CatchUpMarker) -> str:
+    start, end, _ = find_marker(content, settings)
+    return f"{content[:start]}{marker.render()}{content[end:]}"
+
+
+def get_base_branch(pr: GitHubEventPullRequest) -> str:
+    base_branch = get_pr_base_branch(pr)
+    if base_branch is not None:
+        return base_branch
+    return timing.run(
+        ["git", "symbolic-ref", "--short", "HEAD"],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout.strip()
+
+
+def list_pending_pull_requests(
+    *,
+    settings: Settings,
+    pr: GitHubEventPullRequest,
+    marker: Optional[CatchUpMarker],
+    pr_numbers: set[int],
+) -> list[GitHubEventPullRequest]:
+    """
+    List the PRs merged after the marker, including this one, oldest first.
+
+    Without a marker, e.g. in the first run, the PRs merged up to
+    FIRST_RUN_LOOKBACK before this one are listed too, as their runs could
+    still be pending.
+    """
+    if marker is not None:
+        since = marker.merged_at
+    else:
+        since = get_sort_key(pr)[0] - FIRST_RUN_LOOKBACK
+    client = create_github_client(settings)
+    try:
+        with timing.metrics.span("GitHub API list"):
+            listed = client.list_merged_pull_requests(
+                repository=settings.github_repository,
+                base_branch=get_base_branch(pr),
+                since=since,
+            )
+    finally:
+        client.close()
+    pull_requests = [pr]
+    pull_requests.extend(
+        listed_pr for listed_pr in listed if listed_pr.number != pr.number
+    )
+    pending = [
+        pending_pr
+        for pending_pr in pull_requests
+        if not is_handled(pending_pr, marker, pr_numbers=pr_numbers, settings=settings)
+    ]
+    pending.sort(key=get_sort_key)
+    return pending
+
+
+def add_pending_pull_requests(
+    content: str, *, settings: Settings, pull_requests: list[GitHubEventPullRequest]
+) -> str:
+    """
+    Add the PRs after the marker in the content, and move the marker to the last one.
+
+    The marker is read again, as another run could have moved it since the PRs
+    were listed. It's never moved back, when a PR merged before it is added.
+    """
+    marker = read_marker(content, settings)
+    pr_numbers = get_pr_numbers(content, settings)
+    pending = [
+        pr
+        for pr in pull_requests
+        if not is_handled(pr, marker, pr_numbers=pr_numbers, settings=settings)
+    ]
+    if not pending:
+        logging.info("All the PRs were already processed by another run")
+        return content
+    result = generate_content_batch(
+        content=content,
+        settings=settings,
+        entries=[
+            BatchEntry(pr=pr, labels=[label.name for label in pr.labels])
+            for pr in pending
+        ],
+    )
+    logging.info(
+        f"Adding {result.outcomes.count('inserted')} PRs of {len(pending)} merged since the last run"
+    )
+    merged_at, number = get_sort_key(pending[-1])
+    if marker is not None and (marker.merged_at, marker.number) > (merged_at, number):
+        merged_at, number = marker.merged_at, marker.number
+    return set_marker(
+        result.content, settings, CatchUpMarker(merged_at=merged_at, number=number)
+    )
+
+
+def is_already_handled(
+    *, settings: Settings, latest_changes_file: Path, pr: GitHubEventPullRequest
+) -> bool:
+    """
+    Check if a previous run already processed this PR, reading only the head of
+    the release notes in the checkout, without any network request.
+    """
+    with timing.metrics.span("read release notes"):
+        head = read_release_notes_head(latest_changes_file, settings)
+    marker = read_marker(head.content, settings)
+    if marker is None:
+        return False
+    return is_handled(
+        pr,
+        marker,
+        pr_numbers=get_pr_numbers(head.content, settings),
+        settings=settings,
+    )
+
+
+def commit_and_push(
+    *, settings: Settings, latest_changes_file: Path, pr: GitHubEventPullRequest
+) -> PushStats:
+    """
+    Add all the PRs merged since the last run, including this one, in a single
+    commit, and move the marker after them.
+    """
+    head = read_release_notes_head(latest_changes_file, settings)
+    pull_requests = list_pending_pull_requests(
+        settings=settings,
+        pr=pr,
+        marker=read_marker(head.content, settings),
+        pr_numbers=get_pr_numbers(head.content, settings),
+    )
+    logging.info(f"Found {len(pull_requests)} merged PRs to catch up")
+    return commit_and_push_changes(
+        settings=settings,
+        latest_changes_file=latest_changes_file,
+        update=lambda content: add_pending_pull_requests(
+            content, settings=settings, pull_requests=pull_requests
+        ),
+    )
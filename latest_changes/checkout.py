@@ -0,0 +1,105 @@
+import base64
+import logging
+import shutil
+import subprocess
+from pathlib import Path
+
+from . import timing
+from .main import DEFAULT_LATEST_CHANGES_FILES, LatestChangesTarget, Settings
+
+REMOTE = "origin"
+
+
+def git(*args: str, cwd: Path) -> str:
+    result = timing.run(
+        ["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, text=True
+    )
+    return result.stdout.strip()
+
+
+def get_sparse_checkout_patterns(settings: Settings) -> list[str]:
+    template_files = [settings.input_template_file]
+    if settings.input_latest_changes_files:
+        # The globs in the targets are also valid sparse checkout patterns
+        paths: list[Path] = []
+        for target in settings.input_latest_changes_files:
+            if isinstance(target, str):
+                target = LatestChangesTarget(file=target)
+            paths.append(Path(target.file))
+            if target.template_file is not None:
+                template_files.append(target.template_file)
+    elif settings.input_latest_changes_file is not None:
+        paths = [settings.input_latest_changes_file]
+    else:
+        paths = list(DEFAULT_LATEST_CHANGES_FILES)
+    # A custom template in the repo is needed too
+    paths.extend(path for path in template_files if not path.is_absolute())
+    return [f"/{path.as_posix().removeprefix('./')}" for path in paths]
+
+
+def get_default_branch(path: Path) -> str:
+    output = git("ls-remote", "--symref", REMOTE, "HEAD", cwd=path)
+    for line in output.splitlines():
+        if line.startswith("ref: ") and line.endswith("\tHEAD"):
+            return line.removeprefix("ref: refs/heads/").removesuffix("\tHEAD")
+    raise RuntimeError("Could not find the default branch of the repository")
+
+
+def setup_checkout(settings: Settings) -> Path:
+    """
+    Create a minimal checkout of the repository and return its path.
+
+    It's shallow (only the last commit), without blobs except the ones needed,
+    and with a sparse checkout of only the release notes file (and a custom
+    template), so it takes the same time however big the repository is.
+    """
+    path = settings.latest_changes_cache_dir / "checkout"
+    if path.exists():
+        shutil.rmtree(path)
+    path.mkdir(parents=True)
+    url = f"{settings.github_server_url}/{settings.github_repository}.git"
+    logging.info(f"Creating a shallow, sparse checkout of: {url}")
+    git("init", "--quiet", cwd=path)
+    git("remote", "add", REMOTE, url, cwd=path)
+    token = settings.input_token.get_secret_value()
+    if token:
+        basic = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        git(
+            "config",
+            f"http.{settings.github_server_url}/.extraheader",
+            f"AUTHORIZATION: basic {basic}",
+            cwd=path,
+        )
+    git(
+        "sparse-checkout",
+        "set",
+        "--no-cone",
+        *get_sparse_checkout_patterns(settings),
+        cwd=path,
+    )
+    branch = get_default_branch(path)
+    fetch(branch, cwd=path)
+    git("checkout", "--quiet", "-B", branch, f"{REMOTE}/{branch}", cwd=path)
+    return path
+
+
+def fetch(branch: str, *, cwd: Path) -> None:
+    git(
+        "fetch",
+        "--quiet",
+        "--depth=1",
+        "--filter=blob:none",
+        REMOTE,
+        f"+refs/heads/{branch}:refs/remotes/{REMOTE}/{branch}",
+        cwd=cwd,
+    )
+
+
+def refresh(cwd: Path) -> None:
+    """
+    Update the managed checkout to the latest commit of its branch, discarding
+    any local commit, with a shallow fetch.
+    """
+    branch = git("symbolic-ref", "--short", "HEAD", cwd=cwd)
+    fetch(branch, cwd=cwd)
+    git("reset", "--quiet", "--hard", f"{REMOTE}/{branch}", cwd=cwd)
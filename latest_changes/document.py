@@ -0,0 +1,440 @@
+import re
+from typing import Iterator, Optional
+
+from .main import (
+    BatchEntry,
+    BatchOutcome,
+    ContentPlan,
+    Settings,
+    get_content_plan,
+    render_message,
+)
+
+ENTRY_PREFIXES = (b"* ", b"- ", b"+ ")
+CONTINUATION_PREFIXES = (b" ", b"\t")
+BLANK_LINE = b"\n"
+
+
+class Span:
+    """
+    A part of a source, kept as offsets instead of as a copy of its bytes.
+    """
+
+    __slots__ = ("source", "start", "end")
+
+    def __init__(self, source: bytes, start: int = 0, end: Optional[int] = None):
+        self.source = source
+        self.start = start
+        self.end = len(source) if end is None else end
+
+    def __bytes__(self) -> bytes:
+        return self.source[self.start : self.end]
+
+    def is_blank(self) -> bool:
+        return not self.source[self.start : self.end].strip()
+
+    def blank_lines_end(self) -> int:
+        """
+        Get the offset after the blank lines at the start of the span.
+        """
+        pos = self.start
+        while pos < self.end:
+            line_end = self.source.find(b"\n", pos, self.end)
+            if line_end == -1 or self.source[pos:line_end].strip():
+                break
+            pos = line_end + 1
+        return pos
+
+
+class Entry(Span):
+    """
+    A list item, with its continuation lines, and the PR number it links to.
+    """
+
+    __slots__ = ("pr_number",)
+
+    def __init__(
+        self,
+        source: bytes,
+        start: int = 0,
+        end: Optional[int] = None,
+        *,
+        pr_number: Optional[int] = None,
+    ):
+        super().__init__(source, start, end)
+        self.pr_number = pr_number
+
+    @property
+    def text(self) -> str:
+        return bytes(self).decode("utf-8").rstrip("\n")
+
+
+class Section:
+    """
+    A label section, or the content before the first label section of a
+    release, when header is None.
+    """
+
+    __slots__ = ("header", "label", "items")
+
+    def __init__(
+        self,
+        *,
+        header: Optional[Span],
+        label: Optional[str],
+        items: Optional[list[Span]] = None,
+    ):
+        self.header = header
+        self.label = label
+        self.items: list[Span] = items if items is not None else []
+
+    def entries(self) -> Iterator[Entry]:
+        for item in self.items:
+            if isinstance(item, Entry):
+                yield item
+
+    def spans(self) -> Iterator[Span]:
+        if self.header is not None:
+            yield self.header
+        yield from self.items
+
+
+class ReleaseBlock:
+    """
+    A release, e.g. the latest changes, with its header line and its sections.
+    """
+
+    __slots__ = ("header", "sections")
+
+    def __init__(self, *, header: Span, sections: list[Section]):
+        self.header = header
+        self.sections = sections
+
+    @property
+    def title(self) -> str:
+        return bytes(self.header).decode("utf-8").strip()
+
+    def spans(self) -> Iterator[Span]:
+        yield self.header
+        for section in self.sections:
+            yield from section.spans()
+
+    def section_ends_with_blank_line(self, section: Section) -> bool:
+        spans = [self.header] if section is self.sections[0] else []
+        spans.extend(section.spans())
+        tail = b"".join(bytes(span)[-2:] for span in spans[-2:])
+        return tail.endswith(b"\n\n")
+
+
+class ReleaseNotes:
+    """
+    A parsed release notes file that serializes back to the same bytes.
+
+    Every byte of the source belongs to a span (the preamble, a header line, an
+    entry, or the text in between), so only the parts edited are new, the rest
+    are offsets into the source.
+    """
+
+    def __init__(
+        self,
+        *,
+        settings: Settings,
+        preamble: Span,
+        blocks: list[ReleaseBlock],
+        has_latest_changes: bool,
+    ):
+        self.settings = settings
+        self.plan: ContentPlan = get_content_plan(settings)
+        self.preamble = preamble
+        self.blocks = blocks
+        self.has_latest_changes = has_latest_changes
+        # The first entry for each PR number
+        self.index: dict[int, tuple[Section, Entry]] = {}
+        for block in blocks:
+            for section in block.sections:
+                for entry in section.entries():
+                    if entry.pr_number is not None:
+                        self.index.setdefault(entry.pr_number, (section, entry))
+        # The PR numbers and messages checked for duplicates, only the ones in
+        # the latest changes, unless the duplicates scope is the whole file
+        self.duplicate_pr_numbers: set[int] = set()
+        self.duplicate_messages: set[str] = set()
+        for block in self.get_duplicate_blocks():
+            for section in block.sections:
+                for entry in section.entries():
+                    self.track_duplicate(entry)
+
+    @classmethod
+    def parse(cls, source: bytes, settings: Settings) -> "ReleaseNotes":
+        plan = get_content_plan(settings)
+        header = re.compile(
+            settings.input_latest_changes_header.encode("utf-8"), flags=re.MULTILINE
+        )
+        end = re.compile(settings.input_end_regex.encode("utf-8"), flags=re.MULTILINE)
+        pr_link = re.compile(plan.pr_link.pattern.encode("utf-8"))
+        label_header_prefix = settings.input_label_header_prefix.encode("utf-8")
+
+        def line_start(pos: int) -> int:
+            return source.rfind(b"\n", 0, pos) + 1
+
+        def line_end(pos: int) -> int:
+            end_pos = source.find(b"\n", pos)
+            return len(source) if end_pos == -1 else end_pos + 1
+
+        block_starts: list[int] = []
+        header_match = header.search(source)
+        search_start = 0
+        if header_match:
+            block_starts.append(line_start(header_match.start()))
+            search_start = line_end(header_match.start())
+        for end_match in end.finditer(source, search_start):
+            start = line_start(end_match.start())
+            if not block_starts or start > block_starts[-1]:
+                block_starts.append(start)
+        blocks: list[ReleaseBlock] = []
+        block_ends = [*block_starts[1:], len(source)]
+        for block_start, block_end in zip(block_starts, block_ends):
+            header_end = line_end(block_start)
+            section = Section(header=None, label=None)
+            sections = [section]
+            text_start: Optional[int] = None
+            entry: Optional[Entry] = None
+            pos = header_end
+            while pos < block_end:
+                next_pos = min(line_end(pos), block_end)
+                if entry is not None and source.startswith(CONTINUATION_PREFIXES, pos):
+                    if source[pos:next_pos].strip():
+                        entry.end = next_pos
+                        pos = next_pos
+                        continue
+                entry = None
+                is_header = source.startswith(label_header_prefix, pos)
+                is_entry = not is_header and source.startswith(ENTRY_PREFIXES, pos)
+                if (is_header or is_entry) and text_start is not None:
+                    section.items.append(Span(source, text_start, pos))
+                    text_start = None
+                if is_header:
+                    title = source[pos + len(label_header_prefix) : next_pos]
+                    label = plan.sections_by_header.get(title.decode("utf-8").rstrip())
+                    section = Section(
+                        header=Span(source, pos, next_pos),
+                        label=label.label if label else None,
+                    )
+                    sections.append(section)
+                elif is_entry:
+                    pr_match = pr_link.search(source, pos, next_pos)
+                    entry = Entry(
+                        source,
+                        pos,
+                        next_pos,
+                        pr_number=int(pr_match[1]) if pr_match else None,
+                    )
+                    section.items.append(entry)
+                elif text_start is None:
+                    text_start = pos
+                pos = next_pos
+            if text_start is not None:
+                section.items.append(Span(source, text_start, block_end))
+            blocks.append(
+                ReleaseBlock(
+                    header=Span(source, block_start, header_end), sections=sections
+                )
+            )
+        preamble_end = block_starts[0] if block_starts else len(source)
+        return cls(
+            settings=settings,
+            preamble=Span(source, 0, preamble_end),
+            blocks=blocks,
+            has_latest_changes=header_match is not None,
+        )
+
+    def spans(self) -> Iterator[Span]:
+        yield self.preamble
+        for block in self.blocks:
+            yield from block.spans()
+
+    def to_bytes(self) -> bytes:
+        # Contiguous spans of the same source are joined as a single slice, so
+        # the parts not edited are copied at once
+        parts: list[memoryview] = []
+        source: Optional[bytes] = None
+        start = end = 0
+        for span in self.spans():
+            if span.source is source and span.start == end:
+                end = span.end
+                continue
+            if source is not None:
+                parts.append(memoryview(source)[start:end])
+            source, start, end = span.source, span.start, span.end
+        if source is not None:
+            parts.append(memoryview(source)[start:end])
+        return b"".join(parts)
+
+    @property
+    def latest(self) -> ReleaseBlock:
+        if not self.has_latest_changes:
+            raise RuntimeError(
+                f"The latest changes file doesn't seem to contain the header RegEx: {self.settings.input_latest_changes_header}"
+            )
+        return self.blocks[0]
+
+    def __contains__(self, pr_number: int) -> bool:
+        return pr_number in self.index
+
+    def find(self, pr_number: int) -> Optional[Entry]:
+        found = self.index.get(pr_number)
+        return found[1] if found else None
+
+    def get_label(self, labels: list[str]) -> Optional[str]:
+        return self.plan.get_label(labels)
+
+    def get_section(self, block: ReleaseBlock, label: Optional[str]) -> Section:
+        """
+        Get the section for the label in the block, creating it if needed, in
+        the order of the configured labels.
+        """
+        if label is None:
+            return block.sections[0]
+        for section in block.sections:
+            if section.label == label:
+                return section
+        priority = self.plan.label_priority[label]
+        index = len(block.sections)
+        for position, section in enumerate(block.sections[1:], start=1):
+            if section.label is None:
+                continue
+            if self.plan.label_priority[section.label] > priority:
+                index = position
+                break
+        header = self.settings.input_labels[priority].header
+        new_section = Section(
+            header=Span(
+                f"{self.settings.input_label_header_prefix}{header}\n".encode("utf-8")
+            ),
+            label=label,
+            items=[Span(BLANK_LINE)],
+        )
+        previous = block.sections[index - 1]
+        if not block.section_ends_with_blank_line(previous):
+            previous.items.append(Span(BLANK_LINE))
+        block.sections.insert(index, new_section)
+        return new_section
+
+    def insert(
+        self,
+        message: str,
+        *,
+        labels: list[str],
+        pr_number: Optional[int] = None,
+        block: Optional[ReleaseBlock] = None,
+    ) -> Entry:
+        """
+        Add the message on top of the section for its labels, by default in the
+        latest changes.
+        """
+        entry = Entry(f"{message}\n".encode("utf-8"), pr_number=pr_number)
+        section = self.get_section(block or self.latest, self.get_label(labels))
+        self.add_entry(section, entry)
+        return entry
+
+    def get_duplicate_blocks(self) -> list[ReleaseBlock]:
+        if self.settings.input_duplicates_scope == "file":
+            return self.blocks
+        return self.blocks[:1] if self.has_latest_changes else []
+
+    def in_duplicate_scope(self, section: Section) -> bool:
+        return any(section in block.sections for block in self.get_duplicate_blocks())
+
+    def track_duplicate(self, entry: Entry) -> None:
+        if entry.pr_number is not None:
+            self.duplicate_pr_numbers.add(entry.pr_number)
+        self.duplicate_messages.add(entry.text)
+
+    def is_duplicate(self, pr_number: int, message: str) -> bool:
+        """
+        Check if the PR or its message is already listed, in the latest changes
+        or in the whole file, depending on settings.input_duplicates_scope.
+        """
+        return (
+            pr_number in self.duplicate_pr_numbers or message in self.duplicate_messages
+        )
+
+    def insert_batch(self, entries: list[BatchEntry]) -> list[BatchOutcome]:
+        """
+        Add the messages for many PRs to the latest changes, the same way as
+        generate_content_batch(), returning the outcome for each entry.
+        """
+        outcomes: list[BatchOutcome] = []
+        for batch_entry in entries:
+            if self.plan.should_skip(batch_entry.labels):
+                outcomes.append("skipped")
+                continue
+            message = render_message(pr=batch_entry.pr, settings=self.settings)
+            if self.is_duplicate(batch_entry.pr.number, message):
+                outcomes.append("duplicate")
+                continue
+            self.insert(
+                message, labels=batch_entry.labels, pr_number=batch_entry.pr.number
+            )
+            outcomes.append("inserted")
+        return outcomes
+
+    def add_entry(self, section: Section, entry: Entry) -> None:
+        items = section.items
+        for index, item in enumerate(items):
+            if isinstance(item, Entry):
+                items.insert(index, entry)
+                break
+        else:
+            # The first entry, after the blank lines after the header
+            index = 0
+            while index < len(items) and items[index].is_blank():
+                index += 1
+            if index < len(items):
+                # Text, keep its blank lines before the entry
+                text = items[index]
+                blank_end = text.blank_lines_end()
+                if blank_end > text.start:
+                    items[index : index + 1] = [
+                        Span(text.source, text.start, blank_end),
+                        Span(text.source, blank_end, text.end),
+                    ]
+                    index += 1
+            new_items: list[Span] = [entry, Span(BLANK_LINE)]
+            if index == 0:
+                new_items.insert(0, Span(BLANK_LINE))
+            items[index:index] = new_items
+        if entry.pr_number is not None:
+            self.index.setdefault(entry.pr_number, (section, entry))
+        if self.in_duplicate_scope(section):
+            self.track_duplicate(entry)
+
+    def remove(self, pr_number: int) -> Entry:
+        """
+        Remove the entry for the PR, and its label section if it's left empty.
+        """
+        section, entry = self.index.pop(pr_number)
+        if self.in_duplicate_scope(section):
+            self.duplicate_pr_numbers.discard(pr_number)
+            self.duplicate_messages.discard(entry.text)
+        section.items.remove(entry)
+        if next(section.entries(), None) is None:
+            if section.header is None:
+                if all(item.is_blank() for item in section.items):
+                    section.items[:] = [Span(BLANK_LINE)]
+            else:
+                for block in self.blocks:
+                    if section in block.sections:
+                        block.sections.remove(section)
+                        break
+        return entry
+
+    def move(self, pr_number: int, *, labels: list[str]) -> Entry:
+        """
+        Move the entry for the PR to the section for the labels, in its release.
+        """
+        section, _ = self.index[pr_number]
+        block = next(block for block in self.blocks if section in block.sections)
+        entry = self.remove(pr_number)
+        self.add_entry(self.get_section(block, self.get_label(labels)), entry)
+        return entry
@@ -0,0 +1,356 @@
+import base64
+import importlib.util
+from datetime import datetime
+from typing import Any, Optional
+
+import httpx
+from pydantic import BaseModel
+
+from . import timing
+from .main import GitHubEventLabel, GitHubEventPullRequest, TemplateDataUser
+
+DEFAULT_API_URL = "https://api.github.com"
+
+PULL_REQUEST_QUERY = """
+query ($owner: String!, $name: String!, $number: Int!, $labelsCursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      number
+      title
+      url
+      merged
+      mergedAt
+      baseRefName
+      author {
+        __typename
+        login
+        url
+      }
+      labels(first: 100, after: $labelsCursor) {
+        nodes {
+          name
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+    }
+  }
+}
+"""
+
+MERGED_PULL_REQUESTS_QUERY = """
+query (
+  $owner: String!
+  $name: String!
+  $baseRefName: String
+  $orderBy: IssueOrder!
+  $cursor: String
+) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(
+      states: MERGED
+      baseRefName: $baseRefName
+      orderBy: $orderBy
+      first: 100
+      after: $cursor
+    ) {
+      nodes {
+        number
+        title
+        url
+        merged
+        mergedAt
+        updatedAt
+        author {
+          __typename
+          login
+          url
+        }
+        labels(first: 100) {
+          nodes {
+            name
+          }
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+"""
+
+TAG_DATE_QUERY = """
+query ($owner: String!, $name: String!, $qualifiedName: String!) {
+  repository(owner: $owner, name: $name) {
+    ref(qualifiedName: $qualifiedName) {
+      target {
+        ... on Commit {
+          committedDate
+        }
+        ... on Tag {
+          target {
+            ... on Commit {
+              committedDate
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# The author of PRs from deleted accounts
+GHOST_USER = TemplateDataUser(login="ghost", html_url="https://github.com/ghost")
+
+
+class GitHubFile(BaseModel):
+    path: str
+    sha: str
+    content: bytes
+
+
+def record_response(response: httpx.Response) -> None:
+    timing.metrics.record_api_response(response.headers)
+
+
+def is_http2_available() -> bool:
+    # httpx only supports HTTP/2 with the optional h2 package
+    return importlib.util.find_spec("h2") is not None
+
+
+def get_author(data: Optional[dict[str, Any]]) -> TemplateDataUser:
+    if data is None:
+        return GHOST_USER
+    login = data["login"]
+    # The REST API (and the event payload) call bots e.g. "dependabot[bot]"
+    if data["__typename"] == "Bot":
+        login = f"{login}[bot]"
+    return TemplateDataUser(login=login, html_url=data["url"])
+
+
+def parse_pull_request(
+    data: dict[str, Any], labels: list[dict[str, Any]]
+) -> GitHubEventPullRequest:
+    # The base branch, the same way as in the REST API (and the event payload)
+    extra = {"base": {"ref": data["baseRefName"]}} if data.get("baseRefName") else {}
+    return GitHubEventPullRequest(
+        number=data["number"],
+        title=data["title"],
+        html_url=data["url"],
+        user=get_author(data["author"]),
+        merged=data["merged"],
+        merged_at=data.get("mergedAt"),
+        labels=[GitHubEventLabel(name=label["name"]) for label in labels],
+        **extra,
+    )
+
+
+class GitHubClient:
+    """
+    A thin client for the GitHub API, on top of httpx.
+
+    The connection is reused for all the requests, with HTTP/2 when available.
+    The base_url and the transport can be changed to use a fake GitHub in tests.
+    """
+
+    def __init__(
+        self,
+        *,
+        token: str,
+        base_url: str = DEFAULT_API_URL,
+        graphql_url: Optional[str] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+    ) -> None:
+        self.graphql_url = graphql_url or f"{base_url.rstrip('/')}/graphql"
+        self.client = httpx.Client(
+            base_url=base_url,
+            headers={
+                "Accept": "application/vnd.github+json",
+                "Authorization": f"Bearer {token}",
+                "User-Agent": "tiangolo/latest-changes",
+                "X-GitHub-Api-Version": "2022-11-28",
+            },
+            transport=transport,
+            http2=is_http2_available(),
+            timeout=30,
+            event_hooks={"response": [record_response]},
+        )
+
+    def get_file(
+        self, *, repository: str, path: str, ref: Optional[str] = None
+    ) -> Optional[GitHubFile]:
+        """
+        Get a file and its blob SHA, or None if it doesn't exist.
+        """
+        params = {"ref": ref} if ref else {}
+        response = self.client.get(
+            f"/repos/{repository}/contents/{path}", params=params
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict) or data.get("type") != "file":
+            return None
+        if data.get("encoding") == "base64":
+            content = base64.b64decode(data["content"])
+        else:
+            # Files over 1 MB don't include their content, get the raw blob
+            blob_response = self.client.get(
+                f"/repos/{repository}/git/blobs/{data['sha']}",
+                headers={"Accept": "application/vnd.github.raw+json"},
+            )
+            blob_response.raise_for_status()
+            content = blob_response.content
+        return GitHubFile(path=data["path"], sha=data["sha"], content=content)
+
+    def update_file(
+        self,
+        *,
+        repository: str,
+        path: str,
+        content: bytes,
+        sha: str,
+        message: str,
+        branch: Optional[str] = None,
+    ) -> bool:
+        """
+        Update a file only if its blob SHA is still sha.
+
+        Returns False when the file was changed in the meantime.
+        """
+        data = {
+            "message": message,
+            "content": base64.b64encode(content).decode("ascii"),
+            "sha": sha,
+        }
+        if branch:
+            data["branch"] = branch
+        response = self.client.put(f"/repos/{repository}/contents/{path}", json=data)
+        if response.status_code == 409:
+            return False
+        response.raise_for_status()
+        return True
+
+    def get_commit_author(
+        self, *, repository: str, sha: str
+    ) -> Optional[TemplateDataUser]:
+        """
+        Get the GitHub account of the author of a commit, or None if the author
+        email isn't linked to one (or GitHub doesn't have the commit).
+        """
+        response = self.client.get(f"/repos/{repository}/commits/{sha}")
+        if response.status_code in (404, 422):
+            return None
+        response.raise_for_status()
+        author = response.json().get("author")
+        if not author:
+            return None
+        return TemplateDataUser(login=author["login"], html_url=author["html_url"])
+
+    def graphql(self, query: str, variables: dict[str, Any]) -> dict[str, Any]:
+        response = self.client.post(
+            self.graphql_url, json={"query": query, "variables": variables}
+        )
+        response.raise_for_status()
+        result = response.json()
+        if result.get("errors"):
+            messages = "; ".join(error["message"] for error in result["errors"])
+            raise RuntimeError(f"The GitHub GraphQL API returned errors: {messages}")
+        return result["data"]
+
+    def get_pull_request(
+        self, *, repository: str, number: int
+    ) -> GitHubEventPullRequest:
+        """
+        Get the PR data needed, with its merged state and all its labels, in a
+        single GraphQL query (plus one more for each extra 100 labels).
+        """
+        owner, name = repository.split("/", 1)
+        variables: dict[str, Any] = {"owner": owner, "name": name, "number": number}
+        labels: list[dict[str, Any]] = []
+        while True:
+            data = self.graphql(PULL_REQUEST_QUERY, variables)
+            pull_request = (data.get("repository") or {}).get("pullRequest")
+            if pull_request is None:
+                raise RuntimeError(f"PR not found in {repository}: {number}")
+            labels_page = pull_request["labels"]
+            labels.extend(labels_page["nodes"])
+            if not labels_page["pageInfo"]["hasNextPage"]:
+                break
+            variables["labelsCursor"] = labels_page["pageInfo"]["endCursor"]
+        return parse_pull_request(pull_request, labels)
+
+    def list_merged_pull_requests(
+        self,
+        *,
+        repository: str,
+        base_branch: Optional[str] = None,
+        since: Optional[datetime] = None,
+        since_number: Optional[int] = None,
+    ) -> list[GitHubEventPullRequest]:
+        """
+        List the PRs merged since a date or since a PR number (inclusive), in
+        pages of 100 PRs each, with up to 100 labels per PR.
+
+        For a date, the PRs are listed by update time, as merging a PR updates
+        it, listing stops at the first one updated before the date. For a PR
+        number, they are listed by creation time, as numbers are sequential.
+        """
+        owner, name = repository.split("/", 1)
+        order_field = "CREATED_AT" if since_number is not None else "UPDATED_AT"
+        variables: dict[str, Any] = {
+            "owner": owner,
+            "name": name,
+            "baseRefName": base_branch,
+            "orderBy": {"field": order_field, "direction": "DESC"},
+        }
+        pull_requests: list[GitHubEventPullRequest] = []
+        while True:
+            data = self.graphql(MERGED_PULL_REQUESTS_QUERY, variables)
+            if data.get("repository") is None:
+                raise RuntimeError(f"Repository not found: {repository}")
+            page = data["repository"]["pullRequests"]
+            done = False
+            for node in page["nodes"]:
+                if since_number is not None and node["number"] < since_number:
+                    done = True
+                    continue
+                if since is not None:
+                    if datetime.fromisoformat(node["updatedAt"]) < since:
+                        done = True
+                        continue
+                    if datetime.fromisoformat(node["mergedAt"]) < since:
+                        continue
+                pull_requests.append(parse_pull_request(node, node["labels"]["nodes"]))
+            if done or not page["pageInfo"]["hasNextPage"]:
+                break
+            variables["cursor"] = page["pageInfo"]["endCursor"]
+        return pull_requests
+
+    def get_tag_date(self, *, repository: str, tag: str) -> datetime:
+        """
+        Get the date of the commit a tag points to.
+        """
+        owner, name = repository.split("/", 1)
+        data = self.graphql(
+            TAG_DATE_QUERY,
+            {"owner": owner, "name": name, "qualifiedName": f"refs/tags/{tag}"},
+        )
+        ref = (data.get("repository") or {}).get("ref")
+        target = ref["target"] if ref else {}
+        # Annotated tags point to a tag object, that points to the commit
+        committed_date = target.get("committedDate") or (
+            (target.get("target") or {}).get("committedDate")
+        )
+        if not committed_date:
+            raise RuntimeError(f"Tag not found in {repository}: {tag}")
+        return datetime.fromisoformat(committed_date)
+
+    def close(self) -> None:
+        self.client.close()
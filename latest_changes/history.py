@@ -0,0 +1,192 @@
+import json
+import logging
+import re
+import subprocess
+from datetime import date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from . import timing
+from .main import (
+    GitHubEventLabel,
+    GitHubEventPullRequest,
+    Settings,
+    TemplateDataUser,
+)
+
+if TYPE_CHECKING:
+    from .github_client import GitHubClient
+
+# The subject of a squash merge, e.g. "✨ Add feature (#123)"
+SQUASH_SUBJECT_PATTERN = re.compile(r"^(?P<title>.+) \(#(?P<number>\d+)\)$")
+# The subject of a merge commit, e.g. "Merge pull request #123 from user/branch"
+MERGE_SUBJECT_PATTERN = re.compile(
+    r"^Merge pull request #(?P<number>\d+) from (?P<head>\S+)$"
+)
+NOREPLY_EMAIL_PATTERN = re.compile(
+    r"^(?:\d+\+)?(?P<login>[^@]+)@users\.noreply\.github\.com$"
+)
+# The commit fields, separated by NUL, and the commits by the record separator
+LOG_FORMAT = "%x00".join(
+    [
+        "%H",
+        "%an",
+        "%ae",
+        "%cI",
+        "%s",
+        "%b",
+        "%(trailers:key=Labels,valueonly,separator=%x2C)",
+    ]
+)
+RECORD_SEPARATOR = "\x1e"
+
+
+def read_labels_file(path: Path) -> dict[int, list[str]]:
+    """
+    Read a JSON object with PR numbers as keys and lists of labels as values,
+    e.g. {"123": ["feature"]}.
+    """
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise RuntimeError(f"The labels file must contain a JSON object: {path}")
+    return {int(number): list(labels) for number, labels in data.items()}
+
+
+def get_author(
+    *,
+    sha: str,
+    author_name: str,
+    author_email: str,
+    settings: Settings,
+    client: Optional["GitHubClient"],
+) -> TemplateDataUser:
+    """
+    Get the GitHub account of a commit author, from a noreply email, or from
+    the GitHub API when there's a client, without guessing it from the name.
+    """
+    match = NOREPLY_EMAIL_PATTERN.match(author_email)
+    if match:
+        login = match["login"]
+        return TemplateDataUser(
+            login=login, html_url=f"{settings.github_server_url}/{login}"
+        )
+    if client is not None:
+        user = client.get_commit_author(repository=settings.github_repository, sha=sha)
+        if user is not None:
+            return user
+    from .github_client import GHOST_USER
+
+    logging.warning(
+        f"Could not find the GitHub account of {author_name} <{author_email}>, the author of {sha}, using: {GHOST_USER.login}"
+    )
+    return GHOST_USER
+
+
+def parse_commit(
+    record: str,
+    *,
+    settings: Settings,
+    labels_map: dict[int, list[str]],
+    authors: dict[str, TemplateDataUser],
+    client: Optional["GitHubClient"] = None,
+) -> Optional[GitHubEventPullRequest]:
+    """
+    Parse a commit from the git log stream, if its subject is from a PR merge.
+
+    The authors found are kept in authors by email, to look each one up once.
+    """
+    sha, author_name, author_email, committed_at, subject, body, trailer_labels = (
+        record.strip("\n").split("\x00")
+    )
+    if match := MERGE_SUBJECT_PATTERN.match(subject):
+        number = int(match["number"])
+        # The body starts with the PR title, the head is like user/branch
+        title = next(
+            (line.strip() for line in body.splitlines() if line.strip()),
+            match["head"],
+        )
+        login = match["head"].split("/", 1)[0]
+        user = TemplateDataUser(
+            login=login, html_url=f"{settings.github_server_url}/{login}"
+        )
+    elif match := SQUASH_SUBJECT_PATTERN.match(subject):
+        number = int(match["number"])
+        title = match["title"]
+        if author_email not in authors:
+            authors[author_email] = get_author(
+                sha=sha,
+                author_name=author_name,
+                author_email=author_email,
+                settings=settings,
+                client=client,
+            )
+        user = authors[author_email]
+    else:
+        return None
+    labels = [label.strip() for label in trailer_labels.split(",") if label.strip()]
+    labels.extend(label for label in labels_map.get(number, []) if label not in labels)
+    return GitHubEventPullRequest(
+        number=number,
+        title=title,
+        html_url=f"{settings.github_server_url}/{settings.github_repository}/pull/{number}",
+        user=user,
+        merged=True,
+        merged_at=datetime.fromisoformat(committed_at),
+        labels=[GitHubEventLabel(name=label) for label in labels],
+    )
+
+
+def list_pull_requests(
+    *,
+    settings: Settings,
+    since_date: Optional[date] = None,
+    since_tag: Optional[str] = None,
+    since_pr: Optional[int] = None,
+    labels_file: Optional[Path] = None,
+    client: Optional["GitHubClient"] = None,
+) -> list[GitHubEventPullRequest]:
+    """
+    List the PRs merged into the current branch from the subjects of its
+    commits, oldest first, without the GitHub API.
+
+    Squash merges are detected by a subject like "Title (#123)" and merge
+    commits by "Merge pull request #123 from user/branch". The labels are read
+    from "Labels:" commit trailers and from the labels file. The authors are
+    read from GitHub noreply emails, or with the client from the GitHub API.
+    """
+    labels_map = read_labels_file(labels_file) if labels_file else {}
+    args = [
+        "git",
+        "log",
+        "--first-parent",
+        f"--format={LOG_FORMAT}%x1e",
+    ]
+    if since_date is not None:
+        args.append(f"--since={since_date.isoformat()} 00:00:00 +0000")
+    args.append(f"{since_tag}..HEAD" if since_tag is not None else "HEAD")
+    # A single git log for all the commits, however many they are
+    output = timing.run(
+        args, check=True, stdout=subprocess.PIPE, encoding="utf-8"
+    ).stdout
+    pull_requests: list[GitHubEventPullRequest] = []
+    numbers: set[int] = set()
+    authors: dict[str, TemplateDataUser] = {}
+    for record in output.split(RECORD_SEPARATOR):
+        if not record.strip():
+            continue
+        pr = parse_commit(
+            record,
+            settings=settings,
+            labels_map=labels_map,
+            authors=authors,
+            client=client,
+        )
+        if pr is None or pr.number in numbers:
+            continue
+        if since_pr is not None and pr.number < since_pr:
+            continue
+        numbers.add(pr.number)
+        pull_requests.append(pr)
+    # git log lists the newest first
+    pull_requests.reverse()
+    return pull_requests
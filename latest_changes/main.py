@@ -1,16 +1,35 @@
+import fnmatch
+import hashlib
 import logging
+import os
+import random
 import re
-import subprocess
+import shutil
 import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Union,
+)
 
-from github import Github
-from github.PullRequest import PullRequest
-from jinja2 import Template
-from pydantic import BaseModel, SecretStr
+from pydantic import BaseModel, ConfigDict, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from . import timing
+
+if TYPE_CHECKING:
+    from .github_client import GitHubClient
+
 COMMIT_MESSAGE = """
 📝 Update release notes
 
@@ -23,12 +42,34 @@ DEFAULT_LATEST_CHANGES_FILES = (
     Path("docs/en/docs/release-notes.md"),
 )
 
+DEFAULT_TEMPLATE_FILE = Path(__file__).parent / "latest-changes.jinja2"
+
+MAX_RETRY_DELAY = 30.0
+
+# The index of the latest changes is kept in the git directory of the clone
+INDEX_FILE_NAME = "latest-changes-index"
+
+REGEX_SPECIAL_CHARACTERS = frozenset(".^$*+?{}[]\\|()")
+WHITESPACE_PATTERN = re.compile(r"\s*")
+# A label between slashes is a RegEx, e.g. "/^area\/.+$/"
+LABEL_REGEX_PATTERN = re.compile(r"^/(?P<regex>.+)/$")
+# A label with this prefix is a glob, e.g. "glob:lang-*"
+LABEL_GLOB_PREFIX = "glob:"
+GLOB_CHARACTERS = frozenset("*?[")
+
 
 class Section(BaseModel):
     label: str
     header: str
 
 
+class LatestChangesTarget(BaseModel):
+    # A path or a glob, e.g. docs/*/docs/release-notes.md
+    file: str
+    template_file: Optional[Path] = None
+    latest_changes_header: Optional[str] = None
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_ignore_empty=True)
 
@@ -37,8 +78,9 @@ class Settings(BaseSettings):
     github_event_name: Optional[str] = None
     input_token: SecretStr
     input_latest_changes_file: Optional[Path] = None
+    input_latest_changes_files: List[Union[LatestChangesTarget, str]] = []
     input_latest_changes_header: str = "## Latest Changes"
-    input_template_file: Path = Path(__file__).parent / "latest-changes.jinja2"
+    input_template_file: Path = DEFAULT_TEMPLATE_FILE
     input_end_regex: str = "^## "
     input_debug_logs: Optional[bool] = False
     input_labels: List[Section] = [
@@ -55,6 +97,44 @@ class Settings(BaseSettings):
     ]
     input_label_header_prefix: str = "### "
     input_skip_labels: List[str] = ["release"]
+    input_duplicates_scope: Literal["release", "file"] = "release"
+    input_number_of_trials: int = 10
+    input_retry_delay: float = 1.0
+    input_commit_backend: Literal["worktree", "plumbing", "api"] = "worktree"
+    input_checkout: bool = False
+    input_catch_up: bool = False
+    github_api_url: str = "https://api.github.com"
+    github_graphql_url: str = "https://api.github.com/graphql"
+    github_server_url: str = "https://github.com"
+    github_ref_name: Optional[str] = None
+    latest_changes_cache_dir: Path = Path(tempfile.gettempdir()) / "latest-changes"
+    latest_changes_index_file: Optional[Path] = None
+    latest_changes_webhook_secret: Optional[SecretStr] = None
+
+
+class TemplateDataUser(BaseModel):
+    login: str
+    html_url: str
+
+
+class TemplateDataPR(BaseModel):
+    number: int
+    title: str
+    html_url: str
+    user: TemplateDataUser
+
+
+class GitHubEventLabel(BaseModel):
+    name: str
+
+
+class GitHubEventPullRequest(TemplateDataPR):
+    # Keep the rest of the payload available to custom templates
+    model_config = ConfigDict(extra="allow")
+
+    merged: bool = False
+    merged_at: Optional[datetime] = None
+    labels: List[GitHubEventLabel] = []
 
 
 class PartialGitHubEventInputs(BaseModel):
@@ -64,28 +144,282 @@ class PartialGitHubEventInputs(BaseModel):
 class PartialGitHubEvent(BaseModel):
     number: Optional[int] = None
     inputs: Optional[PartialGitHubEventInputs] = None
+    pull_request: Optional[GitHubEventPullRequest] = None
 
 
-class TemplateDataUser(BaseModel):
-    login: str
-    html_url: str
+class ReleaseNotesHead(BaseModel):
+    # The content up to the end of the latest changes
+    content: str
+    # Byte offset in the file where the rest starts, None if there's nothing after
+    tail_offset: Optional[int] = None
+    # The line ending of the file, the content always uses "\n"
+    newline: str = "\n"
 
+    def encode(self, content: str) -> bytes:
+        """
+        Encode a new content for this head with the line endings of the file,
+        followed by the line break before the tail when there's one.
+        """
+        return encode_release_notes(
+            content, newline=self.newline, has_tail=self.tail_offset is not None
+        )
 
-class TemplateDataPR(BaseModel):
-    number: int
-    title: str
-    html_url: str
-    user: TemplateDataUser
+
+class PushStats(BaseModel):
+    pushed: bool = False
+    trials: int = 0
+    rebased: int = 0
+    regenerated: int = 0
+    waited: float = 0.0
 
 
 class SectionContent(BaseModel):
     label: str
     header: str
-    content: str
+    content: str = ""
     index: int
+    content_start: int = -1
+    content_end: int = -1
+
+
+class ContentIndex(BaseModel):
+    # A hash of the content and of the settings used to index it, when cached
+    key: str = ""
+    header_end: int
+    release_end: int
+    # Offsets in the release content, the contents are not stored in the cache
+    sections: List[SectionContent]
+    # The PRs already added, depending on the duplicates scope
+    pr_numbers: List[int]
+
+
+class LatestChangesParts(BaseModel):
+    pre_header_content: str
+    release_content: str
+    post_release_content: str
+    # Where to look for PRs already added, depending on the duplicates scope
+    duplicates_content: str
+    sections: List[SectionContent]
 
 
-logging.basicConfig(level=logging.INFO)
+BatchOutcome = Literal["inserted", "duplicate", "skipped"]
+
+
+class BatchEntry(BaseModel):
+    pr: TemplateDataPR
+    labels: List[str] = []
+
+
+class BatchResult(BaseModel):
+    content: str
+    # One for each entry, in the same order
+    outcomes: List[BatchOutcome]
+
+
+class FileUpdate(BaseModel):
+    # The settings for this file, e.g. with its own template and header
+    settings: Settings
+    path: Path
+    update: Callable[[str], str]
+
+
+class LinePattern:
+    """
+    A pattern searched with re.MULTILINE, using str.find for plain literals.
+
+    A search behaves like re.search() on text[pos:endpos], so a leading ^ also
+    matches at pos, but the positions returned are relative to the full text.
+    """
+
+    def __init__(self, regex: str) -> None:
+        self.regex = re.compile(regex, flags=re.MULTILINE)
+        self.anchored = regex.startswith("^")
+        literal = regex[1:] if self.anchored else regex
+        self.literal: Optional[str] = (
+            literal if literal and not set(literal) & REGEX_SPECIAL_CHARACTERS else None
+        )
+
+    @classmethod
+    def line_prefix(cls, prefix: str) -> "LinePattern":
+        pattern = cls(f"^{re.escape(prefix)}")
+        pattern.literal = prefix
+        return pattern
+
+    def search(
+        self, text: str, pos: int = 0, endpos: Optional[int] = None
+    ) -> Optional[tuple[int, int]]:
+        if endpos is None:
+            endpos = len(text)
+        if self.literal is None:
+            match = self.regex.search(text[pos:endpos])
+            if not match:
+                return None
+            return pos + match.start(), pos + match.end()
+        if not self.anchored:
+            start = text.find(self.literal, pos, endpos)
+        elif text.startswith(self.literal, pos, endpos):
+            start = pos
+        else:
+            start = text.find(f"\n{self.literal}", pos, endpos)
+            if start != -1:
+                start += 1
+        if start == -1:
+            return None
+        return start, start + len(self.literal)
+
+
+def get_label_regex(label: str) -> Optional[str]:
+    """
+    Get the RegEx for a label pattern, a glob like "glob:lang-*" or a RegEx
+    between slashes like "/^area\\/.+$/", or None for a plain label.
+
+    Other labels are always plain, even with glob characters, like "[bot]".
+    """
+    if match := LABEL_REGEX_PATTERN.match(label):
+        return match["regex"]
+    if label.startswith(LABEL_GLOB_PREFIX):
+        return fnmatch.translate(label.removeprefix(LABEL_GLOB_PREFIX))
+    return None
+
+
+class LabelMatcher:
+    """
+    Find the first configured label, or label pattern, that matches a PR label.
+
+    Plain labels are looked up in a dict, and all the patterns are compiled in a
+    single RegEx, so the cost depends on the PR labels, not on the configuration.
+    """
+
+    def __init__(self, labels: Iterable[str]) -> None:
+        self.exact: dict[str, int] = {}
+        regexes: list[str] = []
+        # The number of the group of each pattern, to its index in the labels
+        self.group_indexes: dict[int, int] = {}
+        group = 1
+        for index, label in enumerate(labels):
+            regex = get_label_regex(label)
+            if regex is None:
+                self.exact.setdefault(label, index)
+                continue
+            regexes.append(f"({regex})")
+            self.group_indexes[group] = index
+            group += 1 + re.compile(regex).groups
+        self.regex = re.compile("|".join(regexes)) if regexes else None
+        self.cache: dict[str, Optional[int]] = {}
+
+    def get_index(self, label: str) -> Optional[int]:
+        """
+        Get the index of the first configured label matching the PR label.
+        """
+        if label in self.cache:
+            return self.cache[label]
+        index = self.exact.get(label)
+        if self.regex is not None and (match := self.regex.fullmatch(label)):
+            # Alternatives are tried in order, the first one matching is the
+            # first configured pattern, the outer group is the last one closed
+            pattern_index = self.group_indexes[match.lastindex or 0]
+            index = pattern_index if index is None else min(index, pattern_index)
+        self.cache[label] = index
+        return index
+
+    def find(self, labels: Iterable[str]) -> Optional[int]:
+        """
+        Get the index of the first configured label matching any of the PR labels.
+        """
+        indexes = [
+            index for label in labels if (index := self.get_index(label)) is not None
+        ]
+        return min(indexes) if indexes else None
+
+
+@lru_cache
+def get_label_matcher(labels: tuple[str, ...]) -> LabelMatcher:
+    return LabelMatcher(labels)
+
+
+def matches_skip_labels(
+    labels: Iterable[str], *, skip: LabelMatcher, include: LabelMatcher
+) -> bool:
+    return any(
+        skip.get_index(label) is not None and include.get_index(label) is None
+        for label in labels
+    )
+
+
+class ContentPlan:
+    """
+    The patterns used by generate_content(), compiled once per configuration.
+    """
+
+    def __init__(
+        self,
+        *,
+        latest_changes_header: str,
+        end_regex: str,
+        label_header_prefix: str,
+        labels: tuple[tuple[str, str], ...],
+        skip_labels: tuple[str, ...] = (),
+        github_repository: str,
+    ) -> None:
+        self.header = LinePattern(latest_changes_header)
+        self.end = LinePattern(end_regex)
+        self.label_header_prefix = LinePattern.line_prefix(label_header_prefix)
+        self.sections_by_header: dict[str, Section] = {}
+        # The first configured label of a PR decides its section
+        self.label_priority: dict[str, int] = {}
+        for index, (label, header) in enumerate(labels):
+            self.sections_by_header.setdefault(
+                header, Section(label=label, header=header)
+            )
+            self.label_priority.setdefault(label, index)
+        self.label_order = tuple(label for label, _ in labels)
+        self.labels = get_label_matcher(self.label_order)
+        self.skip_labels = get_label_matcher(skip_labels)
+        self.pr_link = re.compile(rf"/{re.escape(github_repository)}/pull/(\d+)\b")
+
+    def find_pr_numbers(self, text: str) -> set[int]:
+        return {int(number) for number in self.pr_link.findall(text)}
+
+    def get_label(self, labels: Iterable[str]) -> Optional[str]:
+        """
+        Get the configured label (or label pattern) of the section for a PR.
+        """
+        index = self.labels.find(labels)
+        return self.label_order[index] if index is not None else None
+
+    def should_skip(self, labels: Iterable[str]) -> bool:
+        return matches_skip_labels(labels, skip=self.skip_labels, include=self.labels)
+
+
+@lru_cache
+def build_content_plan(
+    *,
+    latest_changes_header: str,
+    end_regex: str,
+    label_header_prefix: str,
+    labels: tuple[tuple[str, str], ...],
+    skip_labels: tuple[str, ...] = (),
+    github_repository: str,
+) -> ContentPlan:
+    return ContentPlan(
+        latest_changes_header=latest_changes_header,
+        end_regex=end_regex,
+        label_header_prefix=label_header_prefix,
+        labels=labels,
+        skip_labels=skip_labels,
+        github_repository=github_repository,
+    )
+
+
+def get_content_plan(settings: Settings) -> ContentPlan:
+    return build_content_plan(
+        latest_changes_header=settings.input_latest_changes_header,
+        end_regex=settings.input_end_regex,
+        label_header_prefix=settings.input_label_header_prefix,
+        labels=tuple((label.label, label.header) for label in settings.input_labels),
+        skip_labels=tuple(settings.input_skip_labels),
+        github_repository=settings.github_repository,
+    )
 
 
 def find_latest_changes_file(settings: Settings) -> Path:
@@ -100,82 +434,400 @@ def find_latest_changes_file(settings: Settings) -> Path:
     )
 
 
+def find_latest_changes_targets(settings: Settings) -> list[tuple[Path, Settings]]:
+    """
+    Get the files to update, each with its own settings, from the targets in
+    latest_changes_files, or the single latest changes file.
+
+    Globs are expanded relative to the current directory. When a file matches
+    several targets, the first one is used.
+    """
+    if not settings.input_latest_changes_files:
+        return [(find_latest_changes_file(settings), settings)]
+    targets: dict[Path, Settings] = {}
+    index_file = get_index_file(settings)
+    for target in settings.input_latest_changes_files:
+        if isinstance(target, str):
+            target = LatestChangesTarget(file=target)
+        if set(target.file) & GLOB_CHARACTERS:
+            paths = sorted(path for path in Path().glob(target.file) if path.is_file())
+        else:
+            paths = [Path(target.file)]
+        for path in paths:
+            if path in targets:
+                continue
+            update = {"input_latest_changes_file": path}
+            if index_file is not None:
+                # Each file has its own cached index
+                path_hash = hashlib.sha256(str(path).encode("utf-8")).hexdigest()
+                update["latest_changes_index_file"] = index_file.with_name(
+                    f"{index_file.name}-{path_hash[:16]}"
+                )
+            if target.template_file is not None:
+                update["input_template_file"] = target.template_file
+            if target.latest_changes_header is not None:
+                update["input_latest_changes_header"] = target.latest_changes_header
+            targets[path] = settings.model_copy(update=update)
+    if not targets:
+        raise RuntimeError(
+            f"No latest changes file was found for: {settings.input_latest_changes_files}"
+        )
+    return list(targets.items())
+
+
 def should_skip_labels(
     *, labels: list[str], skip_labels: list[str], include_labels: list[str]
 ) -> bool:
-    effective_skip_labels = set(skip_labels) - set(include_labels)
-    return bool(set(labels) & effective_skip_labels)
+    """
+    Check if any of the labels matches a skip label and doesn't match an
+    included label, both can be label patterns.
+    """
+    return matches_skip_labels(
+        labels,
+        skip=get_label_matcher(tuple(skip_labels)),
+        include=get_label_matcher(tuple(include_labels)),
+    )
 
 
-def generate_content(
-    *,
-    content: str,
-    settings: Settings,
-    pr: Union[PullRequest, TemplateDataPR],
-    labels: list[str],
-) -> str:
-    header_match = re.search(
-        settings.input_latest_changes_header, content, flags=re.MULTILINE
+def render_default_template(pr: TemplateDataPR) -> str:
+    # The default template (latest-changes.jinja2) compiled by hand, so the
+    # default configuration doesn't need to load Jinja2
+    return (
+        f"* {pr.title}. PR [#{pr.number}]({pr.html_url}) "
+        f"by [@{pr.user.login}]({pr.user.html_url})."
+    )
+
+
+def render_message(*, pr: TemplateDataPR, settings: Settings) -> str:
+    if settings.input_template_file == DEFAULT_TEMPLATE_FILE:
+        return render_default_template(pr)
+    from .templates import get_template
+
+    template = get_template(
+        settings.input_template_file,
+        cache_dir=settings.latest_changes_cache_dir / "jinja2",
     )
+    return template.render(pr=pr)
+
+
+def find_sections(*, release_content: str, plan: ContentPlan) -> list[SectionContent]:
+    """
+    Find the configured label sections in a single scan of the release content.
+
+    Every label header prefix line ends the section before it, configured or not.
+    Only the first section for each label is used.
+    """
+    sections: list[SectionContent] = []
+    found_labels: set[str] = set()
+    previous_section: Optional[SectionContent] = None
+    pos = 0
+    while header_match := plan.label_header_prefix.search(release_content, pos):
+        header_start, header_text_start = header_match
+        line_end = release_content.find("\n", header_text_start)
+        if line_end == -1:
+            line_end = len(release_content)
+        if previous_section is not None:
+            previous_section.content_end = header_start
+            previous_section.content = release_content[
+                previous_section.content_start : header_start
+            ].strip()
+            previous_section = None
+        pos = line_end
+        header = release_content[header_text_start:line_end].rstrip()
+        label = plan.sections_by_header.get(header)
+        if label is None or label.label in found_labels:
+            continue
+        found_labels.add(label.label)
+        previous_section = SectionContent(
+            label=label.label,
+            header=label.header,
+            content="",
+            index=header_start,
+            content_start=line_end,
+        )
+        sections.append(previous_section)
+    if previous_section is not None:
+        previous_section.content_end = len(release_content)
+        previous_section.content = release_content[
+            previous_section.content_start :
+        ].strip()
+    return sections
+
+
+def parse_release_notes_head(
+    raw_lines: Iterable[bytes], settings: Settings
+) -> ReleaseNotesHead:
+    """
+    Decode the lines of the file only up to the end of the latest changes.
+
+    The rest of the lines are not consumed nor decoded, only the byte offset
+    where they start is returned, to be written back as is. The header and end
+    RegExes are matched line by line. When duplicates are checked in the whole
+    file, all the lines are decoded.
+
+    The content uses "\n", the line ending of the first line is kept to write
+    the new content back with the same line endings as the tail.
+    """
+    plan = get_content_plan(settings)
+    read_all = settings.input_duplicates_scope == "file"
+    lines: list[str] = []
+    offset = 0
+    header_found = False
+    release_started = False
+    newline: Optional[str] = None
+    for raw_line in raw_lines:
+        if newline is None:
+            newline = "\r\n" if raw_line.endswith(b"\r\n") else "\n"
+        line = raw_line.decode("utf-8").replace("\r\n", "\n")
+        pos = 0
+        if not header_found:
+            header_match = plan.header.search(line)
+            if header_match:
+                header_found = True
+                pos = header_match[1]
+        if header_found and not release_started and not read_all:
+            pos = WHITESPACE_PATTERN.match(line, pos).end()
+            release_started = pos < len(line)
+        if release_started and (end_match := plan.end.search(line, pos)):
+            lines.append(line[: end_match[0]])
+            tail_offset = offset + len(line[: end_match[0]].encode("utf-8"))
+            return ReleaseNotesHead(
+                content="".join(lines), tail_offset=tail_offset, newline=newline
+            )
+        lines.append(line)
+        offset += len(raw_line)
+    return ReleaseNotesHead(content="".join(lines), newline=newline or "\n")
+
+
+def read_release_notes_head(path: Path, settings: Settings) -> ReleaseNotesHead:
+    with path.open("rb") as file:
+        return parse_release_notes_head(file, settings)
+
+
+def copy_file_tail(source: BinaryIO, destination: BinaryIO, offset: int) -> None:
+    """
+    Append the source file from offset to the destination, copying in the kernel
+    with copy_file_range() or sendfile() when available.
+    """
+    source.flush()
+    destination.flush()
+    source_fd = source.fileno()
+    destination_fd = destination.fileno()
+    end = os.fstat(source_fd).st_size
+
+    def copy_file_range(start: int) -> int:
+        return os.copy_file_range(source_fd, destination_fd, end - start, start)
+
+    def sendfile(start: int) -> int:
+        return os.sendfile(destination_fd, source_fd, start, end - start)
+
+    for kernel_copy in (copy_file_range, sendfile):
+        try:
+            while offset < end:
+                copied = kernel_copy(offset)
+                if not copied:
+                    break
+                offset += copied
+        except (AttributeError, OSError):
+            continue
+        if offset >= end:
+            return
+    source.seek(offset)
+    shutil.copyfileobj(source, destination)
+
+
+def encode_release_notes(
+    content: str, *, newline: str = "\n", has_tail: bool = False
+) -> bytes:
+    """
+    Encode the content with the newline line endings, followed by the line
+    break before the rest of the file when it has a tail.
+    """
+    if has_tail:
+        content += "\n"
+    if newline != "\n":
+        content = content.replace("\n", newline)
+    return content.encode("utf-8")
+
+
+def write_release_notes(
+    path: Path, *, content: str, tail_offset: Optional[int] = None, newline: str = "\n"
+) -> None:
+    """
+    Write the new content, followed by the rest of the file from tail_offset,
+    with the line endings of the file.
+
+    It's written to a temporary file next to it that then replaces it, so the
+    file is never left half written. A symlink is resolved first, so the file
+    it points to is the one replaced.
+    """
+    path = path.resolve()
+    fd, temp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(
+                encode_release_notes(
+                    content, newline=newline, has_tail=tail_offset is not None
+                )
+            )
+            if tail_offset is not None:
+                with path.open("rb") as file:
+                    copy_file_tail(file, temp_file, tail_offset)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        shutil.copymode(path, temp_name)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def get_content_key(*, content: str, settings: Settings) -> str:
+    digest = hashlib.sha256()
+    digest.update(
+        repr(
+            (
+                settings.input_latest_changes_header,
+                settings.input_end_regex,
+                settings.input_label_header_prefix,
+                [(label.label, label.header) for label in settings.input_labels],
+                settings.input_duplicates_scope,
+                settings.github_repository,
+            )
+        ).encode("utf-8")
+    )
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def index_content(*, content: str, settings: Settings) -> ContentIndex:
+    plan = get_content_plan(settings)
+    header_match = plan.header.search(content)
     if not header_match:
         raise RuntimeError(
             f"The latest changes file at: {settings.input_latest_changes_file} doesn't seem to contain the header RegEx: {settings.input_latest_changes_header}"
         )
-    template_content = settings.input_template_file.read_text("utf-8")
-    template = Template(template_content)
-    message = template.render(pr=pr)
-    if message in content:
-        raise RuntimeError(
-            f"It seems these PR's latest changes were already added: {pr.number}"
-        )
-    pre_header_content = content[: header_match.end()].strip()
-    post_header_content = content[header_match.end() :].strip()
-    next_release_match = re.search(
-        settings.input_end_regex, post_header_content, flags=re.MULTILINE
+    header_end = header_match[1]
+    post_header_start = WHITESPACE_PATTERN.match(content, header_end).end()
+    next_release_match = plan.end.search(content, post_header_start)
+    release_end = len(content) if not next_release_match else next_release_match[0]
+    release_content = content[header_end:release_end].strip()
+    duplicates_content = (
+        content if settings.input_duplicates_scope == "file" else release_content
     )
-    release_end = (
-        len(content)
-        if not next_release_match
-        else header_match.end() + next_release_match.start()
+    sections = find_sections(release_content=release_content, plan=plan)
+    return ContentIndex(
+        header_end=header_end,
+        release_end=release_end,
+        sections=sections,
+        pr_numbers=sorted(plan.find_pr_numbers(duplicates_content)),
     )
-    release_content = content[header_match.end() : release_end].strip()
-    post_release_content = content[release_end:].strip()
-    sections: list[SectionContent] = []
+
+
+def get_index_file(settings: Settings) -> Optional[Path]:
+    """
+    Get the file to keep the index of the latest changes between runs.
+
+    By default it's in the .git directory, so it's kept as long as the clone
+    (e.g. in self-hosted runners, or with the webhook server), and it's never
+    committed. Without a clone (e.g. with the api backend), there's none.
+    """
+    if settings.latest_changes_index_file is not None:
+        return settings.latest_changes_index_file
+    git_dir = Path(".git")
+    if git_dir.is_dir():
+        return git_dir / INDEX_FILE_NAME
+    return None
+
+
+def load_content_index(
+    *, content: str, settings: Settings, key: Optional[str] = None
+) -> ContentIndex:
+    """
+    Get the index of the content from the sidecar cache file, or create it.
+
+    The content is usually only the head of the file, up to the end of the
+    latest changes, so changes below it (in previous releases) keep the index.
+    The key can be passed when it was already computed.
+    """
+    path = get_index_file(settings)
+    if path is None:
+        # Without a place to keep it, don't pay for the hash
+        index = index_content(content=content, settings=settings)
+        if key is not None:
+            index.key = key
+        return index
+    if key is None:
+        key = get_content_key(content=content, settings=settings)
+    try:
+        index = ContentIndex.model_validate_json(path.read_bytes())
+    except (OSError, ValueError):
+        index = None
+    if index is not None and index.key == key:
+        logging.info("Using the cached index of the latest changes")
+        return index
+    index = index_content(content=content, settings=settings)
+    index.key = key
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".index-")
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            temp_file.write(
+                index.model_dump_json(exclude={"sections": {"__all__": {"content"}}})
+            )
+        os.replace(temp_name, path)
+    except OSError:
+        logging.warning(f"Could not write the index cache file: {path}")
+    return index
+
+
+def split_latest_changes(
+    *, content: str, settings: Settings, index: Optional[ContentIndex] = None
+) -> LatestChangesParts:
+    if index is None:
+        index = index_content(content=content, settings=settings)
+    release_content = content[index.header_end : index.release_end].strip()
+    for section in index.sections:
+        section.content = release_content[
+            section.content_start : section.content_end
+        ].strip()
+    return LatestChangesParts(
+        pre_header_content=content[: index.header_end].strip(),
+        release_content=release_content,
+        post_release_content=content[index.release_end :].strip(),
+        duplicates_content=(
+            content if settings.input_duplicates_scope == "file" else release_content
+        ),
+        sections=index.sections,
+    )
+
+
+def build_content(
+    *,
+    parts: LatestChangesParts,
+    settings: Settings,
+    messages: list[tuple[str, list[str]]],
+) -> str:
+    """
+    Add the messages, each with its PR labels, on top of their sections.
+
+    The last message ends up first, the same as adding them one by one.
+    """
+    plan = get_content_plan(settings)
+    release_content = parts.release_content
+    new_messages: dict[Optional[str], list[str]] = {}
+    for message, labels in reversed(messages):
+        new_messages.setdefault(plan.get_label(labels), []).append(message)
+    sections = parts.sections
     sectionless_content = ""
-    for label in settings.input_labels:
-        label_match = re.search(
-            f"^{settings.input_label_header_prefix}{label.header}",
-            release_content,
-            flags=re.MULTILINE,
-        )
-        if not label_match:
-            continue
-        next_label_match = re.search(
-            f"^{settings.input_label_header_prefix}",
-            release_content[label_match.end() :],
-            flags=re.MULTILINE,
-        )
-        label_section_end = (
-            len(release_content)
-            if not next_label_match
-            else label_match.end() + next_label_match.start()
-        )
-        label_content = release_content[label_match.end() : label_section_end].strip()
-        section = SectionContent(
-            label=label.label,
-            header=label.header,
-            content=label_content,
-            index=label_match.start(),
-        )
-        sections.append(section)
-    sections.sort(key=lambda x: x.index)
     sections_keys = {section.label: section for section in sections}
     if not sections:
         sectionless_content = release_content
     elif sections[0].index > 0:
         sectionless_content = release_content[: sections[0].index].strip()
     new_sections: list[SectionContent] = []
-    found = False
     for label in settings.input_labels:
         if label.label in sections_keys:
             section = sections_keys[label.label]
@@ -187,128 +839,501 @@ def generate_content(
                 index=-1,
             )
             sections_keys[label.label] = section
-        if label.label in labels and not found:
-            found = True
-            section.content = f"{message}\n{section.content}".strip()
+        section_messages = new_messages.pop(label.label, None)
+        if section_messages:
+            section.content = "\n".join([*section_messages, section.content]).strip()
         new_sections.append(section)
-    if not found:
+    sectionless_messages = new_messages.get(None)
+    if sectionless_messages:
         if sectionless_content:
-            sectionless_content = f"{message}\n{sectionless_content}"
-        else:
-            sectionless_content = f"{message}"
-    new_release_content = ""
-    if sectionless_content:
-        new_release_content = f"{sectionless_content}"
-    use_sections = [
+            sectionless_messages.append(sectionless_content)
+        sectionless_content = "\n".join(sectionless_messages)
+    content_parts = [parts.pre_header_content, sectionless_content]
+    content_parts.extend(
         f"{settings.input_label_header_prefix}{section.header}\n\n{section.content}"
         for section in new_sections
         if section.content
-    ]
-    updated_content = "\n\n".join(use_sections)
-    if new_release_content:
-        if updated_content:
-            new_release_content += f"\n\n{updated_content}"
+    )
+    content_parts.append(parts.post_release_content)
+    content_parts = [part for part in content_parts if part]
+    content_parts[0] = content_parts[0].lstrip()
+    content_parts[-1] = content_parts[-1].rstrip()
+    return "\n\n".join(content_parts) + "\n"
+
+
+def generate_content(
+    *,
+    content: str,
+    settings: Settings,
+    pr: TemplateDataPR,
+    labels: list[str],
+    pr_numbers: Optional[set[int]] = None,
+    index: Optional[ContentIndex] = None,
+) -> str:
+    """
+    Add the message for the PR to the latest changes in the content.
+
+    pr_numbers is the index of PRs already listed, used to detect duplicates. By
+    default it's built from the PR links in the latest changes (or in the whole
+    content, depending on settings.input_duplicates_scope). The same set can be
+    passed again for later calls with the new content, the PR is added to it.
+
+    index is the index of the content, e.g. from load_content_index(), by
+    default the content is scanned.
+    """
+    if index is None:
+        index = index_content(content=content, settings=settings)
+    parts = split_latest_changes(content=content, settings=settings, index=index)
+    if pr_numbers is None:
+        pr_numbers = set(index.pr_numbers)
+    message = render_message(pr=pr, settings=settings)
+    if pr.number in pr_numbers or message in parts.duplicates_content:
+        raise RuntimeError(
+            f"It seems these PR's latest changes were already added: {pr.number}"
+        )
+    pr_numbers.add(pr.number)
+    return build_content(parts=parts, settings=settings, messages=[(message, labels)])
+
+
+def generate_content_batch(
+    *,
+    content: str,
+    settings: Settings,
+    entries: list[BatchEntry],
+    pr_numbers: Optional[set[int]] = None,
+    index: Optional[ContentIndex] = None,
+) -> BatchResult:
+    """
+    Add the messages for many PRs, parsing and building the content only once.
+
+    The result is the same as calling generate_content() for each entry in
+    order, except that PRs already listed are reported as "duplicate" and PRs
+    with skip labels as "skipped" instead of raising. When nothing is inserted,
+    the content is returned as is.
+    """
+    if index is None:
+        index = index_content(content=content, settings=settings)
+    parts = split_latest_changes(content=content, settings=settings, index=index)
+    if pr_numbers is None:
+        pr_numbers = set(index.pr_numbers)
+    plan = get_content_plan(settings)
+    messages: list[tuple[str, list[str]]] = []
+    new_messages: set[str] = set()
+    outcomes: list[BatchOutcome] = []
+    for entry in entries:
+        if plan.should_skip(entry.labels):
+            outcomes.append("skipped")
+            continue
+        message = render_message(pr=entry.pr, settings=settings)
+        if (
+            entry.pr.number in pr_numbers
+            or message in new_messages
+            or message in parts.duplicates_content
+        ):
+            outcomes.append("duplicate")
+            continue
+        pr_numbers.add(entry.pr.number)
+        new_messages.add(message)
+        messages.append((message, entry.labels))
+        outcomes.append("inserted")
+    if messages:
+        content = build_content(parts=parts, settings=settings, messages=messages)
+    return BatchResult(content=content, outcomes=outcomes)
+
+
+def get_retry_delay(*, trial: int, base_delay: float) -> float:
+    # Exponential backoff with full jitter, so racing runs spread out
+    return random.uniform(0, min(MAX_RETRY_DELAY, base_delay * 2**trial))
+
+
+def pull_latest_changes(settings: Settings) -> None:
+    if settings.input_checkout:
+        from .checkout import refresh
+
+        refresh(Path.cwd())
     else:
-        new_release_content = updated_content
+        timing.run(["git", "pull"], check=True)
 
-    new_content = (
-        f"{pre_header_content}\n\n{new_release_content}\n\n{post_release_content}".strip()
-        + "\n"
-    )
-    return new_content
 
+def apply_file_update(file_update: FileUpdate) -> bool:
+    """
+    Apply the update to the release notes file, return if it changed.
+    """
+    with timing.metrics.span("read release notes"):
+        head = read_release_notes_head(file_update.path, file_update.settings)
+    with timing.metrics.span("generate_content"):
+        new_content = file_update.update(head.content)
+    if new_content == head.content:
+        return False
+    with timing.metrics.span("write release notes"):
+        write_release_notes(
+            file_update.path,
+            content=new_content,
+            tail_offset=head.tail_offset,
+            newline=head.newline,
+        )
+    return True
 
-def main() -> None:
-    # Ref: https://github.com/actions/runner/issues/2033
+
+def apply_file_updates(updates: list[FileUpdate]) -> list[Path]:
+    """
+    Apply the updates, in a thread pool when there are several files, and
+    return the files that changed.
+    """
+    if len(updates) == 1:
+        changed = [apply_file_update(updates[0])]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(len(updates), 8)) as executor:
+            changed = list(executor.map(apply_file_update, updates))
+    return [
+        file_update.path
+        for file_update, file_changed in zip(updates, changed)
+        if file_changed
+    ]
+
+
+def commit_and_push_files(
+    *, settings: Settings, updates: list[FileUpdate]
+) -> PushStats:
+    """
+    Apply the updates to the release notes files, commit all of them together,
+    and push, retrying on push races.
+
+    When a push is rejected, wait with backoff and rebase the commit on top of
+    the new changes. Only when that conflicts (e.g. another run added its
+    message in the same place) the commit is dropped and generated again.
+    """
+    stats = PushStats()
     logging.info(
-        "GitHub Actions workaround for git in containers, ref: https://github.com/actions/runner/issues/2033"
+        f"Number of trials (for race conditions): {settings.input_number_of_trials}"
+    )
+    regenerate = True
+    for trial in range(settings.input_number_of_trials):
+        logging.info(f"Running trial: {trial}")
+        stats.trials += 1
+        with timing.metrics.span(f"trial {trial}"):
+            if regenerate:
+                # The managed checkout was just fetched by setup_checkout()
+                if trial > 0 or not settings.input_checkout:
+                    logging.info(
+                        "Pulling the latest changes, including the latest merged PR (this one)"
+                    )
+                    pull_latest_changes(settings)
+                changed_files = apply_file_updates(updates)
+                if not changed_files:
+                    logging.info("There are no changes to commit")
+                    stats.pushed = True
+                    break
+                files = ", ".join(str(path) for path in changed_files)
+                logging.info(f"Committing changes to: {files}")
+                timing.run(
+                    ["git", "add", *(str(path) for path in changed_files)], check=True
+                )
+                timing.run(["git", "commit", "-m", COMMIT_MESSAGE], check=True)
+            logging.info(f"Pushing changes: {files}")
+            result = timing.run(["git", "push"])
+        if result.returncode == 0:
+            stats.pushed = True
+            break
+        if trial + 1 == settings.input_number_of_trials:
+            break
+        # Didn't work, race condition, wait and try again
+        delay = get_retry_delay(trial=trial, base_delay=settings.input_retry_delay)
+        logging.info(f"That didn't work, waiting {delay:.2f}s before trying again")
+        time.sleep(delay)
+        stats.waited += delay
+        if settings.input_checkout:
+            # The shallow checkout is refreshed and the changes generated again
+            stats.regenerated += 1
+            regenerate = True
+            continue
+        rebase_result = timing.run(["git", "pull", "--rebase"])
+        if rebase_result.returncode == 0:
+            stats.rebased += 1
+            regenerate = False
+            continue
+        logging.info(
+            "The rebase had conflicts, resetting to generate the changes again"
+        )
+        timing.run(["git", "rebase", "--abort"])
+        timing.run(["git", "reset", "HEAD^1"], check=True)
+        timing.run(["git", "checkout", "."], check=True)
+        stats.regenerated += 1
+        regenerate = True
+    return stats
+
+
+def commit_and_push_changes(
+    *,
+    settings: Settings,
+    latest_changes_file: Path,
+    update: Callable[[str], str],
+) -> PushStats:
+    """
+    Apply update to the release notes, commit, and push, retrying on push races.
+    """
+    return commit_and_push_files(
+        settings=settings,
+        updates=[
+            FileUpdate(settings=settings, path=latest_changes_file, update=update)
+        ],
     )
-    safe_directory_config_content = "[safe]\n\tdirectory = /github/workspace"
-    dotgitconfig_path = Path.home() / ".gitconfig"
-    dotgitconfig_path.write_text(safe_directory_config_content)
 
-    settings = Settings()
-    try:
-        latest_changes_file = find_latest_changes_file(settings)
-    except RuntimeError as error:
-        logging.error(str(error))
+
+def commit_and_push(
+    *,
+    settings: Settings,
+    latest_changes_file: Path,
+    pr: TemplateDataPR,
+    labels: list[str],
+) -> PushStats:
+    """
+    Add the PR to the release notes, commit, and push, retrying on push races.
+    """
+    return commit_and_push_changes(
+        settings=settings,
+        latest_changes_file=latest_changes_file,
+        update=lambda content: generate_content(
+            content=content,
+            settings=settings,
+            pr=pr,
+            labels=labels,
+            index=load_content_index(content=content, settings=settings),
+        ),
+    )
+
+
+def add_pull_request(
+    content: str, *, settings: Settings, pr: TemplateDataPR, labels: list[str]
+) -> str:
+    """
+    Add the PR to the content, or return the content as is if it's already there.
+    """
+    return generate_content_batch(
+        content=content,
+        settings=settings,
+        entries=[BatchEntry(pr=pr, labels=labels)],
+        index=load_content_index(content=content, settings=settings),
+    ).content
+
+
+def commit_and_push_targets(
+    *,
+    settings: Settings,
+    targets: list[tuple[Path, Settings]],
+    pr: TemplateDataPR,
+    labels: list[str],
+) -> PushStats:
+    """
+    Add the PR to all the release notes files, each with its own settings, in
+    a single commit.
+
+    A file that already has the PR is left as is.
+    """
+    return commit_and_push_files(
+        settings=settings,
+        updates=[
+            FileUpdate(
+                settings=target_settings,
+                path=path,
+                update=partial(
+                    add_pull_request, settings=target_settings, pr=pr, labels=labels
+                ),
+            )
+            for path, target_settings in targets
+        ],
+    )
+
+
+def get_pr_base_branch(pr: TemplateDataPR) -> Optional[str]:
+    """
+    Get the base branch of the PR from the event payload (or the API), if it's there.
+    """
+    base = (pr.model_extra or {}).get("base")
+    if isinstance(base, dict) and isinstance(base.get("ref"), str):
+        return base["ref"]
+    return None
+
+
+def create_github_client(settings: Settings) -> "GitHubClient":
+    from .github_client import GitHubClient
+
+    return GitHubClient(
+        token=settings.input_token.get_secret_value(),
+        base_url=settings.github_api_url,
+        graphql_url=settings.github_graphql_url,
+    )
+
+
+def update_latest_changes() -> None:
+    with timing.metrics.span("load settings"):
+        settings = Settings()
+    use_git = settings.input_commit_backend != "api"
+    if settings.input_latest_changes_files and (
+        settings.input_commit_backend != "worktree" or settings.input_catch_up
+    ):
+        logging.error(
+            "The latest_changes_files configuration is only supported with the worktree commit backend, without catch_up"
+        )
+        sys.exit(1)
+    if settings.input_catch_up and settings.input_commit_backend != "worktree":
+        logging.error(
+            "The catch_up mode is only supported with the worktree commit backend"
+        )
         sys.exit(1)
+    if use_git:
+        # Ref: https://github.com/actions/runner/issues/2033
+        logging.info(
+            "GitHub Actions workaround for git in containers, ref: https://github.com/actions/runner/issues/2033"
+        )
+        safe_directory_config_content = "[safe]\n\tdirectory = /github/workspace"
+        dotgitconfig_path = Path.home() / ".gitconfig"
+        dotgitconfig_path.write_text(safe_directory_config_content)
+        if settings.input_checkout:
+            from .checkout import setup_checkout
+
+            with timing.metrics.span("checkout"):
+                os.chdir(setup_checkout(settings))
+        try:
+            targets = find_latest_changes_targets(settings)
+        except RuntimeError as error:
+            logging.error(str(error))
+            sys.exit(1)
+        latest_changes_file = targets[0][0]
     if settings.input_debug_logs:
         logging.info(f"Using config: {settings.json()}")
-    g = Github(settings.input_token.get_secret_value())
-    repo = g.get_repo(settings.github_repository)
     if not settings.github_event_path.is_file():
         logging.error(f"No event file was found at: {settings.github_event_path}")
         sys.exit(1)
-    contents = settings.github_event_path.read_text()
-    event = PartialGitHubEvent.model_validate_json(contents)
-    if event.number is not None:
-        number = event.number
-    elif event.inputs and event.inputs.number:
-        number = event.inputs.number
+    with timing.metrics.span("parse event"):
+        contents = settings.github_event_path.read_text()
+        event = PartialGitHubEvent.model_validate_json(contents)
+    if event.pull_request is not None:
+        logging.info("Using the PR data from the event payload")
+        pr = event.pull_request
     else:
-        logging.error(
-            f"No PR number was found (PR number or workflow input) in the event file at: {settings.github_event_path}"
-        )
-        sys.exit(1)
-
-    pr = repo.get_pull(number)
+        if event.number is not None:
+            number = event.number
+        elif event.inputs and event.inputs.number:
+            number = event.inputs.number
+        else:
+            logging.error(
+                f"No PR number was found (PR number or workflow input) in the event file at: {settings.github_event_path}"
+            )
+            sys.exit(1)
+        logging.info(f"Fetching the PR data from the GitHub API: {number}")
+        client = create_github_client(settings)
+        try:
+            with timing.metrics.span("GitHub API fetch"):
+                pr = client.get_pull_request(
+                    repository=settings.github_repository, number=number
+                )
+        except RuntimeError as error:
+            logging.error(str(error))
+            sys.exit(1)
+        finally:
+            client.close()
+    pr_labels = [label.name for label in pr.labels]
     if not pr.merged:
         logging.info("The PR was not merged, nothing else to do.")
         sys.exit(0)
-    pr_labels = [label.name for label in pr.labels]
-    if should_skip_labels(
-        labels=pr_labels,
-        skip_labels=settings.input_skip_labels,
-        include_labels=[label.label for label in settings.input_labels],
-    ):
+    if settings.input_catch_up:
+        from . import catch_up
+
+        try:
+            already_handled = latest_changes_file.is_file() and (
+                catch_up.is_already_handled(
+                    settings=settings, latest_changes_file=latest_changes_file, pr=pr
+                )
+            )
+        except RuntimeError as error:
+            logging.error(str(error))
+            sys.exit(1)
+        if already_handled:
+            logging.info("The PR was already processed by another run.")
+            sys.exit(0)
+    # In catch up mode, this run still adds the other PRs merged since the last run
+    elif get_content_plan(settings).should_skip(pr_labels):
         logging.info(
             f"The PR has a label configured to skip latest changes: {settings.input_skip_labels}"
         )
         sys.exit(0)
-    if not latest_changes_file.is_file():
-        logging.error(
-            f"The latest changes files doesn't seem to exist: {latest_changes_file}"
-        )
-        sys.exit(1)
+    if not use_git:
+        import httpx
 
-    logging.info("Setting up GitHub Actions git user")
-    subprocess.run(["git", "config", "user.name", "github-actions[bot]"], check=True)
-    subprocess.run(
-        ["git", "config", "user.email", "github-actions[bot]@users.noreply.github.com"],
-        check=True,
-    )
-    number_of_trials = 10
-    logging.info(f"Number of trials (for race conditions): {number_of_trials}")
-    for trial in range(number_of_trials):
-        logging.info(f"Running trial: {trial}")
-        logging.info(
-            "Pulling the latest changes, including the latest merged PR (this one)"
-        )
-        subprocess.run(["git", "pull"], check=True)
-        content = latest_changes_file.read_text()
+        from . import api
 
-        new_content = generate_content(
-            content=content,
-            settings=settings,
-            pr=pr,
-            labels=pr_labels,
+        client = create_github_client(settings)
+        try:
+            stats = api.commit_and_push(
+                client=client, settings=settings, pr=pr, labels=pr_labels
+            )
+        except (RuntimeError, httpx.HTTPStatusError) as error:
+            logging.error(str(error))
+            sys.exit(1)
+        finally:
+            client.close()
+    else:
+        for path, _ in targets:
+            if not path.is_file():
+                logging.error(f"The latest changes files doesn't seem to exist: {path}")
+                sys.exit(1)
+
+        logging.info("Setting up GitHub Actions git user")
+        timing.run(["git", "config", "user.name", "github-actions[bot]"], check=True)
+        timing.run(
+            [
+                "git",
+                "config",
+                "user.email",
+                "github-actions[bot]@users.noreply.github.com",
+            ],
+            check=True,
         )
-        latest_changes_file.write_text(new_content)
-        logging.info(f"Committing changes to: {latest_changes_file}")
-        subprocess.run(["git", "add", str(latest_changes_file)], check=True)
-        subprocess.run(["git", "commit", "-m", COMMIT_MESSAGE], check=True)
-        logging.info(f"Pushing changes: {latest_changes_file}")
+        if settings.input_catch_up:
+            try:
+                stats = catch_up.commit_and_push(
+                    settings=settings, latest_changes_file=latest_changes_file, pr=pr
+                )
+            except RuntimeError as error:
+                logging.error(str(error))
+                sys.exit(1)
+        elif settings.input_latest_changes_files:
+            stats = commit_and_push_targets(
+                settings=settings, targets=targets, pr=pr, labels=pr_labels
+            )
+        elif settings.input_commit_backend == "plumbing":
+            from . import plumbing
 
-        result = subprocess.run(["git", "push"])
-        if result.returncode == 0:
-            break
-        # Didn't work, race condition, reset to try again
-        logging.info("That didn't work, resetting before trying again")
-        subprocess.run(["git", "reset", "HEAD^1"], check=True)
-        subprocess.run(["git", "checkout", "."], check=True)
-    else:
-        logging.error(f"Failed to push changes after {number_of_trials} trials")
+            stats = plumbing.commit_and_push(
+                settings=settings,
+                latest_changes_file=latest_changes_file,
+                pr=pr,
+                labels=pr_labels,
+            )
+        else:
+            stats = commit_and_push(
+                settings=settings,
+                latest_changes_file=latest_changes_file,
+                pr=pr,
+                labels=pr_labels,
+            )
+    logging.info(
+        f"Push contention: {stats.trials} trials, {stats.rebased} rebased, "
+        f"{stats.regenerated} regenerated, {stats.waited:.2f}s waiting"
+    )
+    if not stats.pushed:
+        logging.error(f"Failed to push changes after {stats.trials} trials")
         sys.exit(1)
 
     logging.info("Finished")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    try:
+        update_latest_changes()
+    finally:
+        timing.report_metrics()
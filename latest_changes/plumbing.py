@@ -0,0 +1,142 @@
+import io
+import logging
+import os
+import subprocess
+import time
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+from . import timing
+from .main import (
+    COMMIT_MESSAGE,
+    PushStats,
+    Settings,
+    TemplateDataPR,
+    generate_content,
+    get_retry_delay,
+    load_content_index,
+    parse_release_notes_head,
+)
+
+REMOTE = "origin"
+
+
+def git(*args: str, input: Optional[bytes] = None) -> bytes:
+    result = timing.run(["git", *args], input=input, check=True, stdout=subprocess.PIPE)
+    return result.stdout
+
+
+def git_text(*args: str, input: Optional[bytes] = None) -> str:
+    return git(*args, input=input).decode("utf-8").strip()
+
+
+def get_repo_path(path: Path) -> PurePosixPath:
+    toplevel = git_text("rev-parse", "--show-toplevel")
+    return PurePosixPath(Path(os.path.relpath(path.resolve(), toplevel)).as_posix())
+
+
+def fetch(branch: str) -> str:
+    git("fetch", "--quiet", REMOTE, f"refs/heads/{branch}")
+    return git_text("rev-parse", "FETCH_HEAD")
+
+
+def replace_tree_entry(tree: str, path: PurePosixPath, blob: str) -> str:
+    """
+    Create a new tree from tree with the file at path pointing to blob, creating
+    the trees for each parent directory, and return its SHA.
+    """
+    name, *rest = path.parts
+    entries: list[bytes] = []
+    found = False
+    for entry in git("ls-tree", "-z", tree).split(b"\0"):
+        if not entry:
+            continue
+        info, entry_name = entry.split(b"\t", 1)
+        mode, object_type, sha = info.decode().split(" ")
+        if entry_name.decode("utf-8") == name:
+            found = True
+            if rest:
+                sha = replace_tree_entry(sha, PurePosixPath(*rest), blob)
+            else:
+                sha = blob
+            entry = f"{mode} {object_type} {sha}\t".encode() + entry_name
+        entries.append(entry)
+    if not found:
+        raise RuntimeError(f"The file doesn't exist in the repository: {path}")
+    # In a blob filtered checkout the other blobs are only on the remote, they
+    # don't need to be here to reference them
+    return git_text("mktree", "-z", "--missing", input=b"\0".join(entries) + b"\0")
+
+
+def push(*, commit: str, branch: str, expected: str) -> bool:
+    """
+    Update the remote branch to commit only if it still points to expected.
+    """
+    result = timing.run(
+        [
+            "git",
+            "push",
+            "--quiet",
+            f"--force-with-lease=refs/heads/{branch}:{expected}",
+            REMOTE,
+            f"{commit}:refs/heads/{branch}",
+        ]
+    )
+    return result.returncode == 0
+
+
+def commit_and_push(
+    *,
+    settings: Settings,
+    latest_changes_file: Path,
+    pr: TemplateDataPR,
+    labels: list[str],
+) -> PushStats:
+    """
+    Add the PR to the release notes and push it using only git plumbing commands.
+
+    The release notes are read from the fetched commit and the new commit is
+    created from objects directly, so the worktree and the index are never
+    touched. The push is a compare-and-swap on the branch, when another push
+    wins, this fetches and generates the changes again.
+    """
+    stats = PushStats()
+    path = get_repo_path(latest_changes_file)
+    branch = git_text("symbolic-ref", "--short", "HEAD")
+    logging.info(
+        f"Number of trials (for race conditions): {settings.input_number_of_trials}"
+    )
+    logging.info(f"Fetching the latest changes from branch: {branch}")
+    parent = fetch(branch)
+    for trial in range(settings.input_number_of_trials):
+        logging.info(f"Running trial: {trial}")
+        stats.trials += 1
+        content = git("cat-file", "blob", f"{parent}:{path}")
+        with timing.metrics.span("generate_content"):
+            head = parse_release_notes_head(io.BytesIO(content), settings)
+            new_content = generate_content(
+                content=head.content,
+                settings=settings,
+                pr=pr,
+                labels=labels,
+                index=load_content_index(content=head.content, settings=settings),
+            )
+        new_content = head.encode(new_content)
+        if head.tail_offset is not None:
+            new_content += memoryview(content)[head.tail_offset :]
+        blob = git_text("hash-object", "-w", "--stdin", input=new_content)
+        tree = replace_tree_entry(f"{parent}^{{tree}}", path, blob)
+        commit = git_text("commit-tree", tree, "-p", parent, "-m", COMMIT_MESSAGE)
+        logging.info(f"Pushing changes: {latest_changes_file}")
+        if push(commit=commit, branch=branch, expected=parent):
+            stats.pushed = True
+            break
+        if trial + 1 == settings.input_number_of_trials:
+            break
+        delay = get_retry_delay(trial=trial, base_delay=settings.input_retry_delay)
+        logging.info(f"That didn't work, waiting {delay:.2f}s before trying again")
+        time.sleep(delay)
+        stats.waited += delay
+        parent = fetch(branch)
+        stats.regenerated += 1
+    return stats
@@ -0,0 +1,295 @@
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError
+
+from . import timing
+from .document import ReleaseNotes
+from .main import (
+    BatchEntry,
+    GitHubEventPullRequest,
+    PushStats,
+    Settings,
+    commit_and_push_changes,
+    find_latest_changes_file,
+)
+
+MAX_BODY_SIZE = 25 * 1024 * 1024
+
+
+class WebhookBranch(BaseModel):
+    ref: str
+
+
+class WebhookPullRequest(GitHubEventPullRequest):
+    base: WebhookBranch
+
+
+class WebhookRepository(BaseModel):
+    full_name: str
+
+
+class WebhookEvent(BaseModel):
+    action: str
+    pull_request: WebhookPullRequest
+    repository: WebhookRepository
+
+
+def verify_signature(*, body: bytes, signature: Optional[str], secret: str) -> bool:
+    """
+    Check the X-Hub-Signature-256 header GitHub sends with the HMAC of the body.
+    """
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature.removeprefix("sha256="), expected)
+
+
+def parse_webhook(
+    *, event_name: Optional[str], body: bytes, settings: Settings, base_branch: str
+) -> Optional[GitHubEventPullRequest]:
+    """
+    Get the merged PR from a webhook, or None if there's nothing to add for it.
+
+    Raises ValidationError when a pull_request event doesn't have a valid payload.
+    """
+    if event_name != "pull_request":
+        return None
+    event = WebhookEvent.model_validate_json(body)
+    pr = event.pull_request
+    if event.action != "closed" or not pr.merged:
+        return None
+    if event.repository.full_name != settings.github_repository:
+        logging.info(f"Ignoring PR {pr.number} from: {event.repository.full_name}")
+        return None
+    if pr.base.ref != base_branch:
+        logging.info(f"Ignoring PR {pr.number} merged into: {pr.base.ref}")
+        return None
+    return pr
+
+
+def collect_batch(
+    events: "queue.Queue[Optional[GitHubEventPullRequest]]",
+    *,
+    debounce: float,
+    max_batch_size: int,
+) -> tuple[list[GitHubEventPullRequest], bool]:
+    """
+    Wait for an event, then keep collecting until there are no new events for
+    debounce seconds, or until the batch is full.
+
+    Returns the batch and whether the server was stopped (a None in the queue).
+    """
+    first = events.get()
+    if first is None:
+        return [], True
+    batch = [first]
+    while len(batch) < max_batch_size:
+        try:
+            pr = events.get(timeout=debounce)
+        except queue.Empty:
+            break
+        if pr is None:
+            return batch, True
+        batch.append(pr)
+    return batch, False
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Receive the webhooks of merged PRs and add them to the release notes in
+    debounced batches, one commit per batch.
+
+    The checkout, the compiled template, and the parsed release notes are kept
+    between batches, so only the first batch pays for them. The release notes
+    are parsed again only when someone else changed them.
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        *,
+        settings: Settings,
+        latest_changes_file: Path,
+        base_branch: str,
+        debounce: float = 2.0,
+        max_batch_size: int = 100,
+    ):
+        super().__init__(address, WebhookHandler)
+        self.settings = settings
+        self.latest_changes_file = latest_changes_file
+        self.base_branch = base_branch
+        self.debounce = debounce
+        self.max_batch_size = max_batch_size
+        self.events: queue.Queue[Optional[GitHubEventPullRequest]] = queue.Queue()
+        self.notes: Optional[ReleaseNotes] = None
+        # The content the parsed release notes serialize to
+        self.notes_content: Optional[str] = None
+        self.worker = threading.Thread(target=self.process_events, daemon=True)
+
+    def get_notes(self, content: str) -> ReleaseNotes:
+        if self.notes is None or self.notes_content != content:
+            with timing.metrics.span("parse release notes"):
+                self.notes = ReleaseNotes.parse(content.encode("utf-8"), self.settings)
+            self.notes_content = content
+        return self.notes
+
+    def update(self, content: str, pull_requests: list[GitHubEventPullRequest]) -> str:
+        notes = self.get_notes(content)
+        outcomes = notes.insert_batch(
+            [
+                BatchEntry(pr=pr, labels=[label.name for label in pr.labels])
+                for pr in pull_requests
+            ]
+        )
+        logging.info(f"Adding {outcomes.count('inserted')} PRs")
+        if "inserted" not in outcomes:
+            return content
+        self.notes_content = notes.to_bytes().decode("utf-8")
+        # The line break before the rest of the file is added when writing it
+        return self.notes_content.rstrip("\n") + "\n"
+
+    def process_batch(self, pull_requests: list[GitHubEventPullRequest]) -> PushStats:
+        numbers = ", ".join(str(pr.number) for pr in pull_requests)
+        logging.info(f"Processing a batch of {len(pull_requests)} PRs: {numbers}")
+        try:
+            stats = commit_and_push_changes(
+                settings=self.settings,
+                latest_changes_file=self.latest_changes_file,
+                update=lambda content: self.update(content, pull_requests),
+            )
+        except Exception:
+            logging.exception(f"Failed to add the PRs: {numbers}")
+            return PushStats()
+        finally:
+            timing.report_metrics()
+            # Each batch reports its own metrics
+            timing.metrics = timing.RunMetrics()
+        if not stats.pushed:
+            logging.error(
+                f"Failed to push changes after {stats.trials} trials, "
+                f"the PRs can be added with backfill: {numbers}"
+            )
+        return stats
+
+    def process_events(self) -> None:
+        stopped = False
+        while not stopped:
+            batch, stopped = collect_batch(
+                self.events,
+                debounce=self.debounce,
+                max_batch_size=self.max_batch_size,
+            )
+            if batch:
+                self.process_batch(batch)
+
+    def start(self) -> None:
+        self.worker.start()
+
+    def stop(self) -> None:
+        """
+        Stop receiving webhooks, and wait for the events already queued.
+        """
+        self.shutdown()
+        self.server_close()
+        self.events.put(None)
+        self.worker.join()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server: WebhookServer
+
+    def send_status(self, status: int, message: str) -> None:
+        body = f"{message}\n".encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_SIZE:
+            self.send_status(413, "Payload too large")
+            return
+        body = self.rfile.read(length)
+        settings = self.server.settings
+        secret = settings.latest_changes_webhook_secret
+        if secret is not None and not verify_signature(
+            body=body,
+            signature=self.headers.get("X-Hub-Signature-256"),
+            secret=secret.get_secret_value(),
+        ):
+            self.send_status(401, "Invalid signature")
+            return
+        try:
+            pr = parse_webhook(
+                event_name=self.headers.get("X-GitHub-Event"),
+                body=body,
+                settings=settings,
+                base_branch=self.server.base_branch,
+            )
+        except ValidationError:
+            self.send_status(400, "Invalid pull_request event")
+            return
+        if pr is None:
+            self.send_status(200, "Ignored")
+            return
+        logging.info(f"Queued PR: {pr.number}")
+        self.server.events.put(pr)
+        self.send_status(202, "Queued")
+
+    def log_message(self, format: str, *args) -> None:
+        logging.info(f"{self.address_string()} - {format % args}")
+
+
+def serve(
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    debounce: float = 2.0,
+    max_batch_size: int = 100,
+) -> None:
+    """
+    Run the webhook server in the current git repository until interrupted.
+
+    The settings are read from the same environment variables as the action.
+    """
+    settings = Settings(github_event_path=Path(os.devnull))
+    if settings.latest_changes_webhook_secret is None:
+        logging.warning(
+            "No LATEST_CHANGES_WEBHOOK_SECRET is set, the webhooks are not verified"
+        )
+    latest_changes_file = find_latest_changes_file(settings)
+    base_branch = timing.run(
+        ["git", "symbolic-ref", "--short", "HEAD"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    server = WebhookServer(
+        (host, port),
+        settings=settings,
+        latest_changes_file=latest_changes_file,
+        base_branch=base_branch,
+        debounce=debounce,
+        max_batch_size=max_batch_size,
+    )
+    server.start()
+    logging.info(
+        f"Listening for webhooks on http://{host}:{server.server_port}, "
+        f"for PRs merged into: {base_branch}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Stopping, adding the PRs already received")
+    finally:
+        server.stop()
@@ -0,0 +1,52 @@
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from jinja2 import (
+    BaseLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    Template,
+    TemplateNotFound,
+)
+
+
+class TemplateFileLoader(BaseLoader):
+    """
+    Load templates by file path, they are up to date while their mtime is the same.
+    """
+
+    def get_source(self, environment: Environment, template: str):
+        path = Path(template)
+        try:
+            mtime = path.stat().st_mtime_ns
+            source = path.read_text("utf-8")
+        except FileNotFoundError as error:
+            raise TemplateNotFound(template) from error
+
+        def uptodate() -> bool:
+            try:
+                return path.stat().st_mtime_ns == mtime
+            except OSError:
+                return False
+
+        return source, str(path), uptodate
+
+
+@lru_cache
+def get_template_environment(cache_dir: Path) -> Environment:
+    bytecode_cache = None
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        logging.warning(f"Could not create the template cache directory: {cache_dir}")
+    if os.access(cache_dir, os.W_OK):
+        bytecode_cache = FileSystemBytecodeCache(str(cache_dir))
+    return Environment(
+        loader=TemplateFileLoader(), bytecode_cache=bytecode_cache, auto_reload=True
+    )
+
+
+def get_template(path: Path, *, cache_dir: Path) -> Template:
+    return get_template_environment(cache_dir).get_template(str(path.resolve()))
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Mapping, Optional
+
+from pydantic import BaseModel, Field
+
+
+class Span(BaseModel):
+    name: str
+    seconds: float
+
+
+class APIUsage(BaseModel):
+    requests: int = 0
+    rate_limit: Optional[int] = None
+    rate_limit_remaining: Optional[int] = None
+
+
+class RunMetrics(BaseModel):
+    spans: list[Span] = []
+    api: APIUsage = Field(default_factory=APIUsage)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        # Added when it starts, so nested spans are listed after their parent
+        span = Span(name=name, seconds=0)
+        self.spans.append(span)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            span.seconds = time.perf_counter() - start
+
+    def record_api_response(self, headers: Mapping[str, Any]) -> None:
+        self.api.requests += 1
+        lower_headers = {key.lower(): value for key, value in headers.items()}
+        if "x-ratelimit-limit" in lower_headers:
+            self.api.rate_limit = int(lower_headers["x-ratelimit-limit"])
+        if "x-ratelimit-remaining" in lower_headers:
+            self.api.rate_limit_remaining = int(lower_headers["x-ratelimit-remaining"])
+
+    def to_markdown(self) -> str:
+        rows = [
+            "| Phase | Seconds |",
+            "| --- | ---: |",
+            *(f"| {span.name} | {span.seconds:.3f} |" for span in self.spans),
+        ]
+        api = self.api
+        rate_limit = (
+            f"{api.rate_limit_remaining} / {api.rate_limit}"
+            if api.rate_limit is not None
+            else "unknown"
+        )
+        return (
+            "### Latest Changes timings\n\n"
+            + "\n".join(rows)
+            + f"\n\nGitHub API requests: {api.requests}, rate limit remaining: {rate_limit}\n"
+        )
+
+
+# Metrics for the current run, shared by all the modules
+metrics = RunMetrics()
+
+
+def run(args: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """
+    Run a subprocess, recording how long it took, e.g. as "git push".
+    """
+    with metrics.span(" ".join(args[:2])):
+        return subprocess.run(args, **kwargs)
+
+
+def report_metrics() -> None:
+    """
+    Log the metrics as JSON and add them to the GitHub Actions job summary.
+    """
+    document = metrics.model_dump_json()
+    logging.info(f"Run metrics: {document}")
+    summary_path = os.environ.get("GITHUB_STEP_SUMMARY")
+    if not summary_path:
+        return
+    pretty_document = json.dumps(json.loads(document), indent=2)
+    with Path(summary_path).open("a", encoding="utf-8") as summary:
+        summary.write(
+            f"{metrics.to_markdown()}\n"
+            "<details><summary>JSON</summary>\n\n"
+            f"```json\n{pretty_document}\n```\n\n"
+            "</details>\n"
+        )
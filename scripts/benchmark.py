@@ -0,0 +1,325 @@
+"""Benchmark generate_content across file sizes, label counts, and layouts.
+
+Run it from the repository root, e.g.:
+
+    uv run python -m scripts.benchmark run --sizes 1KB,1MB
+    uv run python -m scripts.benchmark compare
+"""
+
+import gc
+import json
+import re
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Annotated, Optional
+
+import typer
+from pydantic import BaseModel
+
+from latest_changes.main import (
+    Section,
+    Settings,
+    TemplateDataPR,
+    TemplateDataUser,
+    generate_content,
+)
+
+DEFAULT_SIZES = "1KB,100KB,1MB,10MB,50MB"
+DEFAULT_LABEL_COUNTS = "1,10,60,200"
+SIZE_UNITS = {"KB": 1024, "MB": 1024 * 1024}
+ENTRIES_PER_RELEASE = 20
+LATEST_ENTRIES = 30
+MIN_BENCHMARK_SECONDS = 0.2
+
+app = typer.Typer()
+
+
+class Case(BaseModel):
+    size: int
+    labels: int
+    latest: str  # "empty" or "full"
+    layout: str  # "sectionless" or "sectioned"
+
+    @property
+    def name(self) -> str:
+        return f"{self.size}B-{self.labels}labels-{self.latest}-{self.layout}"
+
+
+class Result(BaseModel):
+    seconds: float
+    allocations: int
+    peak_bytes: int
+
+
+class Baseline(BaseModel):
+    # The time of the reference workload in the same session, the seconds of
+    # the results are reported relative to it, not across machines
+    reference_seconds: float
+    results: dict[str, Result]
+
+
+def parse_size(size: str) -> int:
+    for unit, multiplier in SIZE_UNITS.items():
+        if size.upper().endswith(unit):
+            return int(float(size[: -len(unit)]) * multiplier)
+    return int(size)
+
+
+def make_labels(count: int) -> list[Section]:
+    defaults = Settings.model_fields["input_labels"].default
+    labels = list(defaults[:count])
+    labels.extend(
+        Section(label=f"lang-{number}", header=f"Translations {number}")
+        for number in range(count - len(labels))
+    )
+    return labels
+
+
+def make_entry(number: int) -> str:
+    return (
+        f"* ✨ Add feature number {number}. "
+        f"PR [#{number}](https://github.com/tiangolo/latest-changes/pull/{number}) "
+        "by [@tiangolo](https://github.com/tiangolo)."
+    )
+
+
+def make_release(
+    *, entries: list[str], labels: list[Section], layout: str, prefix: str = "### "
+) -> list[str]:
+    if layout == "sectionless" or not entries:
+        return [*entries, ""]
+    lines: list[str] = []
+    per_section = max(1, len(entries) // len(labels))
+    for index, label in enumerate(labels):
+        section_entries = entries[index * per_section : (index + 1) * per_section]
+        if not section_entries:
+            break
+        lines.extend([f"{prefix}{label.header}", "", *section_entries, ""])
+    return lines
+
+
+def generate_release_notes(*, case: Case, labels: list[Section]) -> str:
+    """
+    Generate synthetic release notes of about case.size bytes.
+    """
+    number = 1
+    latest_entries: list[str] = []
+    if case.latest == "full":
+        latest_entries = [make_entry(number + index) for index in range(LATEST_ENTRIES)]
+        number += LATEST_ENTRIES
+    lines = ["# Release Notes", "", "## Latest Changes", ""]
+    lines.extend(
+        make_release(entries=latest_entries, labels=labels, layout=case.layout)
+    )
+    size = sum(len(line) + 1 for line in lines)
+    release = 0
+    while size < case.size:
+        entries = [make_entry(number + index) for index in range(ENTRIES_PER_RELEASE)]
+        number += ENTRIES_PER_RELEASE
+        release_lines = [
+            f"## 0.{release}.0",
+            "",
+            *make_release(entries=entries, labels=labels, layout=case.layout),
+        ]
+        release += 1
+        lines.extend(release_lines)
+        size += sum(len(line) + 1 for line in release_lines)
+    return "\n".join(lines)
+
+
+def measure(call: Callable[[], object]) -> float:
+    """
+    Return the median time of the call, after a warm up call.
+    """
+    call()
+    durations: list[float] = []
+    total = 0.0
+    while len(durations) < 3 or total < MIN_BENCHMARK_SECONDS:
+        start = time.perf_counter()
+        call()
+        duration = time.perf_counter() - start
+        durations.append(duration)
+        total += duration
+    return statistics.median(durations)
+
+
+def run_reference() -> float:
+    """
+    Time a fixed workload that doesn't use latest_changes, to measure how fast
+    this machine (and its current load) is.
+    """
+    labels = make_labels(10)
+    content = generate_release_notes(
+        case=Case(size=parse_size("1MB"), labels=10, latest="full", layout="sectioned"),
+        labels=labels,
+    )
+    pattern = re.compile(r"\[#(\d+)\]")
+
+    def call() -> int:
+        numbers = {int(number) for number in pattern.findall(content)}
+        lines = "\n".join(line.rstrip() for line in content.splitlines())
+        return len(numbers) + len(lines)
+
+    return measure(call)
+
+
+def run_case(case: Case) -> Result:
+    labels = make_labels(case.labels)
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_labels=labels,
+    )
+    content = generate_release_notes(case=case, labels=labels)
+    pr = TemplateDataPR(
+        title="Benchmark PR",
+        number=10_000_000,
+        html_url="https://github.com/tiangolo/latest-changes/pull/10000000",
+        user=TemplateDataUser(login="tiangolo", html_url="https://github.com/tiangolo"),
+    )
+    # The last configured label is the slowest to route
+    pr_labels = [labels[-1].label]
+
+    def call() -> str:
+        return generate_content(
+            content=content, settings=settings, pr=pr, labels=pr_labels
+        )
+
+    # The warm up call fills the caches, as a long running process would have them
+    seconds = measure(call)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        # Keep the result, to count the memory blocks it holds
+        new_content = call()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del new_content
+    allocations = sum(
+        max(stat.count_diff, 0) for stat in after.compare_to(before, "lineno")
+    )
+    return Result(
+        seconds=seconds,
+        allocations=allocations,
+        peak_bytes=peak - current,
+    )
+
+
+def get_cases(*, sizes: str, label_counts: str) -> list[Case]:
+    return [
+        Case(size=parse_size(size), labels=int(labels), latest=latest, layout=layout)
+        for size in sizes.split(",")
+        for labels in label_counts.split(",")
+        for latest in ("empty", "full")
+        for layout in ("sectionless", "sectioned")
+    ]
+
+
+def run_cases(cases: list[Case]) -> dict[str, Result]:
+    results: dict[str, Result] = {}
+    for case in cases:
+        result = run_case(case)
+        results[case.name] = result
+        typer.echo(
+            f"{case.name}: {result.seconds * 1000:.3f} ms, "
+            f"{result.allocations} allocations, {result.peak_bytes} peak bytes"
+        )
+    return results
+
+
+SizesOption = Annotated[
+    str,
+    typer.Option(help="Comma separated file sizes, e.g. 1KB,1MB,50MB."),
+]
+LabelCountsOption = Annotated[
+    str,
+    typer.Option(help="Comma separated numbers of configured labels."),
+]
+
+
+@app.command()
+def run(
+    sizes: SizesOption = DEFAULT_SIZES,
+    label_counts: LabelCountsOption = DEFAULT_LABEL_COUNTS,
+    output: Annotated[
+        Optional[Path],
+        typer.Option(help="Write the results to this JSON file, e.g. a baseline."),
+    ] = None,
+) -> None:
+    reference_seconds = run_reference()
+    typer.echo(f"reference: {reference_seconds * 1000:.3f} ms")
+    results = run_cases(get_cases(sizes=sizes, label_counts=label_counts))
+    if output:
+        baseline = Baseline(reference_seconds=reference_seconds, results=results)
+        output.write_text(json.dumps(baseline.model_dump(), indent=2) + "\n")
+
+
+@app.command()
+def compare(
+    baseline: Annotated[
+        Path,
+        typer.Option(exists=True, dir_okay=False, help="Baseline JSON to compare to."),
+    ] = Path("scripts/benchmark-baseline.json"),
+    threshold: Annotated[
+        float,
+        typer.Option(help="Allowed relative increase, e.g. 0.25 for 25%."),
+    ] = 0.25,
+    sizes: SizesOption = DEFAULT_SIZES,
+    label_counts: LabelCountsOption = DEFAULT_LABEL_COUNTS,
+) -> None:
+    """
+    Compare to the baseline, failing only on the allocations and the peak
+    memory, which don't depend on the machine.
+
+    The seconds are only reported, relative to the reference workload, as the
+    baseline could have been run on a faster or slower (or busier) machine.
+    """
+    expected_baseline = Baseline.model_validate_json(baseline.read_text())
+    reference_seconds = run_reference()
+    speed = reference_seconds / expected_baseline.reference_seconds
+    typer.echo(
+        f"reference: {reference_seconds * 1000:.3f} ms, "
+        f"{speed:.2f}x the time of the baseline"
+    )
+    cases = [
+        case
+        for case in get_cases(sizes=sizes, label_counts=label_counts)
+        if case.name in expected_baseline.results
+    ]
+    results = run_cases(cases)
+    regressions: list[str] = []
+    slower: list[str] = []
+    for name, result in results.items():
+        expected = expected_baseline.results[name]
+        for metric in ("allocations", "peak_bytes"):
+            old = getattr(expected, metric)
+            new = getattr(result, metric)
+            if new > old * (1 + threshold) and new - old > 0:
+                regressions.append(f"{name} {metric}: {old} -> {new}")
+        relative = result.seconds / (expected.seconds * speed)
+        if relative > 1 + threshold:
+            slower.append(f"{name}: {relative:.2f}x the relative time")
+    if slower:
+        typer.echo("Slower than the baseline (for information, timings are noisy):")
+        for line in slower:
+            typer.echo(f"  {line}")
+    if regressions:
+        typer.echo("Regressions beyond the threshold:")
+        for regression in regressions:
+            typer.echo(f"  {regression}")
+        raise typer.Exit(1)
+    typer.echo(f"No regressions beyond {threshold:.0%} in {len(results)} cases")
+
+
+if __name__ == "__main__":
+    app()
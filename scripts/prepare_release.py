@@ -12,6 +12,7 @@ README_ACTION_REF_PATTERN = re.compile(
     r"(?m)(tiangolo/latest-changes@)(\d+\.\d+\.\d+)"
 )
 VERSION_HEADING_PATTERN = re.compile(r"(?m)^## (\d+\.\d+\.\d+)(?: \([^)]+\))?$")
+RELEASE_DATE_PATTERN = re.compile(r"\((\d{4}-\d{2}-\d{2})\)$")
 RELEASE_NOTES_HEADER = "# Release Notes\n\n"
 LATEST_CHANGES_HEADER = "## Latest Changes"
 BumpType = Literal["major", "minor", "patch"]
@@ -123,12 +124,117 @@ def get_release_notes_body(content: str, version: str, release_notes_file: Path)
     return f"{body}\n"
 
 
+def get_release_date(version_heading: re.Match[str]) -> date | None:
+    match = RELEASE_DATE_PATTERN.search(version_heading.group(0))
+    return date.fromisoformat(match.group(1)) if match else None
+
+
+def rotate_release_notes(
+    content: str,
+    *,
+    keep_releases: int | None = None,
+    max_release_age: int | None = None,
+    today: date,
+) -> tuple[str, dict[int, str]]:
+    """
+    Split the releases to archive from the release notes.
+
+    Releases after the first keep_releases, or older than max_release_age days,
+    are archived, with all the releases below them. Returns the new content and
+    the archived releases by major version, newest first.
+    """
+    version_headings = list(VERSION_HEADING_PATTERN.finditer(content))
+    rotate_from: int | None = None
+    for index, version_heading in enumerate(version_headings):
+        if keep_releases is not None and index >= keep_releases:
+            rotate_from = index
+            break
+        release_date = get_release_date(version_heading)
+        if (
+            max_release_age is not None
+            and release_date is not None
+            and (today - release_date).days > max_release_age
+        ):
+            rotate_from = index
+            break
+    if rotate_from is None:
+        return content, {}
+    archived: dict[int, list[str]] = {}
+    for index in range(rotate_from, len(version_headings)):
+        version_heading = version_headings[index]
+        end = (
+            version_headings[index + 1].start()
+            if index + 1 < len(version_headings)
+            else len(content)
+        )
+        major, _, _ = parse_version(version_heading.group(1))
+        archived.setdefault(major, []).append(
+            content[version_heading.start() : end].strip()
+        )
+    new_content = content[: version_headings[rotate_from].start()].rstrip() + "\n"
+    return new_content, {
+        major: "\n\n".join(releases) + "\n" for major, releases in archived.items()
+    }
+
+
+def merge_archive(content: str | None, releases: str, major: int) -> str:
+    """
+    Add the releases on top of the ones already in the archive of a major version.
+    """
+    if content is None:
+        return f"# Release Notes {major}.x\n\n{releases}"
+    for version_heading in VERSION_HEADING_PATTERN.finditer(releases):
+        version = version_heading.group(1)
+        if re.search(rf"^## {re.escape(version)}(?: \([^)]+\))?$", content, re.M):
+            raise RuntimeError(f"The archive already contains a section for {version}")
+    first_heading = VERSION_HEADING_PATTERN.search(content)
+    if not first_heading:
+        return f"{content.rstrip()}\n\n{releases}"
+    start = first_heading.start()
+    return f"{content[:start]}{releases}\n{content[start:]}"
+
+
+def rotate_release_notes_file(
+    release_notes_file: Path,
+    archive_dir: Path,
+    *,
+    keep_releases: int | None,
+    max_release_age: int | None,
+    today: date,
+) -> list[Path]:
+    content = release_notes_file.read_text(encoding="utf-8")
+    new_content, archived = rotate_release_notes(
+        content,
+        keep_releases=keep_releases,
+        max_release_age=max_release_age,
+        today=today,
+    )
+    archive_files: list[Path] = []
+    for major, releases in archived.items():
+        archive_file = archive_dir / f"{major}.md"
+        archive_content = (
+            archive_file.read_text(encoding="utf-8") if archive_file.exists() else None
+        )
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        archive_file.write_text(
+            merge_archive(archive_content, releases, major), encoding="utf-8"
+        )
+        archive_files.append(archive_file)
+    if archived:
+        release_notes_file.write_text(new_content, encoding="utf-8")
+    return archive_files
+
+
 def prepare_release(
     bump: BumpType,
     version_file: Path,
     release_notes_file: Path,
     readme_file: Path,
     release_date: date,
+    *,
+    archive_dir: Path = Path("release-notes/archive"),
+    keep_releases: int | None = None,
+    max_release_age: int | None = None,
 ) -> str:
     version_file_content = version_file.read_text(encoding="utf-8")
     release_notes_content = release_notes_file.read_text(encoding="utf-8")
@@ -150,9 +256,43 @@ def prepare_release(
         update_readme(readme_content, current_version, version, readme_file),
         encoding="utf-8",
     )
+    if keep_releases is not None or max_release_age is not None:
+        rotate_release_notes_file(
+            release_notes_file,
+            archive_dir,
+            keep_releases=keep_releases,
+            max_release_age=max_release_age,
+            today=release_date,
+        )
     return version
 
 
+ArchiveDirOption = Annotated[
+    Path,
+    typer.Option(
+        envvar="PREPARE_RELEASE_ARCHIVE_DIR",
+        file_okay=False,
+        help="Directory for the archived release notes, one file per major version.",
+    ),
+]
+KeepReleasesOption = Annotated[
+    int | None,
+    typer.Option(
+        envvar="PREPARE_RELEASE_KEEP_RELEASES",
+        min=1,
+        help="Archive the releases after this many in the release notes.",
+    ),
+]
+MaxReleaseAgeOption = Annotated[
+    int | None,
+    typer.Option(
+        envvar="PREPARE_RELEASE_MAX_RELEASE_AGE",
+        min=0,
+        help="Archive the releases older than this many days.",
+    ),
+]
+
+
 @app.command()
 def prepare(
     bump: Annotated[
@@ -206,6 +346,9 @@ def prepare(
             help="Release date in YYYY-MM-DD format. Defaults to today.",
         ),
     ] = date.today().isoformat(),
+    archive_dir: ArchiveDirOption = Path("release-notes/archive"),
+    keep_releases: KeepReleasesOption = None,
+    max_release_age: MaxReleaseAgeOption = None,
 ) -> None:
     parsed_release_date = date.fromisoformat(release_date or date.today().isoformat())
     version = prepare_release(
@@ -214,6 +357,9 @@ def prepare(
         release_notes_file,
         readme_file,
         parsed_release_date,
+        archive_dir=archive_dir,
+        keep_releases=keep_releases,
+        max_release_age=max_release_age,
     )
     typer.echo(f"Prepared release {version} ({parsed_release_date.isoformat()})")
 
@@ -273,5 +419,40 @@ def release_notes(
     )
 
 
+@app.command()
+def rotate(
+    release_notes_file: Annotated[
+        Path,
+        typer.Option(
+            envvar="PREPARE_RELEASE_RELEASE_NOTES_FILE",
+            exists=True,
+            file_okay=True,
+            dir_okay=False,
+            readable=True,
+            writable=True,
+            help="Path to the release notes Markdown file.",
+        ),
+    ] = Path("release-notes.md"),
+    archive_dir: ArchiveDirOption = Path("release-notes/archive"),
+    keep_releases: KeepReleasesOption = None,
+    max_release_age: MaxReleaseAgeOption = None,
+) -> None:
+    if keep_releases is None and max_release_age is None:
+        raise typer.BadParameter(
+            "Use --keep-releases, --max-release-age, or both, to select what to archive"
+        )
+    archive_files = rotate_release_notes_file(
+        release_notes_file,
+        archive_dir,
+        keep_releases=keep_releases,
+        max_release_age=max_release_age,
+        today=date.today(),
+    )
+    for archive_file in archive_files:
+        typer.echo(f"Archived releases to {archive_file}")
+    if not archive_files:
+        typer.echo("No releases to archive")
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,126 @@
+import inspect
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from latest_changes.main import GitHubEventPullRequest, TemplateDataPR, TemplateDataUser
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+* 🔥 Remove config. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.0.3
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+
+def git(*args: str, cwd: Path, env: Optional[dict[str, str]] = None) -> str:
+    result = subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True, env=env
+    )
+    return result.stdout
+
+
+def init_remote(remote: Path) -> Path:
+    remote.parent.mkdir(parents=True, exist_ok=True)
+    git("init", "-q", "--bare", "-b", "main", str(remote), cwd=remote.parent)
+    return remote
+
+
+def clone(remote: Path, path: Path) -> Path:
+    git("clone", "-q", str(remote), str(path), cwd=remote.parent)
+    git("config", "user.name", "Test", cwd=path)
+    git("config", "user.email", "test@example.com", cwd=path)
+    return path
+
+
+def make_pr(number: int, title: Optional[str] = None) -> TemplateDataPR:
+    return TemplateDataPR(
+        title=title or f"Demo PR {number}",
+        number=number,
+        html_url=f"https://github.com/tiangolo/latest-changes/pull/{number}",
+        user=TemplateDataUser(login="tiangolo", html_url="https://github.com/tiangolo"),
+    )
+
+
+def make_merged_pr(
+    number: int, *, day: int, time: str = "12:00:00", labels: tuple[str, ...] = ()
+) -> GitHubEventPullRequest:
+    return GitHubEventPullRequest.model_validate(
+        {
+            "number": number,
+            "title": f"Demo PR {number}",
+            "html_url": f"https://github.com/tiangolo/latest-changes/pull/{number}",
+            "user": {"login": "tiangolo", "html_url": "https://github.com/tiangolo"},
+            "merged": True,
+            "merged_at": f"2024-01-{day:02}T{time}Z",
+            "labels": [{"name": label} for label in labels],
+            "base": {"ref": "main"},
+        }
+    )
+
+
+def make_node(
+    number: int, *, day: int, time: str = "12:00:00", labels: tuple[str, ...] = ()
+) -> dict:
+    """
+    A merged PR as returned by the GitHub GraphQL API.
+    """
+    return {
+        "number": number,
+        "title": f"Demo PR {number}",
+        "url": f"https://github.com/tiangolo/latest-changes/pull/{number}",
+        "merged": True,
+        "mergedAt": f"2024-01-{day:02}T{time}Z",
+        "updatedAt": f"2024-01-{day:02}T{time}Z",
+        "author": {
+            "__typename": "User",
+            "login": "tiangolo",
+            "url": "https://github.com/tiangolo",
+        },
+        "labels": {"nodes": [{"name": label} for label in labels]},
+    }
+
+
+@pytest.fixture
+def repo_files() -> dict[str, str]:
+    """
+    The files of the first commit in the remote, test modules can override it.
+    """
+    return {"release-notes.md": inspect.cleandoc(raw_content) + "\n"}
+
+
+@pytest.fixture
+def remote(tmp_path: Path, repo_files: dict[str, str]) -> Path:
+    remote = init_remote(tmp_path / "remote.git")
+    seed = clone(remote, tmp_path / "seed")
+    for name, text in repo_files.items():
+        path = seed / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    git("add", ".", cwd=seed)
+    git("commit", "-q", "-m", "Add release notes", cwd=seed)
+    git("push", "-q", "origin", "HEAD:main", cwd=seed)
+    return remote
+
+
+@pytest.fixture
+def work(remote: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    A clone of the remote, as the current directory.
+    """
+    work = clone(remote, tmp_path / "work")
+    monkeypatch.chdir(work)
+    return work
+
+
+@pytest.fixture
+def no_clone(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Run outside of a clone, to not keep an index in the .git of this repository
+    monkeypatch.chdir(tmp_path)
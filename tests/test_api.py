@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import inspect
+import json
+from typing import Optional
+
+import httpx
+import pytest
+
+from latest_changes.api import commit_and_push
+from latest_changes.github_client import GitHubClient
+from latest_changes.main import GitHubEventPullRequest, Settings
+
+from .conftest import make_pr, raw_content
+
+# The api backend runs without a clone
+pytestmark = pytest.mark.usefixtures("no_clone")
+
+
+def blob_sha(content: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FakeGitHub:
+    """
+    An in-memory stand in for the GitHub contents API of one repository.
+    """
+
+    def __init__(self, files: dict[str, bytes], *, inline_limit: int = 1_000_000):
+        self.files = files
+        self.inline_limit = inline_limit
+        self.commits: list[str] = []
+        self.refs: list[Optional[str]] = []
+        self.branches: list[Optional[str]] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"] == "Bearer secret"
+        prefix = "/repos/tiangolo/latest-changes/"
+        path = request.url.path.removeprefix(prefix)
+        if request.method == "GET" and path.startswith("git/blobs/"):
+            sha = path.removeprefix("git/blobs/")
+            for content in self.files.values():
+                if blob_sha(content) == sha:
+                    return httpx.Response(200, content=content)
+            return httpx.Response(404)
+        file_path = path.removeprefix("contents/")
+        if request.method == "GET":
+            self.refs.append(request.url.params.get("ref"))
+            if file_path not in self.files:
+                return httpx.Response(404, json={"message": "Not Found"})
+            content = self.files[file_path]
+            inline = len(content) <= self.inline_limit
+            return httpx.Response(
+                200,
+                json={
+                    "type": "file",
+                    "path": file_path,
+                    "sha": blob_sha(content),
+                    "encoding": "base64" if inline else "none",
+                    "content": base64.b64encode(content).decode() if inline else "",
+                },
+            )
+        if request.method == "PUT":
+            data = json.loads(request.content)
+            if blob_sha(self.files[file_path]) != data["sha"]:
+                return httpx.Response(409, json={"message": "Conflict"})
+            self.branches.append(data.get("branch"))
+            self.files[file_path] = base64.b64decode(data["content"])
+            self.commits.append(data["message"])
+            return httpx.Response(200, json={})
+        return httpx.Response(405)
+
+
+def make_settings() -> Settings:
+    return Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_retry_delay=0,
+        input_commit_backend="api",
+    )
+
+
+def test_api_finds_default_file_and_updates_it():
+    fake = FakeGitHub({"docs/release-notes.md": inspect.cleandoc(raw_content).encode()})
+    client = GitHubClient(token="secret", transport=httpx.MockTransport(fake.handle))
+    stats = commit_and_push(
+        client=client, settings=make_settings(), pr=make_pr(42), labels=[]
+    )
+    assert stats.pushed
+    assert stats.trials == 1
+    assert len(fake.commits) == 1
+    content = fake.files["docs/release-notes.md"].decode()
+    assert content.index("[#42]") < content.index("[#47]") < content.index("## 0.0.3")
+
+
+def test_api_large_file_uses_blob():
+    content = inspect.cleandoc(raw_content).encode()
+    fake = FakeGitHub({"release-notes.md": content}, inline_limit=10)
+    client = GitHubClient(token="secret", transport=httpx.MockTransport(fake.handle))
+    file = client.get_file(
+        repository="tiangolo/latest-changes", path="release-notes.md"
+    )
+    assert file is not None
+    assert file.content == content
+
+
+def test_api_retries_when_sha_changed():
+    fake = FakeGitHub({"release-notes.md": inspect.cleandoc(raw_content).encode()})
+    client = GitHubClient(token="secret", transport=httpx.MockTransport(fake.handle))
+    original_get_file = client.get_file
+    first = True
+
+    def get_file(**kwargs):
+        nonlocal first
+        file = original_get_file(**kwargs)
+        if first:
+            first = False
+            # Another run updates the file right after this one read it
+            commit_and_push(
+                client=client, settings=make_settings(), pr=make_pr(43), labels=[]
+            )
+        return file
+
+    client.get_file = get_file
+    stats = commit_and_push(
+        client=client, settings=make_settings(), pr=make_pr(42), labels=[]
+    )
+    assert stats.pushed
+    assert stats.trials == 2
+    assert stats.regenerated == 1
+    content = fake.files["release-notes.md"].decode()
+    assert content.index("[#42]") < content.index("[#43]") < content.index("[#47]")
+
+
+def test_api_file_not_found():
+    fake = FakeGitHub({})
+    client = GitHubClient(token="secret", transport=httpx.MockTransport(fake.handle))
+    with pytest.raises(RuntimeError, match="No latest changes file was found"):
+        commit_and_push(
+            client=client, settings=make_settings(), pr=make_pr(42), labels=[]
+        )
+
+
+def test_api_uses_the_base_branch():
+    fake = FakeGitHub({"release-notes.md": inspect.cleandoc(raw_content).encode()})
+    client = GitHubClient(token="secret", transport=httpx.MockTransport(fake.handle))
+    pr = GitHubEventPullRequest.model_validate(
+        {**make_pr(42).model_dump(), "base": {"ref": "develop"}}
+    )
+    stats = commit_and_push(client=client, settings=make_settings(), pr=pr, labels=[])
+    assert stats.pushed
+    assert fake.refs == ["develop"]
+    assert fake.branches == ["develop"]
+
+
+def test_api_falls_back_to_the_workflow_branch():
+    fake = FakeGitHub({"release-notes.md": inspect.cleandoc(raw_content).encode()})
+    client = GitHubClient(token="secret", transport=httpx.MockTransport(fake.handle))
+    settings = make_settings()
+    settings.github_ref_name = "v1"
+    stats = commit_and_push(client=client, settings=settings, pr=make_pr(42), labels=[])
+    assert stats.pushed
+    assert fake.refs == ["v1"]
+    assert fake.branches == ["v1"]
@@ -0,0 +1,123 @@
+import json
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+
+from latest_changes import backfill as backfill_module
+from latest_changes.backfill import backfill
+from latest_changes.github_client import GitHubClient
+
+from .conftest import git, make_node
+
+
+class FakeGraphQL:
+    """
+    Serve pages of merged PRs, newest first, and the date of a tag.
+    """
+
+    def __init__(self, nodes: list[dict], *, page_size: int = 100):
+        self.nodes = nodes
+        self.page_size = page_size
+        self.queries: list[dict] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.queries.append(body)
+        variables = body["variables"]
+        if "qualifiedName" in variables:
+            assert variables["qualifiedName"] == "refs/tags/0.0.3"
+            target = {"target": {"committedDate": "2024-01-10T00:00:00Z"}}
+            return httpx.Response(
+                200, json={"data": {"repository": {"ref": {"target": target}}}}
+            )
+        start = int(variables.get("cursor") or 0)
+        end = start + self.page_size
+        page = {
+            "nodes": self.nodes[start:end],
+            "pageInfo": {
+                "hasNextPage": end < len(self.nodes),
+                "endCursor": str(end),
+            },
+        }
+        return httpx.Response(
+            200, json={"data": {"repository": {"pullRequests": page}}}
+        )
+
+    def client(self) -> GitHubClient:
+        return GitHubClient(
+            token="secret",
+            base_url="https://api.github.com",
+            transport=httpx.MockTransport(self.handle),
+        )
+
+
+def test_list_merged_pull_requests_since_number():
+    nodes = [make_node(number, day=number - 30) for number in range(60, 30, -1)]
+    fake = FakeGraphQL(nodes, page_size=10)
+    pull_requests = fake.client().list_merged_pull_requests(
+        repository="tiangolo/latest-changes", since_number=45
+    )
+    assert [pr.number for pr in pull_requests] == list(range(60, 44, -1))
+    assert len(fake.queries) == 2
+    assert fake.queries[0]["variables"]["orderBy"]["field"] == "CREATED_AT"
+
+
+def test_list_merged_pull_requests_since_date():
+    nodes = [make_node(number, day=number - 30) for number in range(60, 30, -1)]
+    # Merged before the date, but updated after it
+    nodes[0]["mergedAt"] = "2024-01-01T12:00:00Z"
+    fake = FakeGraphQL(nodes, page_size=10)
+    pull_requests = fake.client().list_merged_pull_requests(
+        repository="tiangolo/latest-changes",
+        since=datetime(2024, 1, 20, tzinfo=timezone.utc),
+    )
+    assert [pr.number for pr in pull_requests] == list(range(59, 49, -1))
+    assert len(fake.queries) == 2
+    assert fake.queries[0]["variables"]["orderBy"]["field"] == "UPDATED_AT"
+
+
+@pytest.fixture
+def work(work: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("GITHUB_REPOSITORY", "tiangolo/latest-changes")
+    monkeypatch.setenv("INPUT_TOKEN", "secret")
+    return work
+
+
+def test_backfill_single_commit(work, monkeypatch):
+    nodes = [
+        make_node(50, day=15),
+        make_node(49, day=14, labels=("release",)),
+        make_node(48, day=13, labels=("feature",)),
+        make_node(47, day=12),
+        make_node(38, day=11),
+        make_node(37, day=9),
+    ]
+    fake = FakeGraphQL(nodes)
+    monkeypatch.setattr(
+        backfill_module, "create_github_client", lambda settings: fake.client()
+    )
+    stats = backfill(since_tag="0.0.3")
+    assert stats.pushed
+    log = git("log", "--format=%s", "origin/main", cwd=work).splitlines()
+    assert log == ["📝 Update release notes", "Add release notes"]
+    content = (work / "release-notes.md").read_text()
+    # Already listed, with a skip label, or from before the tag
+    for number in (37, 49):
+        assert f"[#{number}]" not in content
+    assert content.count("[#47]") == 1
+    assert content.count("[#38]") == 1
+    assert content.index("[#50]") < content.index("[#47]")
+    assert "### Features\n\n* Demo PR 48." in content
+
+
+def test_backfill_nothing_to_add(work, monkeypatch):
+    fake = FakeGraphQL([make_node(47, day=12)])
+    monkeypatch.setattr(
+        backfill_module, "create_github_client", lambda settings: fake.client()
+    )
+    stats = backfill(since_date=date(2024, 1, 1))
+    assert stats.pushed
+    log = git("log", "--format=%s", "origin/main", cwd=work).splitlines()
+    assert log == ["Add release notes"]
@@ -0,0 +1,101 @@
+import inspect
+
+import pytest
+
+from latest_changes.main import (
+    BatchEntry,
+    Settings,
+    generate_content,
+    generate_content_batch,
+)
+
+from .conftest import make_pr
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+* 🔥 Remove config. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+
+### Features
+
+* ✨ Add feature. PR [#46](https://github.com/tiangolo/latest-changes/pull/46) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.0.3
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+content = inspect.cleandoc(raw_content) + "\n"
+
+settings = Settings(
+    github_repository="tiangolo/latest-changes",
+    github_event_path="event.json",
+    input_token="secret",
+)
+
+
+entries = [
+    BatchEntry(pr=make_pr(48), labels=["feature"]),
+    BatchEntry(pr=make_pr(49), labels=[]),
+    BatchEntry(pr=make_pr(50), labels=["docs", "bug", "security"]),
+    BatchEntry(pr=make_pr(51), labels=["feature", "internal"]),
+    BatchEntry(pr=make_pr(52), labels=["upgrade"]),
+]
+
+
+def test_batch_same_as_one_by_one():
+    expected = content
+    for entry in entries:
+        expected = generate_content(
+            content=expected, settings=settings, pr=entry.pr, labels=entry.labels
+        )
+    result = generate_content_batch(content=content, settings=settings, entries=entries)
+    assert result.content == expected
+    assert result.outcomes == ["inserted"] * len(entries)
+
+
+def test_batch_outcomes():
+    pr_numbers = {46, 47}
+    result = generate_content_batch(
+        content=content,
+        settings=settings,
+        entries=[
+            BatchEntry(pr=make_pr(47), labels=[]),
+            BatchEntry(pr=make_pr(48), labels=["release"]),
+            BatchEntry(pr=make_pr(49), labels=["feature"]),
+            BatchEntry(pr=make_pr(49), labels=["feature"]),
+            BatchEntry(pr=make_pr(38), labels=[]),
+        ],
+        pr_numbers=pr_numbers,
+    )
+    assert result.outcomes == [
+        "duplicate",
+        "skipped",
+        "inserted",
+        "duplicate",
+        # Only the latest changes are checked by default
+        "inserted",
+    ]
+    assert pr_numbers == {38, 46, 47, 49}
+    assert "[#48]" not in result.content
+    assert result.content.count("[#49]") == 1
+
+
+def test_batch_nothing_inserted_keeps_content():
+    unformatted_content = content.replace("## 0.0.3", "\n\n## 0.0.3")
+    result = generate_content_batch(
+        content=unformatted_content,
+        settings=settings,
+        entries=[BatchEntry(pr=make_pr(47), labels=[])],
+    )
+    assert result.content == unformatted_content
+    assert result.outcomes == ["duplicate"]
+
+
+def test_batch_requires_header():
+    with pytest.raises(RuntimeError):
+        generate_content_batch(
+            content="# Release Notes\n", settings=settings, entries=entries
+        )
@@ -0,0 +1,230 @@
+import inspect
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+
+from latest_changes import catch_up
+from latest_changes.catch_up import (
+    CatchUpMarker,
+    add_pending_pull_requests,
+    is_already_handled,
+    read_marker,
+    set_marker,
+)
+from latest_changes.github_client import GitHubClient
+from latest_changes.main import Settings, update_latest_changes
+
+from .conftest import git, make_merged_pr, make_node
+
+raw_content = """
+# Release Notes
+
+<!-- latest-changes: merged_at=2024-01-12T12:00:00Z number=47 -->
+## Latest Changes
+
+* 🔥 Remove config. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.0.3
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+settings = Settings(
+    github_repository="tiangolo/latest-changes",
+    github_event_path="event.json",
+    input_token="secret",
+    input_catch_up=True,
+)
+
+
+def test_read_and_set_marker():
+    content = inspect.cleandoc(raw_content) + "\n"
+    assert read_marker(content, settings) == CatchUpMarker(
+        merged_at=datetime(2024, 1, 12, 12, tzinfo=timezone.utc), number=47
+    )
+    marker = CatchUpMarker(
+        merged_at=datetime(2024, 1, 15, 12, tzinfo=timezone.utc), number=50
+    )
+    new_content = set_marker(content, settings, marker)
+    assert new_content == content.replace(
+        "merged_at=2024-01-12T12:00:00Z number=47",
+        "merged_at=2024-01-15T12:00:00Z number=50",
+    )
+    no_marker = "# Release Notes\n\n## Latest Changes\n\n* Old.\n"
+    assert read_marker(no_marker, settings) is None
+    assert set_marker(no_marker, settings, marker) == (
+        "# Release Notes\n\n"
+        "<!-- latest-changes: merged_at=2024-01-15T12:00:00Z number=50 -->\n"
+        "## Latest Changes\n\n* Old.\n"
+    )
+
+
+def test_add_pending_rereads_marker(no_clone):
+    content = inspect.cleandoc(raw_content) + "\n"
+    pull_requests = [
+        make_merged_pr(46, day=11),
+        make_merged_pr(47, day=12),
+        make_merged_pr(48, day=13),
+        make_merged_pr(49, day=14),
+    ]
+    new_content = add_pending_pull_requests(
+        content, settings=settings, pull_requests=pull_requests
+    )
+    # Merged before the marker, but never added
+    assert new_content.count("[#46]") == 1
+    assert new_content.count("[#47]") == 1
+    assert new_content.index("[#49]") < new_content.index("[#48]")
+    assert read_marker(new_content, settings).number == 49
+    # Another run already moved the marker past all the PRs
+    assert (
+        add_pending_pull_requests(
+            new_content, settings=settings, pull_requests=pull_requests
+        )
+        == new_content
+    )
+
+
+@pytest.fixture
+def repo_files() -> dict[str, str]:
+    return {"release-notes.md": inspect.cleandoc(raw_content) + "\n"}
+
+
+def test_catch_up_single_commit(work, monkeypatch):
+    nodes = [
+        make_node(51, day=16),
+        make_node(50, day=15, labels=("release",)),
+        make_node(49, day=14),
+        make_node(48, day=13, labels=("feature",)),
+        make_node(47, day=12),
+    ]
+    queries: list[dict] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        queries.append(body["variables"])
+        page = {"nodes": nodes, "pageInfo": {"hasNextPage": False, "endCursor": None}}
+        return httpx.Response(
+            200, json={"data": {"repository": {"pullRequests": page}}}
+        )
+
+    monkeypatch.setattr(
+        catch_up,
+        "create_github_client",
+        lambda settings: GitHubClient(
+            token="secret",
+            base_url="https://api.github.com",
+            transport=httpx.MockTransport(handle),
+        ),
+    )
+    latest_changes_file = Path("release-notes.md")
+    pr = make_merged_pr(49, day=14)
+    assert not is_already_handled(
+        settings=settings, latest_changes_file=latest_changes_file, pr=pr
+    )
+    stats = catch_up.commit_and_push(
+        settings=settings, latest_changes_file=latest_changes_file, pr=pr
+    )
+    assert stats.pushed
+    assert queries[0]["baseRefName"] == "main"
+    log = git("log", "--format=%s", "origin/main", cwd=work).splitlines()
+    assert log == ["📝 Update release notes", "Add release notes"]
+    content = (work / "release-notes.md").read_text()
+    assert "[#50]" not in content
+    assert content.count("[#47]") == 1
+    assert content.index("[#51]") < content.index("[#49]") < content.index("[#47]")
+    assert "### Features\n\n* Demo PR 48." in content
+    assert read_marker(content, settings).number == 51
+    # The runs for the other PRs find them already processed, without requests
+    for number, day, labels in ((48, 13, ()), (50, 15, ("release",)), (51, 16, ())):
+        assert is_already_handled(
+            settings=settings,
+            latest_changes_file=latest_changes_file,
+            pr=make_merged_pr(number, day=day, labels=labels),
+        )
+    assert len(queries) == 1
+
+
+def test_catch_up_earlier_pr_runs_later(work, monkeypatch):
+    content = (work / "release-notes.md").read_text()
+    (work / "release-notes.md").write_text(
+        content.replace(
+            "<!-- latest-changes: merged_at=2024-01-12T12:00:00Z number=47 -->\n", ""
+        )
+    )
+    git("commit", "-q", "-am", "Remove the marker", cwd=work)
+    git("push", "-q", cwd=work)
+    # 48 merged a day before 50, 49 some minutes before
+    nodes = [
+        make_node(50, day=14),
+        make_node(49, day=14, time="11:30:00"),
+        make_node(48, day=13),
+    ]
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        page = {"nodes": nodes, "pageInfo": {"hasNextPage": False, "endCursor": None}}
+        return httpx.Response(
+            200, json={"data": {"repository": {"pullRequests": page}}}
+        )
+
+    monkeypatch.setattr(
+        catch_up,
+        "create_github_client",
+        lambda settings: GitHubClient(
+            token="secret",
+            base_url="https://api.github.com",
+            transport=httpx.MockTransport(handle),
+        ),
+    )
+    latest_changes_file = Path("release-notes.md")
+    pr_48 = make_merged_pr(48, day=13)
+    pr_49 = make_merged_pr(49, day=14, time="11:30:00")
+    pr_50 = make_merged_pr(50, day=14)
+    # The run of the PR merged later runs first, without a marker
+    assert catch_up.commit_and_push(
+        settings=settings, latest_changes_file=latest_changes_file, pr=pr_50
+    ).pushed
+    content = (work / "release-notes.md").read_text()
+    assert content.index("[#50]") < content.index("[#49]") < content.index("[#47]")
+    assert "[#48]" not in content
+    assert read_marker(content, settings).number == 50
+    # The PR merged before the marker is still added by its own run
+    assert is_already_handled(
+        settings=settings, latest_changes_file=latest_changes_file, pr=pr_49
+    )
+    assert not is_already_handled(
+        settings=settings, latest_changes_file=latest_changes_file, pr=pr_48
+    )
+    assert catch_up.commit_and_push(
+        settings=settings, latest_changes_file=latest_changes_file, pr=pr_48
+    ).pushed
+    content = (work / "release-notes.md").read_text()
+    assert content.count("[#48]") == 1
+    assert content.count("[#49]") == 1
+    assert content.count("[#50]") == 1
+    assert read_marker(content, settings).number == 50
+    assert is_already_handled(
+        settings=settings, latest_changes_file=latest_changes_file, pr=pr_48
+    )
+
+
+def test_unknown_merge_time_raises(no_clone):
+    pr = make_merged_pr(48, day=13).model_copy(update={"merged_at": None})
+    content = inspect.cleandoc(raw_content) + "\n"
+    with pytest.raises(RuntimeError, match="merge time of the PR is unknown: 48"):
+        add_pending_pull_requests(content, settings=settings, pull_requests=[pr])
+
+
+@pytest.mark.parametrize("backend", ["plumbing", "api"])
+def test_catch_up_only_with_worktree_backend(backend, no_clone, monkeypatch, caplog):
+    monkeypatch.setenv("GITHUB_REPOSITORY", "tiangolo/latest-changes")
+    monkeypatch.setenv("GITHUB_EVENT_PATH", "event.json")
+    monkeypatch.setenv("INPUT_TOKEN", "secret")
+    monkeypatch.setenv("INPUT_CATCH_UP", "true")
+    monkeypatch.setenv("INPUT_COMMIT_BACKEND", backend)
+    with pytest.raises(SystemExit) as exc_info:
+        update_latest_changes()
+    assert exc_info.value.code == 1
+    assert "only supported with the worktree commit backend" in caplog.text
@@ -0,0 +1,136 @@
+import inspect
+from pathlib import Path
+
+import pytest
+
+from latest_changes import checkout, plumbing
+from latest_changes.checkout import get_sparse_checkout_patterns, setup_checkout
+from latest_changes.main import Settings, commit_and_push, find_latest_changes_file
+
+from .conftest import clone, git, init_remote, make_pr
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+* 🔥 Remove config. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+
+@pytest.fixture
+def server(tmp_path: Path) -> Path:
+    server = tmp_path / "server"
+    remote = init_remote(server / "tiangolo" / "latest-changes.git")
+    git("config", "uploadpack.allowFilter", "true", cwd=remote)
+    seed = clone(remote, tmp_path / "seed")
+    (seed / "docs").mkdir()
+    for number in range(3):
+        (seed / "docs" / "index.md").write_text(f"# Docs {number}\n")
+        (seed / "app.py").write_text(f"print({number})\n")
+        git("add", ".", cwd=seed)
+        git("commit", "-q", "-m", f"Commit {number}", cwd=seed)
+    (seed / "docs" / "release-notes.md").write_text(inspect.cleandoc(raw_content))
+    git("add", ".", cwd=seed)
+    git("commit", "-q", "-m", "Add release notes", cwd=seed)
+    git("push", "-q", "origin", "HEAD:main", cwd=seed)
+    return server
+
+
+def make_settings(tmp_path: Path, server: Path) -> Settings:
+    return Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="",
+        input_retry_delay=0,
+        input_checkout=True,
+        github_server_url=f"file://{server}",
+        latest_changes_cache_dir=tmp_path / "cache",
+    )
+
+
+def test_sparse_checkout_patterns():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_latest_changes_file="./docs/release-notes.md",
+        input_template_file=".github/latest-changes.jinja2",
+    )
+    assert get_sparse_checkout_patterns(settings) == [
+        "/docs/release-notes.md",
+        "/.github/latest-changes.jinja2",
+    ]
+
+
+def test_sparse_checkout_patterns_for_targets():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_latest_changes_files=[
+            "docs/*/docs/release-notes.md",
+            {"file": "packages/api/CHANGELOG.md", "template_file": "api.jinja2"},
+        ],
+    )
+    assert get_sparse_checkout_patterns(settings) == [
+        "/docs/*/docs/release-notes.md",
+        "/packages/api/CHANGELOG.md",
+        "/api.jinja2",
+    ]
+
+
+def test_setup_checkout_is_shallow_and_sparse(tmp_path, server, monkeypatch):
+    settings = make_settings(tmp_path, server)
+    path = setup_checkout(settings)
+    files = sorted(
+        str(file.relative_to(path))
+        for file in path.rglob("*")
+        if file.is_file() and ".git" not in file.parts
+    )
+    assert files == ["docs/release-notes.md"]
+    assert git("rev-list", "--count", "HEAD", cwd=path).strip() == "1"
+    assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=path).strip() == "main"
+
+    monkeypatch.chdir(path)
+    refreshes: list[Path] = []
+    monkeypatch.setattr(checkout, "refresh", refreshes.append)
+    latest_changes_file = find_latest_changes_file(settings)
+    git("config", "user.name", "Test", cwd=path)
+    git("config", "user.email", "test@example.com", cwd=path)
+    stats = commit_and_push(
+        settings=settings,
+        latest_changes_file=latest_changes_file,
+        pr=make_pr(42),
+        labels=[],
+    )
+    assert stats.pushed
+    # The first trial uses the fresh checkout as is
+    assert refreshes == []
+    remote = server / "tiangolo" / "latest-changes.git"
+    content = git("show", "main:docs/release-notes.md", cwd=remote)
+    assert content.index("[#42]") < content.index("[#47]")
+    assert git("show", "main:app.py", cwd=remote) == "print(2)\n"
+
+
+def test_plumbing_backend_in_checkout(tmp_path, server, monkeypatch):
+    settings = make_settings(tmp_path, server).model_copy(
+        update={"input_commit_backend": "plumbing"}
+    )
+    path = setup_checkout(settings)
+    monkeypatch.chdir(path)
+    git("config", "user.name", "Test", cwd=path)
+    git("config", "user.email", "test@example.com", cwd=path)
+    stats = plumbing.commit_and_push(
+        settings=settings,
+        latest_changes_file=find_latest_changes_file(settings),
+        pr=make_pr(42),
+        labels=[],
+    )
+    assert stats.pushed
+    remote = server / "tiangolo" / "latest-changes.git"
+    content = git("show", "main:docs/release-notes.md", cwd=remote)
+    assert content.index("[#42]") < content.index("[#47]")
+    assert git("show", "main:app.py", cwd=remote) == "print(2)\n"
+    assert git("show", "main:docs/index.md", cwd=remote) == "# Docs 2\n"
+    assert git("fsck", "--connectivity-only", cwd=remote) == ""
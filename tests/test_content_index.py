@@ -0,0 +1,136 @@
+import inspect
+
+import pytest
+
+import latest_changes.main
+from latest_changes.main import (
+    Settings,
+    TemplateDataPR,
+    TemplateDataUser,
+    generate_content,
+    index_content,
+    load_content_index,
+    read_release_notes_head,
+)
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+* 🔥 Remove config. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+
+### Features
+
+* ✨ Add feature. PR [#46](https://github.com/tiangolo/latest-changes/pull/46) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.0.3
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+content = inspect.cleandoc(raw_content) + "\n"
+
+pr = TemplateDataPR(
+    title="Demo PR",
+    number=48,
+    html_url="https://github.com/tiangolo/latest-changes/pull/48",
+    user=TemplateDataUser(login="tiangolo", html_url="https://github.com/tiangolo"),
+)
+
+
+@pytest.fixture
+def settings(tmp_path) -> Settings:
+    return Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        latest_changes_index_file=tmp_path / "cache" / "index",
+    )
+
+
+def fail_index_content(**kwargs):
+    raise AssertionError("The content was indexed again")
+
+
+def test_index_content(settings):
+    index = index_content(content=content, settings=settings)
+    assert index.pr_numbers == [46, 47]
+    assert [section.label for section in index.sections] == ["feature"]
+    assert content[index.release_end :].startswith("## 0.0.3")
+
+
+def test_cached_index(settings, monkeypatch):
+    index = load_content_index(content=content, settings=settings)
+    assert index.key
+    assert settings.latest_changes_index_file.is_file()
+    monkeypatch.setattr(latest_changes.main, "index_content", fail_index_content)
+    cached_index = load_content_index(content=content, settings=settings)
+    assert cached_index.key == index.key
+    assert cached_index.pr_numbers == index.pr_numbers
+    assert cached_index.sections[0].content_end == index.sections[0].content_end
+
+
+def test_cached_index_valid_with_changes_below_release(settings, monkeypatch, tmp_path):
+    path = tmp_path / "release-notes.md"
+    path.write_text(content)
+    index = load_content_index(
+        content=read_release_notes_head(path, settings).content, settings=settings
+    )
+    path.write_text(content + "\n## 0.0.2\n\n* Old change.\n")
+    monkeypatch.setattr(latest_changes.main, "index_content", fail_index_content)
+    head = read_release_notes_head(path, settings)
+    cached_index = load_content_index(content=head.content, settings=settings)
+    assert cached_index.key == index.key
+
+
+def test_cached_index_invalidated(settings):
+    index = load_content_index(content=content, settings=settings)
+    new_content = generate_content(
+        content=content, settings=settings, pr=pr, labels=[], index=index
+    )
+    new_index = load_content_index(content=new_content, settings=settings)
+    assert new_index.key != index.key
+    assert 48 in new_index.pr_numbers
+    other_settings = settings.model_copy(update={"input_duplicates_scope": "file"})
+    assert load_content_index(content=content, settings=other_settings).pr_numbers == [
+        38,
+        46,
+        47,
+    ]
+
+
+def test_corrupt_cache_file(settings):
+    cache_file = settings.latest_changes_index_file
+    cache_file.parent.mkdir(parents=True)
+    cache_file.write_text("{not json")
+    index = load_content_index(content=content, settings=settings)
+    assert index.pr_numbers == [46, 47]
+
+
+def test_index_file_in_git_dir(settings, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    settings = settings.model_copy(update={"latest_changes_index_file": None})
+    (tmp_path / ".git").mkdir()
+    load_content_index(content=content, settings=settings)
+    assert (tmp_path / ".git" / "latest-changes-index").is_file()
+
+
+def test_no_index_file_without_git_dir(settings, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    settings = settings.model_copy(update={"latest_changes_index_file": None})
+
+    def fail_get_content_key(**kwargs):
+        raise AssertionError("The content was hashed")
+
+    monkeypatch.setattr(latest_changes.main, "get_content_key", fail_get_content_key)
+    index = load_content_index(content=content, settings=settings)
+    assert index.pr_numbers == [46, 47]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_generate_content_with_index(settings):
+    index = load_content_index(content=content, settings=settings)
+    assert generate_content(
+        content=content, settings=settings, pr=pr, labels=["feature"], index=index
+    ) == generate_content(content=content, settings=settings, pr=pr, labels=["feature"])
@@ -0,0 +1,207 @@
+import inspect
+import re
+
+import pytest
+
+from latest_changes.main import (
+    LabelMatcher,
+    LinePattern,
+    Section,
+    Settings,
+    TemplateDataPR,
+    TemplateDataUser,
+    find_sections,
+    generate_content,
+    get_content_plan,
+    should_skip_labels,
+)
+
+TEXT = "## Latest Changes\n\n### Features\n\n* A\n\n## 0.1.0\n\n* B\n## 0.0.1"
+
+
+@pytest.mark.parametrize(
+    "regex,literal",
+    [
+        ("## Latest Changes", "## Latest Changes"),
+        ("^## ", "## "),
+        ("^## \\d", None),
+        ("# (CHANGELOG|Changes)", None),
+    ],
+)
+def test_line_pattern_literal_detection(regex, literal):
+    assert LinePattern(regex).literal == literal
+
+
+@pytest.mark.parametrize("regex", ["## Latest Changes", "^## ", "^### ", "^## \\d"])
+@pytest.mark.parametrize("pos,endpos", [(0, None), (1, None), (18, None), (20, 40)])
+def test_line_pattern_matches_regex(regex, pos, endpos):
+    sliced = TEXT[pos:endpos]
+    expected = re.search(regex, sliced, flags=re.MULTILINE)
+    result = LinePattern(regex).search(TEXT, pos, endpos)
+    if expected is None:
+        assert result is None
+    else:
+        assert result == (pos + expected.start(), pos + expected.end())
+
+
+def test_content_plan_is_cached():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    assert get_content_plan(settings) is get_content_plan(settings)
+
+
+def test_label_header_with_regex_characters():
+    raw_content = """
+    # Release Notes
+
+    ## Latest Changes
+
+    ### Fixes (bugs)
+
+    * 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+    """
+
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_labels=[Section(label="bug", header="Fixes (bugs)")],
+    )
+    pr = TemplateDataPR(
+        title="Demo PR",
+        number=42,
+        html_url="https://example.com/pr/42",
+        user=TemplateDataUser(login="tiangolo", html_url="https://github.com/tiangolo"),
+    )
+    new_content = generate_content(
+        content=inspect.cleandoc(raw_content), settings=settings, pr=pr, labels=["bug"]
+    )
+    assert (
+        new_content
+        == inspect.cleandoc(
+            """
+    # Release Notes
+
+    ## Latest Changes
+
+    ### Fixes (bugs)
+
+    * Demo PR. PR [#42](https://example.com/pr/42) by [@tiangolo](https://github.com/tiangolo).
+    * 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+    """
+        )
+        + "\n"
+    )
+
+
+def test_find_sections_single_scan():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_labels=[
+            Section(label=f"lang-{code}", header=f"Translations {code}")
+            for code in ["de", "es", "fr", "ja", "pt"]
+        ],
+    )
+    release_content = inspect.cleandoc(
+        """
+        * Sectionless.
+
+        ### Translations fr
+
+        * French.
+
+        ### Other
+
+        * Not configured.
+
+        ### Translations de
+
+        * German.
+
+        ### Translations fr
+
+        * Repeated.
+        """
+    )
+    sections = find_sections(
+        release_content=release_content, plan=get_content_plan(settings)
+    )
+    assert [(section.label, section.content) for section in sections] == [
+        ("lang-fr", "* French."),
+        ("lang-de", "* German."),
+    ]
+    assert sections[0].index == release_content.index("### Translations fr")
+
+
+@pytest.mark.parametrize(
+    "labels,expected",
+    [
+        (["lang-es"], "glob:lang-*"),
+        (["area/docs"], r"/^area\/(docs|api)$/"),
+        (["area/api", "lang-es"], r"/^area\/(docs|api)$/"),
+        (["lang-all", "lang-es"], "lang-all"),
+        (["feature", "lang-es"], "feature"),
+        (["area/other", "language"], None),
+        ([], None),
+    ],
+)
+def test_label_patterns(labels, expected):
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_labels=[
+            Section(label="feature", header="Features"),
+            Section(label=r"/^area\/(docs|api)$/", header="Areas"),
+            Section(label="lang-all", header="All Translations"),
+            Section(label="glob:lang-*", header="Translations"),
+        ],
+    )
+    assert get_content_plan(settings).get_label(labels) == expected
+
+
+def test_label_matcher_first_pattern_wins():
+    matcher = LabelMatcher(["glob:a-*", "/(a)-(b+)/", "a-b", "glob:*"])
+    assert matcher.get_index("a-b") == 0
+    assert matcher.get_index("a-bb") == 0
+    assert matcher.get_index("x") == 3
+    matcher = LabelMatcher(["/(a)-(b+)/", "glob:c?", "a-b"])
+    assert matcher.get_index("a-bb") == 0
+    assert matcher.get_index("cd") == 1
+    assert matcher.get_index("c") is None
+
+
+def test_labels_with_glob_characters_are_plain():
+    matcher = LabelMatcher(["[bot]", "needs review?", "glob:lang-*"])
+    assert matcher.get_index("[bot]") == 0
+    assert matcher.get_index("b") is None
+    assert matcher.get_index("needs review?") == 1
+    assert matcher.get_index("needs reviews") is None
+    assert matcher.get_index("lang-es") == 2
+    assert matcher.get_index("glob:lang-es") is None
+
+
+def test_skip_label_patterns():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_labels=[Section(label="release-notes", header="Release Notes")],
+        input_skip_labels=["glob:release*", "/^(wip|draft)$/"],
+    )
+    plan = get_content_plan(settings)
+    assert plan.should_skip(["feature", "release-1.0"])
+    assert plan.should_skip(["draft"])
+    assert not plan.should_skip(["release-notes"])
+    assert not plan.should_skip(["feature", "drafts"])
+    assert should_skip_labels(
+        labels=["lang-es"], skip_labels=["glob:lang-*"], include_labels=["lang-all"]
+    )
+    assert not should_skip_labels(
+        labels=["lang-es"], skip_labels=["glob:lang-*"], include_labels=["glob:lang-?s"]
+    )
@@ -0,0 +1,164 @@
+import inspect
+from pathlib import Path
+
+import pytest
+
+from latest_changes.document import Entry, ReleaseNotes
+from latest_changes.main import (
+    BatchEntry,
+    Settings,
+    generate_content,
+    generate_content_batch,
+    render_default_template,
+)
+
+from .conftest import make_pr
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+* 🔥 Remove config. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+
+### Features
+
+* ✨ Add feature. PR [#46](https://github.com/tiangolo/latest-changes/pull/46) by [@tiangolo](https://github.com/tiangolo).
+    More details about the feature.
+
+## 0.0.3
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+content = inspect.cleandoc(raw_content) + "\n"
+
+settings = Settings(
+    github_repository="tiangolo/latest-changes",
+    github_event_path="event.json",
+    input_token="secret",
+)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        content.encode(),
+        content.rstrip().encode(),
+        content.replace("\n", "\r\n").encode(),
+        b"",
+        b"# Release Notes\n\n## 0.0.1\n\n* First.\n",
+        (Path(__file__).parent.parent / "release-notes.md").read_bytes(),
+    ],
+)
+def test_round_trip(source: bytes):
+    assert ReleaseNotes.parse(source, settings).to_bytes() == source
+
+
+def test_structure():
+    source = content.encode()
+    notes = ReleaseNotes.parse(source, settings)
+    assert bytes(notes.preamble) == b"# Release Notes\n\n"
+    assert [block.title for block in notes.blocks] == ["## Latest Changes", "## 0.0.3"]
+    latest = notes.latest
+    assert [section.label for section in latest.sections] == [None, "feature"]
+    assert set(notes.index) == {38, 46, 47}
+    entry = notes.find(46)
+    assert entry is not None
+    assert entry.text.endswith("More details about the feature.")
+    assert source[entry.start : entry.end] == bytes(entry)
+    assert 38 in notes
+    assert notes.find(1) is None
+    assert not hasattr(entry, "__dict__")
+
+
+def test_insert_same_as_generate_content():
+    notes = ReleaseNotes.parse(content.encode(), settings)
+    expected = content
+    for number, labels in [(48, ["feature"]), (49, []), (50, ["bug"])]:
+        pr = make_pr(number)
+        expected = generate_content(
+            content=expected, settings=settings, pr=pr, labels=labels
+        )
+        notes.insert(render_default_template(pr), labels=labels, pr_number=number)
+    assert notes.to_bytes().decode() == expected
+    assert 50 in notes
+
+
+def test_insert_without_latest_changes():
+    notes = ReleaseNotes.parse(b"# Release Notes\n", settings)
+    with pytest.raises(RuntimeError):
+        notes.insert("* Demo PR.", labels=[])
+
+
+def test_remove_and_move():
+    notes = ReleaseNotes.parse(content.encode(), settings)
+    entry = notes.move(47, labels=["bug"])
+    assert isinstance(entry, Entry)
+    assert [section.label for section in notes.latest.sections] == [
+        None,
+        "feature",
+        "bug",
+    ]
+    notes.remove(46)
+    assert 46 not in notes
+    # The empty Features section is removed too
+    assert (
+        notes.to_bytes().decode()
+        == inspect.cleandoc(
+            """
+        # Release Notes
+
+        ## Latest Changes
+
+        ### Fixes
+
+        * 🔥 Remove config. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+
+        ## 0.0.3
+
+        * 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+        """
+        )
+        + "\n"
+    )
+
+
+def test_insert_above_text():
+    notes = ReleaseNotes.parse(b"## Latest Changes\n\nSome intro.\n", settings)
+    notes.insert("* Demo PR.", labels=[])
+    assert notes.to_bytes() == b"## Latest Changes\n\n* Demo PR.\n\nSome intro.\n"
+
+
+def test_insert_batch_same_as_generate_content_batch():
+    entries = [
+        BatchEntry(pr=make_pr(48), labels=["feature"]),
+        BatchEntry(pr=make_pr(47)),
+        BatchEntry(pr=make_pr(49), labels=["release"]),
+        BatchEntry(pr=make_pr(50)),
+        BatchEntry(pr=make_pr(50)),
+    ]
+    notes = ReleaseNotes.parse(content.encode(), settings)
+    outcomes = notes.insert_batch(entries)
+    result = generate_content_batch(content=content, settings=settings, entries=entries)
+    assert outcomes == result.outcomes
+    assert outcomes == ["inserted", "duplicate", "skipped", "inserted", "duplicate"]
+    assert notes.to_bytes().decode() == result.content
+
+
+@pytest.mark.parametrize(
+    "scope,outcomes", [("release", ["inserted"]), ("file", ["duplicate"])]
+)
+def test_insert_batch_duplicates_scope(scope, outcomes):
+    scope_settings = settings.model_copy(update={"input_duplicates_scope": scope})
+    # Only listed in an old release
+    entries = [BatchEntry(pr=make_pr(38))]
+    notes = ReleaseNotes.parse(content.encode(), scope_settings)
+    assert notes.insert_batch(entries) == outcomes
+    result = generate_content_batch(
+        content=content, settings=scope_settings, entries=entries
+    )
+    assert result.outcomes == outcomes
+    assert notes.to_bytes().decode() == result.content
+    # Inserted or not, the same PR is now listed in the latest changes
+    assert notes.insert_batch(entries) == ["duplicate"]
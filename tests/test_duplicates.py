@@ -0,0 +1,104 @@
+import inspect
+
+import pytest
+
+from latest_changes.main import (
+    Settings,
+    generate_content,
+    get_content_plan,
+)
+
+from .conftest import make_pr
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+* ✨ Old title. PR [#42](https://github.com/tiangolo/latest-changes/pull/42) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.0.3
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+
+def test_find_pr_numbers():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    content = (
+        "* A. PR [#42](https://github.com/tiangolo/latest-changes/pull/42).\n"
+        "* B. PR [#7](https://github.com/tiangolo/other/pull/7).\n"
+        "* C. PR [#420](https://github.com/tiangolo/latest-changes/pull/420).\n"
+    )
+    assert get_content_plan(settings).find_pr_numbers(content) == {42, 420}
+
+
+def test_duplicate_with_edited_title_raises():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    with pytest.raises(RuntimeError, match="already added: 42"):
+        generate_content(
+            content=inspect.cleandoc(raw_content),
+            settings=settings,
+            pr=make_pr(42, title="New title"),
+            labels=[],
+        )
+
+
+def test_duplicates_scope():
+    content = inspect.cleandoc(raw_content)
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    new_content = generate_content(
+        content=content, settings=settings, pr=make_pr(38), labels=[]
+    )
+    assert (
+        "[#38](https://github.com/tiangolo/latest-changes/pull/38) by"
+        in (new_content.split("## 0.0.3")[0])
+    )
+
+    file_settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_duplicates_scope="file",
+    )
+    with pytest.raises(RuntimeError, match="already added: 38"):
+        generate_content(
+            content=content, settings=file_settings, pr=make_pr(38), labels=[]
+        )
+
+
+def test_reuse_pr_numbers():
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    pr_numbers = {42}
+    content = generate_content(
+        content=inspect.cleandoc(raw_content),
+        settings=settings,
+        pr=make_pr(43),
+        labels=[],
+        pr_numbers=pr_numbers,
+    )
+    assert pr_numbers == {42, 43}
+    with pytest.raises(RuntimeError, match="already added: 43"):
+        generate_content(
+            content=content,
+            settings=settings,
+            pr=make_pr(43, title="Other title"),
+            labels=[],
+            pr_numbers=pr_numbers,
+        )
@@ -0,0 +1,60 @@
+import json
+
+from latest_changes.main import PartialGitHubEvent
+
+
+def test_pull_request_event_payload():
+    payload = {
+        "action": "closed",
+        "number": 42,
+        "pull_request": {
+            "number": 42,
+            "title": "Demo PR",
+            "html_url": "https://github.com/tiangolo/latest-changes/pull/42",
+            "merged": True,
+            "body": "Some description",
+            "user": {
+                "login": "tiangolo",
+                "html_url": "https://github.com/tiangolo",
+                "id": 1,
+            },
+            "labels": [
+                {"id": 1, "name": "feature", "color": "ededed"},
+                {"id": 2, "name": "docs", "color": "ededed"},
+            ],
+        },
+    }
+    event = PartialGitHubEvent.model_validate_json(json.dumps(payload))
+    assert event.pull_request is not None
+    assert event.pull_request.merged
+    assert event.pull_request.title == "Demo PR"
+    assert event.pull_request.user.login == "tiangolo"
+    assert [label.name for label in event.pull_request.labels] == ["feature", "docs"]
+    # Extra fields stay available for custom templates
+    assert getattr(event.pull_request, "body") == "Some description"
+
+
+def test_pull_request_event_payload_not_merged():
+    payload = {
+        "number": 42,
+        "pull_request": {
+            "number": 42,
+            "title": "Demo PR",
+            "html_url": "https://github.com/tiangolo/latest-changes/pull/42",
+            "merged": False,
+            "user": {"login": "tiangolo", "html_url": "https://github.com/tiangolo"},
+            "labels": [],
+        },
+    }
+    event = PartialGitHubEvent.model_validate_json(json.dumps(payload))
+    assert event.pull_request is not None
+    assert not event.pull_request.merged
+
+
+def test_workflow_dispatch_event_payload():
+    payload = {"inputs": {"number": "42"}, "ref": "refs/heads/main"}
+    event = PartialGitHubEvent.model_validate_json(json.dumps(payload))
+    assert event.pull_request is None
+    assert event.number is None
+    assert event.inputs is not None
+    assert event.inputs.number == 42
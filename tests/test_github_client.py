@@ -0,0 +1,132 @@
+import json
+
+import httpx
+import pytest
+
+from latest_changes import timing
+from latest_changes.github_client import GitHubClient
+from latest_changes.timing import RunMetrics
+
+
+def make_pull_request(*, labels: list[str], has_next_page: bool = False, **extra):
+    pull_request = {
+        "number": 42,
+        "title": "✨ Add feature",
+        "url": "https://github.com/tiangolo/latest-changes/pull/42",
+        "merged": True,
+        "mergedAt": "2024-01-12T12:00:00Z",
+        "baseRefName": "main",
+        "author": {
+            "__typename": "User",
+            "login": "tiangolo",
+            "url": "https://github.com/tiangolo",
+        },
+        "labels": {
+            "nodes": [{"name": label} for label in labels],
+            "pageInfo": {
+                "hasNextPage": has_next_page,
+                "endCursor": "cursor" if has_next_page else None,
+            },
+        },
+    }
+    pull_request.update(extra)
+    return {"data": {"repository": {"pullRequest": pull_request}}}
+
+
+def make_client(responses: list[dict], requests: list[dict]) -> GitHubClient:
+    def handle(request: httpx.Request) -> httpx.Response:
+        assert request.method == "POST"
+        assert request.url == "https://github.example.com/api/graphql"
+        assert request.headers["Authorization"] == "Bearer secret"
+        requests.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            json=responses[len(requests) - 1],
+            headers={"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "4999"},
+        )
+
+    return GitHubClient(
+        token="secret",
+        base_url="https://github.example.com/api/v3",
+        graphql_url="https://github.example.com/api/graphql",
+        transport=httpx.MockTransport(handle),
+    )
+
+
+def test_get_pull_request_single_query(monkeypatch):
+    metrics = RunMetrics()
+    monkeypatch.setattr(timing, "metrics", metrics)
+    requests: list[dict] = []
+    client = make_client([make_pull_request(labels=["feature", "docs"])], requests)
+    pr = client.get_pull_request(repository="tiangolo/latest-changes", number=42)
+    assert len(requests) == 1
+    assert requests[0]["variables"] == {
+        "owner": "tiangolo",
+        "name": "latest-changes",
+        "number": 42,
+    }
+    assert pr.number == 42
+    assert pr.title == "✨ Add feature"
+    assert pr.html_url == "https://github.com/tiangolo/latest-changes/pull/42"
+    assert pr.user.login == "tiangolo"
+    assert pr.user.html_url == "https://github.com/tiangolo"
+    assert pr.merged
+    assert pr.merged_at.isoformat() == "2024-01-12T12:00:00+00:00"
+    assert [label.name for label in pr.labels] == ["feature", "docs"]
+    assert pr.model_extra["base"] == {"ref": "main"}
+    assert metrics.api.requests == 1
+    assert metrics.api.rate_limit_remaining == 4999
+
+
+def test_get_pull_request_paginates_labels():
+    requests: list[dict] = []
+    responses = [
+        make_pull_request(
+            labels=[f"label-{n}" for n in range(100)], has_next_page=True
+        ),
+        make_pull_request(labels=["last"]),
+    ]
+    client = make_client(responses, requests)
+    pr = client.get_pull_request(repository="tiangolo/latest-changes", number=42)
+    assert len(requests) == 2
+    assert requests[1]["variables"]["labelsCursor"] == "cursor"
+    assert len(pr.labels) == 101
+    assert pr.labels[-1].name == "last"
+
+
+def test_get_pull_request_authors():
+    requests: list[dict] = []
+    bot = {
+        "__typename": "Bot",
+        "login": "dependabot",
+        "url": "https://github.com/apps/dependabot",
+    }
+    responses = [
+        make_pull_request(labels=[], author=bot),
+        make_pull_request(labels=[], author=None),
+    ]
+    client = make_client(responses, requests)
+    pr = client.get_pull_request(repository="tiangolo/latest-changes", number=42)
+    assert pr.user.login == "dependabot[bot]"
+    assert pr.user.html_url == "https://github.com/apps/dependabot"
+    pr = client.get_pull_request(repository="tiangolo/latest-changes", number=42)
+    assert pr.user.login == "ghost"
+
+
+def test_get_pull_request_errors():
+    requests: list[dict] = []
+    responses = [
+        {"data": {"repository": {"pullRequest": None}}},
+        {"data": None, "errors": [{"message": "Could not resolve to a Repository"}]},
+    ]
+    client = make_client(responses, requests)
+    with pytest.raises(RuntimeError, match="PR not found"):
+        client.get_pull_request(repository="tiangolo/latest-changes", number=42)
+    with pytest.raises(RuntimeError, match="Could not resolve to a Repository"):
+        client.get_pull_request(repository="tiangolo/latest-changes", number=42)
+
+
+def test_default_graphql_url():
+    client = GitHubClient(token="secret", base_url="https://api.github.com")
+    assert client.graphql_url == "https://api.github.com/graphql"
+    client.close()
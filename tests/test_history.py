@@ -0,0 +1,146 @@
+import inspect
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+import httpx
+import pytest
+
+from latest_changes.backfill import backfill
+from latest_changes.github_client import GHOST_USER, GitHubClient
+from latest_changes.history import list_pull_requests
+from latest_changes.main import Settings
+
+from .conftest import clone, git, init_remote, raw_content
+
+settings = Settings(
+    github_repository="tiangolo/latest-changes",
+    github_event_path="event.json",
+    input_token="secret",
+)
+
+
+def commit(
+    work: Path,
+    message: str,
+    *,
+    author: str = "Test <test@example.com>",
+    day: int = 1,
+) -> None:
+    git(
+        "commit",
+        "-q",
+        "--allow-empty",
+        f"--author={author}",
+        f"--date=2024-01-{day:02}T12:00:00Z",
+        "-m",
+        message,
+        cwd=work,
+        env={**os.environ, "GIT_COMMITTER_DATE": f"2024-01-{day:02}T12:00:00Z"},
+    )
+
+
+@pytest.fixture
+def work(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    remote = init_remote(tmp_path / "remote.git")
+    work = clone(remote, tmp_path / "work")
+    (work / "release-notes.md").write_text(inspect.cleandoc(raw_content) + "\n")
+    git("add", "release-notes.md", cwd=work)
+    commit(work, "🐛 Fix default Jinja2 path (#38)", day=1)
+    git("tag", "0.0.3", cwd=work)
+    commit(
+        work,
+        "🔥 Remove config (#47)",
+        author="Sebastián <1326112+tiangolo@users.noreply.github.com>",
+        day=2,
+    )
+    commit(work, "📝 Update release notes\n\n[skip ci]", day=3)
+    commit(
+        work,
+        "✨ Add feature (#48)\n\nSome details.\n\nLabels: feature, internal",
+        author="Demo <48+demo-user@users.noreply.github.com>",
+        day=4,
+    )
+    commit(
+        work,
+        "Merge pull request #49 from fork-user/fix-typo\n\n✏️ Fix typo",
+        day=5,
+    )
+    commit(work, "🔖 Release 0.0.4 (#50)", author="John Doe <john@example.com>", day=6)
+    git("push", "-q", "-u", "origin", "HEAD:main", cwd=work)
+    monkeypatch.chdir(work)
+    monkeypatch.setenv("GITHUB_REPOSITORY", "tiangolo/latest-changes")
+    monkeypatch.delenv("INPUT_TOKEN", raising=False)
+    return work
+
+
+def test_list_pull_requests_from_history(work, tmp_path, caplog):
+    labels_file = tmp_path / "labels.json"
+    labels_file.write_text(json.dumps({"50": ["release"], "48": ["feature"]}))
+    pull_requests = list_pull_requests(
+        settings=settings, since_tag="0.0.3", labels_file=labels_file
+    )
+    assert [pr.number for pr in pull_requests] == [47, 48, 49, 50]
+    pr_47, pr_48, pr_49, pr_50 = pull_requests
+    assert pr_47.title == "🔥 Remove config"
+    assert pr_47.user.login == "tiangolo"
+    assert pr_47.user.html_url == "https://github.com/tiangolo"
+    assert pr_47.html_url == "https://github.com/tiangolo/latest-changes/pull/47"
+    assert pr_47.merged_at.isoformat() == "2024-01-02T12:00:00+00:00"
+    assert [label.name for label in pr_48.labels] == ["feature", "internal"]
+    assert pr_48.user.login == "demo-user"
+    assert pr_49.title == "✏️ Fix typo"
+    assert pr_49.user.login == "fork-user"
+    assert [label.name for label in pr_50.labels] == ["release"]
+    # Without a noreply email nor a client, the login is not made up
+    assert pr_50.user == GHOST_USER
+    assert "Could not find the GitHub account of John Doe" in caplog.text
+
+
+def test_list_pull_requests_authors_from_api(work):
+    requests: list[str] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        sha = request.url.path.rsplit("/", 1)[1]
+        author = git("log", "-1", "--format=%an", sha, cwd=work).strip()
+        if author != "John Doe":
+            return httpx.Response(200, json={"author": None})
+        user = {"login": "johndoe", "html_url": "https://github.com/johndoe"}
+        return httpx.Response(200, json={"author": user})
+
+    client = GitHubClient(token="secret", transport=httpx.MockTransport(handle))
+    pull_requests = list_pull_requests(settings=settings, client=client)
+    users = {pr.number: pr.user for pr in pull_requests}
+    assert users[50].login == "johndoe"
+    assert users[50].html_url == "https://github.com/johndoe"
+    # The noreply emails don't need the API
+    assert users[47].login == "tiangolo"
+    assert users[38] == GHOST_USER
+    assert len(requests) == 2
+
+
+def test_list_pull_requests_since_date_and_pr(work):
+    since_date = list_pull_requests(settings=settings, since_date=date(2024, 1, 4))
+    assert [pr.number for pr in since_date] == [48, 49, 50]
+    since_pr = list_pull_requests(settings=settings, since_pr=48)
+    assert [pr.number for pr in since_pr] == [48, 49, 50]
+
+
+def test_backfill_from_history_without_token(work, tmp_path):
+    labels_file = tmp_path / "labels.json"
+    labels_file.write_text(json.dumps({"50": ["release"]}))
+    stats = backfill(since_tag="0.0.3", source="git", labels_file=labels_file)
+    assert stats.pushed
+    log = git("log", "--format=%s", "-2", "origin/main", cwd=work).splitlines()
+    assert log == ["📝 Update release notes", "🔖 Release 0.0.4 (#50)"]
+    content = (work / "release-notes.md").read_text()
+    assert "[#50]" not in content
+    assert content.count("[#47]") == 1
+    assert content.index("[#49]") < content.index("[#47]")
+    assert (
+        "### Features\n\n"
+        "* ✨ Add feature. PR [#48](https://github.com/tiangolo/latest-changes/pull/48)"
+        " by [@demo-user](https://github.com/demo-user)."
+    ) in content
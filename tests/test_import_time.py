@@ -0,0 +1,26 @@
+import json
+import subprocess
+import sys
+
+HEAVY_PACKAGES = {"github", "jinja2", "httpx", "requests"}
+
+
+def get_imported_packages(module: str) -> set[str]:
+    """
+    Import the module in a new interpreter, as the other tests already imported
+    everything in this one, and return the top level packages in sys.modules.
+    """
+    code = (
+        f"import json, sys, {module}; "
+        "print(json.dumps(sorted({name.split('.')[0] for name in sys.modules})))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, stdout=subprocess.PIPE, text=True
+    )
+    return set(json.loads(result.stdout))
+
+
+def test_main_does_not_import_heavy_packages():
+    packages = get_imported_packages("latest_changes.main")
+    assert "latest_changes" in packages
+    assert not packages & HEAVY_PACKAGES
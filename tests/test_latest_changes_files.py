@@ -0,0 +1,107 @@
+import inspect
+from pathlib import Path
+
+import pytest
+
+from latest_changes.main import (
+    LatestChangesTarget,
+    Settings,
+    commit_and_push_targets,
+    find_latest_changes_targets,
+)
+
+from .conftest import git, make_pr, raw_content
+
+raw_content_es = """
+# Notas de la versión
+
+## Últimos cambios
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+
+def make_settings(tmp_path: Path) -> Settings:
+    return Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_retry_delay=0,
+        latest_changes_cache_dir=tmp_path / "cache",
+        input_latest_changes_files=[
+            LatestChangesTarget(
+                file="docs/es/docs/release-notes.md",
+                latest_changes_header="## Últimos cambios",
+                template_file="es.jinja2",
+            ),
+            "docs/*/docs/release-notes.md",
+        ],
+    )
+
+
+@pytest.fixture
+def repo_files() -> dict[str, str]:
+    # The French notes already have the PR
+    content_fr = raw_content.replace("#47", "#48").replace("pull/47", "pull/48")
+    return {
+        "docs/en/docs/release-notes.md": inspect.cleandoc(raw_content) + "\n",
+        "docs/es/docs/release-notes.md": inspect.cleandoc(raw_content_es) + "\n",
+        "docs/fr/docs/release-notes.md": inspect.cleandoc(content_fr) + "\n",
+        "es.jinja2": (
+            "* {{pr.title}}. PR [#{{pr.number}}]({{pr.html_url}}) por "
+            "[@{{pr.user.login}}]({{pr.user.html_url}})."
+        ),
+    }
+
+
+def test_find_targets(work, tmp_path):
+    settings = make_settings(tmp_path)
+    targets = find_latest_changes_targets(settings)
+    assert [path for path, _ in targets] == [
+        Path("docs/es/docs/release-notes.md"),
+        Path("docs/en/docs/release-notes.md"),
+        Path("docs/fr/docs/release-notes.md"),
+    ]
+    es_settings = targets[0][1]
+    en_settings = targets[1][1]
+    assert es_settings.input_latest_changes_header == "## Últimos cambios"
+    assert es_settings.input_template_file == Path("es.jinja2")
+    assert en_settings.input_latest_changes_header == "## Latest Changes"
+    assert en_settings.input_template_file == settings.input_template_file
+    assert es_settings.latest_changes_index_file.parent == Path(".git")
+    assert (
+        es_settings.latest_changes_index_file != en_settings.latest_changes_index_file
+    )
+
+
+def test_find_targets_not_found(work, tmp_path):
+    settings = make_settings(tmp_path).model_copy(
+        update={"input_latest_changes_files": ["missing/*.md"]}
+    )
+    with pytest.raises(RuntimeError, match="No latest changes file was found"):
+        find_latest_changes_targets(settings)
+
+
+def test_single_commit_for_all_files(work, tmp_path):
+    settings = make_settings(tmp_path)
+    stats = commit_and_push_targets(
+        settings=settings,
+        targets=find_latest_changes_targets(settings),
+        pr=make_pr(48),
+        labels=[],
+    )
+    assert stats.pushed
+    log = git("log", "--format=%s", "origin/main", cwd=work).splitlines()
+    assert log == ["📝 Update release notes", "Add release notes"]
+    changed = git("show", "--name-only", "--format=", "origin/main", cwd=work)
+    assert changed.split() == [
+        "docs/en/docs/release-notes.md",
+        "docs/es/docs/release-notes.md",
+    ]
+    en = (work / "docs/en/docs/release-notes.md").read_text()
+    assert "## Latest Changes\n\n* Demo PR 48. PR [#48]" in en
+    es = (work / "docs/es/docs/release-notes.md").read_text()
+    assert "## Últimos cambios\n\n* Demo PR 48. PR [#48]" in es
+    assert "por [@tiangolo]" in es
+    fr = (work / "docs/fr/docs/release-notes.md").read_text()
+    assert fr.count("[#48]") == 1
@@ -0,0 +1,92 @@
+import inspect
+from pathlib import Path
+
+import pytest
+
+import latest_changes.plumbing
+from latest_changes.main import Settings
+from latest_changes.plumbing import commit_and_push
+
+from .conftest import clone, git, make_pr, raw_content
+
+notes_path = "docs/en/docs/release-notes.md"
+
+
+@pytest.fixture
+def repo_files() -> dict[str, str]:
+    return {
+        "docs/en/docs/index.md": "# Docs\n",
+        notes_path: inspect.cleandoc(raw_content) + "\n",
+        "README.md": "# Project\n",
+    }
+
+
+def make_settings() -> Settings:
+    return Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_retry_delay=0,
+        input_commit_backend="plumbing",
+    )
+
+
+def test_plumbing_commit_leaves_worktree_untouched(tmp_path, remote, monkeypatch):
+    work = clone(remote, tmp_path / "work")
+    monkeypatch.chdir(work)
+    head = git("rev-parse", "HEAD", cwd=work)
+    stats = commit_and_push(
+        settings=make_settings(),
+        latest_changes_file=Path(notes_path),
+        pr=make_pr(42),
+        labels=["feature"],
+    )
+    assert stats.pushed
+    assert stats.trials == 1
+    content = git("show", f"main:{notes_path}", cwd=remote)
+    assert content.startswith(
+        "# Release Notes\n\n## Latest Changes\n\n* 🔥 Remove config."
+    )
+    assert "### Features\n\n* Demo PR 42." in content
+    assert "\n\n## 0.0.3\n\n* 🐛 Fix default Jinja2 path." in content
+    assert git("show", "main:README.md", cwd=remote) == "# Project\n"
+    assert git("show", "main:docs/en/docs/index.md", cwd=remote) == "# Docs\n"
+    assert git("rev-parse", "HEAD", cwd=work) == head
+    assert git("status", "--porcelain", cwd=work) == ""
+
+
+def test_plumbing_push_race(tmp_path, remote, monkeypatch):
+    work = clone(remote, tmp_path / "work")
+    sibling = clone(remote, tmp_path / "sibling")
+    original_fetch = latest_changes.plumbing.fetch
+    fetches = 0
+
+    def fetch(branch: str) -> str:
+        nonlocal fetches
+        fetches += 1
+        sha = original_fetch(branch)
+        if fetches == 1:
+            # Another run adds its PR right after this one fetched
+            monkeypatch.chdir(sibling)
+            commit_and_push(
+                settings=make_settings(),
+                latest_changes_file=Path(notes_path),
+                pr=make_pr(43),
+                labels=[],
+            )
+            monkeypatch.chdir(work)
+        return sha
+
+    monkeypatch.setattr(latest_changes.plumbing, "fetch", fetch)
+    monkeypatch.chdir(work)
+    stats = commit_and_push(
+        settings=make_settings(),
+        latest_changes_file=Path(notes_path),
+        pr=make_pr(42),
+        labels=[],
+    )
+    assert stats.pushed
+    assert stats.trials == 2
+    assert stats.regenerated == 1
+    content = git("show", f"main:{notes_path}", cwd=remote)
+    assert content.index("[#42]") < content.index("[#43]") < content.index("[#47]")
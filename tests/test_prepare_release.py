@@ -0,0 +1,115 @@
+import inspect
+from datetime import date
+
+import pytest
+
+from scripts.prepare_release import (
+    merge_archive,
+    rotate_release_notes,
+    rotate_release_notes_file,
+)
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+* 🐛 Fix latest bug. PR [#50](https://github.com/tiangolo/latest-changes/pull/50) by [@tiangolo](https://github.com/tiangolo).
+
+## 1.1.0 (2026-10-01)
+
+* ✨ Add new feature. PR [#49](https://github.com/tiangolo/latest-changes/pull/49) by [@tiangolo](https://github.com/tiangolo).
+
+## 1.0.0 (2026-06-01)
+
+### Breaking Changes
+
+* 💥 Drop old option. PR [#48](https://github.com/tiangolo/latest-changes/pull/48) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.2.0 (2025-01-01)
+
+* ✨ Add option. PR [#47](https://github.com/tiangolo/latest-changes/pull/47) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.1.0
+
+* 🎉 First release. PR [#1](https://github.com/tiangolo/latest-changes/pull/1) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+today = date(2026, 10, 18)
+
+
+def test_rotate_keep_releases():
+    content = inspect.cleandoc(raw_content) + "\n"
+    new_content, archived = rotate_release_notes(content, keep_releases=1, today=today)
+    assert new_content == content[: content.index("## 1.0.0")].rstrip() + "\n"
+    assert list(archived) == [1, 0]
+    assert archived[1].startswith("## 1.0.0 (2026-06-01)\n\n### Breaking Changes")
+    assert archived[1].endswith(
+        "PR [#48](https://github.com/tiangolo/latest-changes/pull/48) by [@tiangolo](https://github.com/tiangolo).\n"
+    )
+    assert archived[0].startswith("## 0.2.0 (2025-01-01)")
+    assert "## 0.1.0" in archived[0]
+
+
+def test_rotate_max_release_age():
+    content = inspect.cleandoc(raw_content) + "\n"
+    new_content, archived = rotate_release_notes(
+        content, max_release_age=365, today=today
+    )
+    assert "## 1.0.0 (2026-06-01)" in new_content
+    assert "## 0.2.0" not in new_content
+    assert list(archived) == [0]
+
+
+def test_rotate_nothing_to_archive():
+    content = inspect.cleandoc(raw_content) + "\n"
+    assert rotate_release_notes(content, keep_releases=10, today=today) == (
+        content,
+        {},
+    )
+
+
+def test_merge_archive_new_releases_on_top():
+    archive = merge_archive(None, "## 0.1.0\n\n* First.\n", 0)
+    assert archive == "# Release Notes 0.x\n\n## 0.1.0\n\n* First.\n"
+    archive = merge_archive(archive, "## 0.2.0\n\n* Second.\n", 0)
+    assert archive == (
+        "# Release Notes 0.x\n\n## 0.2.0\n\n* Second.\n\n## 0.1.0\n\n* First.\n"
+    )
+
+
+def test_merge_archive_duplicate_version():
+    archive = merge_archive(None, "## 0.1.0\n\n* First.\n", 0)
+    with pytest.raises(RuntimeError, match="already contains a section for 0.1.0"):
+        merge_archive(archive, "## 0.1.0 (2025-01-01)\n\n* First.\n", 0)
+
+
+def test_rotate_file_keeps_all_releases(tmp_path):
+    content = inspect.cleandoc(raw_content) + "\n"
+    release_notes_file = tmp_path / "release-notes.md"
+    release_notes_file.write_text(content, encoding="utf-8")
+    archive_dir = tmp_path / "release-notes" / "archive"
+    rotate_release_notes_file(
+        release_notes_file,
+        archive_dir,
+        keep_releases=3,
+        max_release_age=None,
+        today=today,
+    )
+    archive_files = rotate_release_notes_file(
+        release_notes_file,
+        archive_dir,
+        keep_releases=1,
+        max_release_age=None,
+        today=today,
+    )
+    assert archive_files == [archive_dir / "1.md", archive_dir / "0.md"]
+    assert "## 1.0.0" not in release_notes_file.read_text(encoding="utf-8")
+    archive_0 = (archive_dir / "0.md").read_text(encoding="utf-8")
+    assert archive_0.index("## 0.2.0") < archive_0.index("## 0.1.0")
+    archived = "".join(
+        file.read_text(encoding="utf-8")
+        for file in (archive_dir / "1.md", archive_dir / "0.md")
+    )
+    for pr_number in (1, 47, 48):
+        assert f"[#{pr_number}]" in archived
@@ -0,0 +1,127 @@
+import subprocess
+from pathlib import Path
+
+import latest_changes.timing
+from latest_changes.main import Settings, commit_and_push, get_retry_delay
+
+from .conftest import clone, git, make_pr
+
+
+def make_settings() -> Settings:
+    return Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_retry_delay=0,
+    )
+
+
+def test_get_retry_delay():
+    for trial in range(10):
+        delay = get_retry_delay(trial=trial, base_delay=1.0)
+        assert 0 <= delay <= min(30, 2**trial)
+
+
+def test_push_without_contention(tmp_path, remote, monkeypatch):
+    work = clone(remote, tmp_path / "work")
+    monkeypatch.chdir(work)
+    stats = commit_and_push(
+        settings=make_settings(),
+        latest_changes_file=Path("release-notes.md"),
+        pr=make_pr(42),
+        labels=[],
+    )
+    assert stats.pushed
+    assert stats.trials == 1
+    assert "[#42]" in git("show", "main:release-notes.md", cwd=remote)
+
+
+def test_push_race_rebases(tmp_path, remote, monkeypatch):
+    work = clone(remote, tmp_path / "work")
+    sibling = clone(remote, tmp_path / "sibling")
+    (sibling / "README.md").write_text("# Project\n")
+    git("add", "README.md", cwd=sibling)
+    git("commit", "-q", "-m", "Add README", cwd=sibling)
+    original_pull = ["git", "pull"]
+    original_run = subprocess.run
+
+    def run(args, *a, **kw):
+        result = original_run(args, *a, **kw)
+        if args == original_pull:
+            # Another merge lands right after this run pulled
+            git("push", "-q", "origin", "HEAD:main", cwd=sibling)
+        return result
+
+    monkeypatch.setattr(latest_changes.timing.subprocess, "run", run)
+    monkeypatch.chdir(work)
+    stats = commit_and_push(
+        settings=make_settings(),
+        latest_changes_file=Path("release-notes.md"),
+        pr=make_pr(42),
+        labels=[],
+    )
+    assert stats.pushed
+    assert stats.trials == 2
+    assert stats.rebased == 1
+    assert stats.regenerated == 0
+    assert "[#42]" in git("show", "main:release-notes.md", cwd=remote)
+    assert git("show", "main:README.md", cwd=remote) == "# Project\n"
+
+
+def test_push_race_regenerates_on_conflict(tmp_path, remote, monkeypatch):
+    work = clone(remote, tmp_path / "work")
+    sibling = clone(remote, tmp_path / "sibling")
+    original_pull = ["git", "pull"]
+    original_run = subprocess.run
+    pulls = 0
+
+    def run(args, *a, **kw):
+        nonlocal pulls
+        result = original_run(args, *a, **kw)
+        if args == original_pull:
+            pulls += 1
+            if pulls == 1:
+                # Another run adds its PR in the same place right after this pull
+                monkeypatch.chdir(sibling)
+                commit_and_push(
+                    settings=make_settings(),
+                    latest_changes_file=Path("release-notes.md"),
+                    pr=make_pr(43),
+                    labels=[],
+                )
+                monkeypatch.chdir(work)
+        return result
+
+    monkeypatch.setattr(latest_changes.timing.subprocess, "run", run)
+    monkeypatch.chdir(work)
+    stats = commit_and_push(
+        settings=make_settings(),
+        latest_changes_file=Path("release-notes.md"),
+        pr=make_pr(42),
+        labels=[],
+    )
+    assert stats.pushed
+    assert stats.trials == 2
+    assert stats.rebased == 0
+    assert stats.regenerated == 1
+    content = git("show", "main:release-notes.md", cwd=remote)
+    assert content.index("[#42]") < content.index("[#43]") < content.index("[#47]")
+
+
+def test_push_gives_up_after_trials(tmp_path, remote, monkeypatch):
+    hook = remote / "hooks" / "pre-receive"
+    hook.write_text("#!/bin/sh\nexit 1\n")
+    hook.chmod(0o755)
+    work = clone(remote, tmp_path / "work")
+    monkeypatch.chdir(work)
+    settings = make_settings()
+    settings.input_number_of_trials = 3
+    stats = commit_and_push(
+        settings=settings,
+        latest_changes_file=Path("release-notes.md"),
+        pr=make_pr(42),
+        labels=[],
+    )
+    assert not stats.pushed
+    assert stats.trials == 3
+    assert stats.rebased == 2
@@ -0,0 +1,162 @@
+import inspect
+import os
+
+from latest_changes.main import (
+    Settings,
+    TemplateDataPR,
+    TemplateDataUser,
+    generate_content,
+    read_release_notes_head,
+    write_release_notes,
+)
+
+raw_content = """
+# Release Notes
+
+## Latest Changes
+
+### Features
+
+* 🚀 Publish amd64 and arm64 versions. PR [#46](https://github.com/tiangolo/latest-changes/pull/46) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.0.3
+
+* 🚚 Update Python module name. PR [#37](https://github.com/tiangolo/latest-changes/pull/37) by [@tiangolo](https://github.com/tiangolo).
+
+## 0.0.2
+
+* 🐛 Fix default Jinja2 path. PR [#38](https://github.com/tiangolo/latest-changes/pull/38) by [@tiangolo](https://github.com/tiangolo).
+"""
+
+pr = TemplateDataPR(
+    title="Demo PR",
+    number=42,
+    html_url="https://example.com/pr/42",
+    user=TemplateDataUser(login="tiangolo", html_url="https://github.com/tiangolo"),
+)
+
+
+def test_read_head_stops_at_end_regex(tmp_path):
+    content = inspect.cleandoc(raw_content) + "\n"
+    path = tmp_path / "release-notes.md"
+    path.write_text(content)
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    head = read_release_notes_head(path, settings)
+    assert head.content == content[: content.index("## 0.0.3")]
+    assert head.tail_offset == len(head.content.encode("utf-8"))
+
+
+def test_read_head_whole_file(tmp_path):
+    content = inspect.cleandoc(raw_content) + "\n"
+    path = tmp_path / "release-notes.md"
+    path.write_text(content)
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+        input_duplicates_scope="file",
+    )
+    head = read_release_notes_head(path, settings)
+    assert head.content == content
+    assert head.tail_offset is None
+
+
+def test_read_head_without_next_release(tmp_path):
+    content = "# Release Notes\n\n## Latest Changes\n\n* 🔥 Remove config.\n"
+    path = tmp_path / "release-notes.md"
+    path.write_text(content)
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    head = read_release_notes_head(path, settings)
+    assert head.content == content
+    assert head.tail_offset is None
+
+
+def test_write_head_and_tail_same_as_full_content(tmp_path):
+    content = inspect.cleandoc(raw_content) + "\n"
+    path = tmp_path / "release-notes.md"
+    path.write_text(content)
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    head = read_release_notes_head(path, settings)
+    new_head = generate_content(
+        content=head.content, settings=settings, pr=pr, labels=["feature"]
+    )
+    write_release_notes(path, content=new_head, tail_offset=head.tail_offset)
+    assert path.read_text() == generate_content(
+        content=content, settings=settings, pr=pr, labels=["feature"]
+    )
+
+
+def test_write_copies_tail_without_kernel_copy(tmp_path, monkeypatch):
+    def fail(*args):
+        raise OSError("Not supported")
+
+    monkeypatch.setattr(os, "copy_file_range", fail, raising=False)
+    monkeypatch.setattr(os, "sendfile", fail, raising=False)
+    path = tmp_path / "release-notes.md"
+    tail = "".join(
+        f"## 0.0.{number}\n\n* Change {number}.\n\n" for number in range(1000)
+    )
+    path.write_text(f"# Release Notes\n\n## Latest Changes\n\n{tail}")
+    path.chmod(0o640)
+    offset = len("# Release Notes\n\n## Latest Changes\n\n")
+    write_release_notes(
+        path,
+        content="# Release Notes\n\n## Latest Changes\n\n* New.\n",
+        tail_offset=offset,
+    )
+    assert path.read_text() == (
+        f"# Release Notes\n\n## Latest Changes\n\n* New.\n\n{tail}"
+    )
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert [file.name for file in tmp_path.iterdir()] == ["release-notes.md"]
+
+
+def test_write_through_symlink(tmp_path):
+    real = tmp_path / "real.md"
+    real.write_text("# Release Notes\n\n## Latest Changes\n\n* Old.\n")
+    link = tmp_path / "link.md"
+    link.symlink_to(real.name)
+    write_release_notes(
+        link, content="# Release Notes\n\n## Latest Changes\n\n* New.\n\n* Old.\n"
+    )
+    assert link.is_symlink()
+    assert (
+        real.read_text() == "# Release Notes\n\n## Latest Changes\n\n* New.\n\n* Old.\n"
+    )
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["link.md", "real.md"]
+
+
+def test_write_keeps_crlf_line_endings(tmp_path):
+    content = inspect.cleandoc(raw_content) + "\n"
+    path = tmp_path / "release-notes.md"
+    path.write_bytes(content.replace("\n", "\r\n").encode("utf-8"))
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="event.json",
+        input_token="secret",
+    )
+    head = read_release_notes_head(path, settings)
+    assert head.newline == "\r\n"
+    assert "\r" not in head.content
+    new_head = generate_content(
+        content=head.content, settings=settings, pr=pr, labels=["feature"]
+    )
+    write_release_notes(
+        path, content=new_head, tail_offset=head.tail_offset, newline=head.newline
+    )
+    expected = generate_content(
+        content=content, settings=settings, pr=pr, labels=["feature"]
+    )
+    assert path.read_bytes() == expected.replace("\n", "\r\n").encode("utf-8")
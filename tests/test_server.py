@@ -0,0 +1,165 @@
+import hashlib
+import hmac
+import json
+import queue
+import threading
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import pytest
+
+from latest_changes.document import ReleaseNotes
+from latest_changes.main import GitHubEventPullRequest, Settings
+from latest_changes.server import WebhookServer, collect_batch
+
+from .conftest import git
+
+secret = "webhook-secret"
+
+
+def make_event(
+    number: int,
+    *,
+    merged: bool = True,
+    labels: tuple[str, ...] = (),
+    base: str = "main",
+    repository: str = "tiangolo/latest-changes",
+) -> dict:
+    return {
+        "action": "closed",
+        "number": number,
+        "pull_request": {
+            "number": number,
+            "title": f"Demo PR {number}",
+            "html_url": f"https://github.com/tiangolo/latest-changes/pull/{number}",
+            "user": {"login": "tiangolo", "html_url": "https://github.com/tiangolo"},
+            "merged": merged,
+            "labels": [{"name": label} for label in labels],
+            "base": {"ref": base},
+        },
+        "repository": {"full_name": repository},
+    }
+
+
+def make_pr(number: int) -> GitHubEventPullRequest:
+    return GitHubEventPullRequest.model_validate(make_event(number)["pull_request"])
+
+
+def send(
+    url: str,
+    event: dict,
+    *,
+    event_name: str = "pull_request",
+    signature_secret: Optional[str] = secret,
+) -> httpx.Response:
+    body = json.dumps(event).encode("utf-8")
+    headers = {"X-GitHub-Event": event_name, "Content-Type": "application/json"}
+    if signature_secret is not None:
+        digest = hmac.new(signature_secret.encode(), body, hashlib.sha256)
+        headers["X-Hub-Signature-256"] = f"sha256={digest.hexdigest()}"
+    return httpx.post(url, content=body, headers=headers)
+
+
+@pytest.fixture
+def server(work: Path, tmp_path: Path):
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="/dev/null",
+        input_token="secret",
+        latest_changes_cache_dir=tmp_path / "cache",
+        latest_changes_webhook_secret=secret,
+    )
+    server = WebhookServer(
+        ("127.0.0.1", 0),
+        settings=settings,
+        latest_changes_file=Path("release-notes.md"),
+        base_branch="main",
+        # Long enough for all the webhooks of a test to be in the same batch
+        debounce=10,
+    )
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    if thread.is_alive():
+        server.stop()
+
+
+def test_serve_single_commit_per_batch(work, server):
+    url = f"http://127.0.0.1:{server.server_port}/"
+    assert send(url, make_event(50)).status_code == 202
+    assert send(url, make_event(48, labels=("feature",))).status_code == 202
+    # Already listed, not merged, or with a skip label
+    assert send(url, make_event(47)).status_code == 202
+    assert send(url, make_event(51, merged=False)).status_code == 200
+    assert send(url, make_event(49, labels=("release",))).status_code == 202
+    # Not for this repository or branch
+    assert send(url, make_event(52, base="dev")).status_code == 200
+    assert send(url, make_event(53, repository="other/repo")).status_code == 200
+    assert send(url, {"zen": "Keep it simple."}, event_name="ping").status_code == 200
+    server.stop()
+    log = git("log", "--format=%s", "origin/main", cwd=work).splitlines()
+    assert log == ["📝 Update release notes", "Add release notes"]
+    content = (work / "release-notes.md").read_text()
+    for number in (49, 51, 52, 53):
+        assert f"[#{number}]" not in content
+    assert content.count("[#47]") == 1
+    assert content.index("[#50]") < content.index("[#47]")
+    assert "### Features\n\n* Demo PR 48." in content
+    assert "\n\n\n" not in content
+
+
+def test_process_batches_reuse_parsed_notes(work, tmp_path, monkeypatch):
+    settings = Settings(
+        github_repository="tiangolo/latest-changes",
+        github_event_path="/dev/null",
+        input_token="secret",
+        latest_changes_cache_dir=tmp_path / "cache",
+    )
+    server = WebhookServer(
+        ("127.0.0.1", 0),
+        settings=settings,
+        latest_changes_file=Path("release-notes.md"),
+        base_branch="main",
+    )
+    parsed: list[bytes] = []
+    parse = ReleaseNotes.parse
+
+    def record_parse(source: bytes, settings: Settings) -> ReleaseNotes:
+        parsed.append(source)
+        return parse(source, settings)
+
+    monkeypatch.setattr(ReleaseNotes, "parse", record_parse)
+    try:
+        assert server.process_batch([make_pr(48)]).pushed
+        assert server.process_batch([make_pr(49), make_pr(48)]).pushed
+    finally:
+        server.server_close()
+    # The second batch edits the release notes parsed by the first one
+    assert len(parsed) == 1
+    content = (work / "release-notes.md").read_text()
+    assert content.count("[#48]") == 1
+    assert content.index("[#49]") < content.index("[#48]") < content.index("[#47]")
+    assert "\n\n\n" not in content
+
+
+def test_serve_rejects_invalid_webhooks(work, server):
+    url = f"http://127.0.0.1:{server.server_port}/"
+    assert send(url, make_event(50), signature_secret=None).status_code == 401
+    assert send(url, make_event(50), signature_secret="wrong").status_code == 401
+    assert send(url, {"action": "closed"}).status_code == 400
+    server.stop()
+    log = git("log", "--format=%s", "origin/main", cwd=work).splitlines()
+    assert log == ["Add release notes"]
+
+
+def test_collect_batch_debounce():
+    events: queue.Queue = queue.Queue()
+    for number in range(3):
+        events.put(number)
+    assert collect_batch(events, debounce=0.01, max_batch_size=2) == ([0, 1], False)
+    assert collect_batch(events, debounce=0.01, max_batch_size=2) == ([2], False)
+    events.put(3)
+    events.put(None)
+    assert collect_batch(events, debounce=0.01, max_batch_size=2) == ([3], True)
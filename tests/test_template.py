@@ -0,0 +1,47 @@
+import os
+
+from latest_changes.main import (
+    DEFAULT_TEMPLATE_FILE,
+    TemplateDataPR,
+    TemplateDataUser,
+    render_default_template,
+)
+from latest_changes.templates import get_template
+
+pr = TemplateDataPR(
+    title="Demo PR",
+    number=42,
+    html_url="https://example.com/pr/42",
+    user=TemplateDataUser(login="tiangolo", html_url="https://github.com/tiangolo"),
+)
+
+
+def test_default_template_uses_bytecode_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    template = get_template(DEFAULT_TEMPLATE_FILE, cache_dir=cache_dir)
+    assert template.render(pr=pr) == (
+        "* Demo PR. PR [#42](https://example.com/pr/42) by [@tiangolo](https://github.com/tiangolo)."
+    )
+    assert len(list(cache_dir.iterdir())) == 1
+    assert get_template(DEFAULT_TEMPLATE_FILE, cache_dir=cache_dir) is template
+
+
+def test_template_reloaded_when_modified(tmp_path):
+    cache_dir = tmp_path / "cache"
+    template_file = tmp_path / "template.jinja2"
+    template_file.write_text("* {{pr.title}}")
+    template = get_template(template_file, cache_dir=cache_dir)
+    assert template.render(pr=pr) == "* Demo PR"
+    assert get_template(template_file, cache_dir=cache_dir) is template
+
+    template_file.write_text("* {{pr.title}} (#{{pr.number}})")
+    stat = template_file.stat()
+    os.utime(template_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    new_template = get_template(template_file, cache_dir=cache_dir)
+    assert new_template is not template
+    assert new_template.render(pr=pr) == "* Demo PR (#42)"
+
+
+def test_default_template_compiled_by_hand_matches_jinja(tmp_path):
+    template = get_template(DEFAULT_TEMPLATE_FILE, cache_dir=tmp_path / "cache")
+    assert render_default_template(pr) == template.render(pr=pr)
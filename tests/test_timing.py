@@ -0,0 +1,43 @@
+import json
+
+from latest_changes import timing
+from latest_changes.timing import RunMetrics
+
+
+def test_spans_in_start_order():
+    metrics = RunMetrics()
+    with metrics.span("trial 0"):
+        with metrics.span("git push"):
+            pass
+    assert [span.name for span in metrics.spans] == ["trial 0", "git push"]
+    assert metrics.spans[0].seconds >= metrics.spans[1].seconds >= 0
+
+
+def test_run_records_git_span(monkeypatch):
+    metrics = RunMetrics()
+    monkeypatch.setattr(timing, "metrics", metrics)
+    result = timing.run(["git", "--version"], capture_output=True)
+    assert result.returncode == 0
+    assert [span.name for span in metrics.spans] == ["git --version"]
+
+
+def test_report_metrics_writes_step_summary(tmp_path, monkeypatch):
+    metrics = RunMetrics()
+    monkeypatch.setattr(timing, "metrics", metrics)
+    summary_path = tmp_path / "summary.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary_path))
+    with metrics.span("generate_content"):
+        pass
+    metrics.record_api_response(
+        {"X-RateLimit-Limit": "1000", "X-RateLimit-Remaining": "990"}
+    )
+    timing.report_metrics()
+    summary = summary_path.read_text()
+    assert "| generate_content | " in summary
+    assert "GitHub API requests: 1, rate limit remaining: 990 / 1000" in summary
+    document = summary.split("```json\n")[1].split("\n```")[0]
+    assert json.loads(document)["api"] == {
+        "requests": 1,
+        "rate_limit": 1000,
+        "rate_limit_remaining": 990,
+    }